@@ -1,18 +1,164 @@
+import asyncio
+import fnmatch
 import functools
 import inspect
 import json
 import logging
+import math
+import random
+import string
+import struct
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
 from decimal import Decimal
 from typing import Iterable
 
 from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
 from redis import asyncio as redis
 
 from backend.core.config import settings
+from backend.core.metrics import Counter, Summary
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_frame = None
 
 logger = logging.getLogger(__name__)
 
 _redis: redis.Redis | None = None
+_local_cache: "LocalCache | None" = None
+_listener_task: asyncio.Task | None = None
+
+_inflight: dict[str, asyncio.Future] = {}
+_refreshing: set[str] = set()
+_background_tasks: set[asyncio.Task] = set()
+_MISSING = object()
+
+_INVALIDATION_CHANNEL = "api_cache:invalidate"
+_TRACKING_CHANNEL = "__redis__:invalidate"
+_TRACKING_PREFIX = "api_cache:"
+_TRACKING_HEALTH_INTERVAL = 30
+_LOCK_POLL_INTERVAL = 0.05
+_REFRESH_LOCK_TTL = 30
+_DEFAULT_EXCLUDE = {"db", "current_user", "current_admin", "admin", "user", "background_tasks"}
+
+_SERIALIZERS = {"json": 1, "orjson": 2, "msgpack": 3}
+_COMPRESSIONS = {"zstd": 1, "lz4": 2}
+_LIST_FLAG = 0x80
+# Отдельный id сериализатора для закэшированных исключений (negative caching)
+_ERROR_SERIALIZER = 0x0F
+# flags (сериализатор | сжатие << 4 | признак списка), мягкий срок жизни, время вычисления
+_ENTRY_HEADER = struct.Struct("!Bdd")
+_COMPRESS_THRESHOLD = 1024
+# Сквозной счетчик инвалидаций по тегам; версия тега — значение счетчика при его последнем сбросе
+_TAG_SEQUENCE_KEY = "api_cache:tagseq"
+# Версия нужна, пока идут загрузки, начатые до сброса; дольше загрузка не длится
+_TAG_VERSION_TTL = 3600
+
+# Запись пропускается, если хотя бы один тег сброшен после снимка счетчика (ARGV[1]):
+# загрузка могла прочитать строку до коммита и вернуть ее в уже очищенный тег.
+# KEYS на запись: ключ кэша, затем пары (множество тега, версия тега); ARGV: снимок, TTL, затем (payload, число тегов)
+_WRITE_ENTRIES_SCRIPT = """
+local snapshot = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local written = {}
+local k = 1
+for i = 3, #ARGV, 2 do
+    local cache_key = KEYS[k]
+    local tag_count = tonumber(ARGV[i + 1])
+    local fresh = 1
+    for t = 1, tag_count do
+        local version = redis.call('GET', KEYS[k + 2 * t])
+        if version and tonumber(version) > snapshot then
+            fresh = 0
+        end
+    end
+    if fresh == 1 then
+        redis.call('SET', cache_key, ARGV[i], 'EX', ttl)
+        for t = 1, tag_count do
+            local tag_key = KEYS[k + 2 * t - 1]
+            redis.call('SADD', tag_key, cache_key)
+            redis.call('EXPIRE', tag_key, ttl, 'NX')
+            redis.call('EXPIRE', tag_key, ttl, 'GT')
+        end
+    end
+    written[#written + 1] = fresh
+    k = k + 1 + 2 * tag_count
+end
+return written
+"""
+
+# KEYS: счетчик, затем пары (множество тега, версия тега); возвращает ключи кэша из сброшенных тегов
+_DELETE_TAGS_SCRIPT = """
+local sequence = redis.call('INCR', KEYS[1])
+local keys = {}
+for i = 2, #KEYS, 2 do
+    redis.call('SET', KEYS[i + 1], sequence, 'EX', ARGV[1])
+    for _, cache_key in ipairs(redis.call('SMEMBERS', KEYS[i])) do
+        keys[#keys + 1] = cache_key
+    end
+    redis.call('DEL', KEYS[i])
+end
+return keys
+"""
+
+_CACHE_REQUESTS = Counter(
+    "api_cache_requests_total",
+    "Cache lookups by key template and result (hit_l1, hit, stale, coalesced, miss)",
+    ("template", "result"),
+)
+_CACHE_ERRORS = Counter(
+    "api_cache_errors_total",
+    "Failed cache operations by key template",
+    ("template", "operation"),
+)
+_CACHE_BYTES = Counter(
+    "api_cache_bytes_total",
+    "Bytes read from and written to Redis by key template",
+    ("template", "direction"),
+)
+_CACHE_LOAD_SECONDS = Summary(
+    "api_cache_load_seconds",
+    "Time spent computing values on cache miss or refresh",
+    ("template",),
+)
+_CACHE_INVALIDATION_SECONDS = Summary(
+    "api_cache_invalidation_seconds",
+    "Time spent deleting invalidated keys (tag lookup or SCAN)",
+    ("kind",),
+)
+_CACHE_INVALIDATION_ERRORS = Counter(
+    "api_cache_invalidation_errors_total",
+    "Failed cache invalidations",
+    ("kind",),
+)
+_CACHE_STALE_WRITES = Counter(
+    "api_cache_stale_writes_skipped_total",
+    "Cache fills dropped because a tag was invalidated while they were loading",
+)
+
+# Приоритет статусов для X-Cache: один промах важнее любого числа попаданий
+_STATUS_PRIORITY = {"HIT": 1, "STALE": 2, "MISS": 3}
+_RESULT_STATUS = {"hit_l1": "HIT", "hit": "HIT", "stale": "STALE", "coalesced": "MISS", "miss": "MISS"}
+_request_cache_status: ContextVar[dict | None] = ContextVar("request_cache_status", default=None)
 
 
 def get_redis() -> redis.Redis | None:
@@ -22,12 +168,15 @@ def get_redis() -> redis.Redis | None:
 
     global _redis
     if _redis is None:
-        _redis = redis.from_url(url, encoding="utf-8", decode_responses=True)
+        # Общий клиент отдает bytes: записи кэша бинарные. Остальные вызовы разбирают ответы сами
+        # (int(), json.loads и .decode() принимают bytes)
+        _redis = redis.from_url(url)
     return _redis
 
 
 async def close_redis() -> None:
     global _redis
+    await stop_cache_listener()
     if _redis is None:
         return
     try:
@@ -36,6 +185,202 @@ async def close_redis() -> None:
         _redis = None
 
 
+class LocalCache:
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[float, int, object]] = OrderedDict()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, size: int, ttl: float) -> None:
+        if size > self.max_bytes:
+            return
+        self.delete(key)
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self._size += size
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+    def delete_pattern(self, pattern: str) -> None:
+        for key in [k for k in self._entries if fnmatch.fnmatchcase(k, pattern)]:
+            self.delete(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+
+def get_local_cache() -> LocalCache | None:
+    if not settings.CACHE_L1_ENABLED:
+        return None
+
+    global _local_cache
+    if _local_cache is None:
+        _local_cache = LocalCache(settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_MAX_BYTES)
+    return _local_cache
+
+
+def _apply_invalidation(keys: Iterable[str] = (), patterns: Iterable[str] = ()) -> None:
+    local_cache = get_local_cache()
+    if local_cache is None:
+        return
+    for cache_key in keys:
+        local_cache.delete(cache_key)
+    for pattern in patterns:
+        local_cache.delete_pattern(pattern)
+
+
+async def _publish_invalidation(
+    redis_client: redis.Redis,
+    keys: Iterable[str] = (),
+    patterns: Iterable[str] = (),
+) -> None:
+    keys, patterns = list(keys), list(patterns)
+    if not keys and not patterns:
+        return
+    _apply_invalidation(keys, patterns)
+    # В режиме client tracking остальные воркеры узнают об удалении от самого Redis
+    if get_local_cache() is None or settings.CACHE_L1_TRACKING:
+        return
+    try:
+        message = json.dumps({"keys": keys, "patterns": patterns})
+        await redis_client.publish(_INVALIDATION_CHANNEL, message)
+    except Exception:
+        logger.debug("Cache invalidation broadcast failed", exc_info=True)
+
+
+def _local_ttl(local_ttl: float, remaining: float) -> float:
+    # С client tracking об изменении сообщит сервер — держим запись, пока она жива в Redis
+    if settings.CACHE_L1_TRACKING:
+        return remaining
+    return min(local_ttl, remaining)
+
+
+def _apply_tracking_invalidation(keys) -> None:
+    local_cache = get_local_cache()
+    if local_cache is None:
+        return
+    # nil вместо списка ключей приходит после FLUSHALL/FLUSHDB
+    if keys is None:
+        local_cache.clear()
+        return
+    _apply_invalidation(k.decode() if isinstance(k, bytes) else k for k in keys)
+
+
+def _tracking_connection(redis_client: redis.Redis):
+    pool = redis_client.connection_pool
+    # Сообщения __redis__:invalidate разбираем как обычный pub/sub RESP2
+    return pool.connection_class(**{**pool.connection_kwargs, "protocol": 2})
+
+
+async def _listen_tracking(redis_client: redis.Redis, local_cache: LocalCache) -> None:
+    subscriber = _tracking_connection(redis_client)
+    tracker = _tracking_connection(redis_client)
+    try:
+        await subscriber.connect()
+        await subscriber.send_command("CLIENT", "ID")
+        subscriber_id = await subscriber.read_response()
+
+        # BCAST: сервер сообщает об изменении любого ключа с префиксом, даже не прочитанного этим клиентом.
+        # Наши собственные записи тоже приходят сюда, так что свежая L1-запись вытесняется один раз
+        await tracker.connect()
+        await tracker.send_command(
+            "CLIENT", "TRACKING", "ON", "REDIRECT", subscriber_id, "BCAST", "PREFIX", _TRACKING_PREFIX
+        )
+        await tracker.read_response()
+
+        await subscriber.send_command("SUBSCRIBE", _TRACKING_CHANNEL)
+        await subscriber.read_response()
+        # Уведомления могли потеряться до (пере)подключения
+        local_cache.clear()
+
+        while True:
+            message = await subscriber.read_response(timeout=_TRACKING_HEALTH_INTERVAL)
+            if message is None:
+                # Tracking живет, пока открыто соединение tracker — проверяем его
+                await tracker.send_command("PING")
+                await tracker.read_response()
+                continue
+            kind = message[0].decode() if isinstance(message[0], bytes) else message[0]
+            if kind == "message":
+                _apply_tracking_invalidation(message[2])
+    finally:
+        await subscriber.disconnect()
+        await tracker.disconnect()
+
+
+async def _listen_invalidations() -> None:
+    while True:
+        redis_client = get_redis()
+        local_cache = get_local_cache()
+        if redis_client is None or local_cache is None:
+            return
+        try:
+            if settings.CACHE_L1_TRACKING:
+                await _listen_tracking(redis_client, local_cache)
+                continue
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(_INVALIDATION_CHANNEL)
+                # Сообщения могли потеряться до (пере)подписки
+                local_cache.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    _apply_invalidation(data.get("keys", ()), data.get("patterns", ()))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Cache invalidation listener failed, resubscribing", exc_info=True)
+            local_cache.clear()
+            await asyncio.sleep(1)
+
+
+def start_cache_listener() -> None:
+    global _listener_task
+    if _listener_task is not None or get_redis() is None or get_local_cache() is None:
+        return
+    _listener_task = asyncio.create_task(_listen_invalidations())
+
+
+async def stop_cache_listener() -> None:
+    global _listener_task
+    if _listener_task is None:
+        return
+    _listener_task.cancel()
+    try:
+        await _listener_task
+    except (asyncio.CancelledError, Exception):
+        pass
+    finally:
+        _listener_task = None
+
+
 class _SafeDict(dict):
     def __missing__(self, key: str) -> str:
         return ""
@@ -57,15 +402,109 @@ def _normalize(value) -> str:
     return str(value)
 
 
-def _build_cache_key(template: str, fn, args, kwargs, exclude: Iterable[str]) -> str:
+def _bind_arguments(fn, args, kwargs, exclude: Iterable[str]) -> _SafeDict:
     bound = inspect.signature(fn).bind_partial(*args, **kwargs)
     bound.apply_defaults()
-    data = {
+    return _SafeDict({
         k: _normalize(v)
         for k, v in bound.arguments.items()
         if k not in exclude
-    }
-    return f"api_cache:{template.format_map(_SafeDict(data))}"
+    })
+
+
+def _build_cache_key(template: str, fn, args, kwargs, exclude: Iterable[str]) -> str:
+    data = _bind_arguments(fn, args, kwargs, exclude)
+    return f"api_cache:{template.format_map(data)}"
+
+
+def _compile_template(template: str, fn, exclude: Iterable[str]):
+    params = inspect.signature(fn).parameters
+    has_var_kwargs = any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values())
+    positional = [
+        name for name, p in params.items()
+        if p.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    ]
+
+    fmt_parts = []
+    fields = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        fmt_parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is None:
+            continue
+        if spec or conversion or not field.isidentifier():
+            return lambda args, kwargs: template.format_map(_bind_arguments(fn, args, kwargs, exclude))
+
+        fmt_parts.append("{}")
+        param = params.get(field)
+        if field in exclude or (param is None and not has_var_kwargs):
+            fields.append((None, None, ""))
+            continue
+        index = positional.index(field) if field in positional else None
+        default = "" if param is None or param.default is inspect.Parameter.empty else _normalize(param.default)
+        fields.append((field, index, default))
+
+    fmt = "".join(fmt_parts)
+
+    def build(args, kwargs) -> str:
+        values = []
+        for name, index, default in fields:
+            if name is None:
+                values.append(default)
+            elif name in kwargs:
+                values.append(_normalize(kwargs[name]))
+            elif index is not None and index < len(args):
+                values.append(_normalize(args[index]))
+            else:
+                values.append(default)
+        return fmt.format(*values)
+
+    return build
+
+
+def _tag_key(tag: str) -> str:
+    return f"api_cache:tag:{tag}"
+
+
+def _tag_version_key(tag: str) -> str:
+    return f"api_cache:tagver:{tag}"
+
+
+def _resolve_tags(builders, args, kwargs, result_tags=None, result=None) -> set[str]:
+    tags = {build(args, kwargs) for build in builders}
+    if result_tags is not None:
+        tags.update(result_tags(result))
+    return tags
+
+
+def id_tags(prefix: str, attr: str = "id"):
+    def resolve(result) -> list[str]:
+        items = result if isinstance(result, (list, tuple)) else [result]
+        return [f"{prefix}:{getattr(item, attr)}" for item in items if item is not None]
+
+    return resolve
+
+
+class _CachedError:
+
+    def __init__(self, type_name: str, args: list, attrs: dict):
+        self.type_name = type_name
+        self.args = args
+        self.attrs = attrs
+
+    @classmethod
+    def from_exception(cls, exc: Exception) -> "_CachedError":
+        return cls(type(exc).__name__, jsonable_encoder(list(exc.args)), jsonable_encoder(vars(exc)))
+
+    def to_payload(self) -> dict:
+        return {"type": self.type_name, "args": self.args, "attrs": self.attrs}
+
+    def rebuild(self, exception_types: dict[str, type[Exception]]) -> Exception:
+        exc_type = exception_types[self.type_name]
+        # __init__ у исключений приложения принимает свои аргументы — восстанавливаем в обход него
+        exc = exc_type.__new__(exc_type)
+        exc.args = tuple(self.args)
+        exc.__dict__.update(self.attrs)
+        return exc
 
 
 def _decode_cached(decoder, data):
@@ -76,17 +515,258 @@ def _decode_cached(decoder, data):
     return decoder.model_validate(data) if hasattr(decoder, "model_validate") else decoder(data)
 
 
+def _check_codec(serializer: str, compression: str | None) -> tuple[str, str | None]:
+    if serializer not in _SERIALIZERS:
+        raise ValueError(f"Unknown cache serializer: {serializer}")
+    if compression is not None and compression not in _COMPRESSIONS:
+        raise ValueError(f"Unknown cache compression: {compression}")
+
+    if {"orjson": orjson, "msgpack": msgpack}.get(serializer, True) is None:
+        logger.warning("Cache serializer %s is not installed, falling back to json", serializer)
+        serializer = "json"
+    if compression is not None and {"zstd": zstandard, "lz4": lz4_frame}[compression] is None:
+        logger.warning("Cache compression %s is not installed, storing payloads as is", compression)
+        compression = None
+    return serializer, compression
+
+
+@functools.lru_cache(maxsize=None)
+def _model_adapters(decoder) -> tuple[TypeAdapter, TypeAdapter] | None:
+    if isinstance(decoder, type) and issubclass(decoder, BaseModel):
+        return TypeAdapter(decoder), TypeAdapter(list[decoder])
+    return None
+
+
+def _coerce_result(decoder, adapters, result):
+    if adapters is None:
+        return result if decoder is None else _decode_cached(decoder, jsonable_encoder(result))
+    if isinstance(result, (list, tuple)):
+        return adapters[1].validate_python(list(result), from_attributes=True)
+    return adapters[0].validate_python(result, from_attributes=True)
+
+
+def _encode_entry(
+    value,
+    adapters,
+    serializer: str,
+    compression: str | None,
+    compress_threshold: int,
+    expires_at: float,
+    compute_time: float,
+) -> tuple[bytes, int]:
+    if isinstance(value, _CachedError):
+        body = json.dumps(value.to_payload(), ensure_ascii=False).encode()
+        return _ENTRY_HEADER.pack(_ERROR_SERIALIZER, expires_at, compute_time) + body, len(body)
+
+    is_list = isinstance(value, list)
+    body = None
+    if adapters is not None:
+        adapter = adapters[1] if is_list else adapters[0]
+        if serializer == "json":
+            body = adapter.dump_json(value)
+        else:
+            value = adapter.dump_python(value, mode="json")
+
+    if body is None:
+        if serializer == "orjson":
+            body = orjson.dumps(value, default=jsonable_encoder)
+        elif serializer == "msgpack":
+            body = msgpack.packb(value, default=jsonable_encoder)
+        else:
+            body = json.dumps(jsonable_encoder(value), ensure_ascii=False, default=str).encode()
+
+    size = len(body)
+    flags = _SERIALIZERS[serializer] | (_LIST_FLAG if is_list else 0)
+    if compression is not None and size >= compress_threshold:
+        if compression == "zstd":
+            body = zstandard.compress(body)
+        else:
+            body = lz4_frame.compress(body)
+        flags |= _COMPRESSIONS[compression] << 4
+
+    return _ENTRY_HEADER.pack(flags, expires_at, compute_time) + body, size
+
+
+def _decode_entry(raw: bytes, decoder, adapters):
+    if len(raw) < _ENTRY_HEADER.size:
+        return None
+    flags, expires_at, compute_time = _ENTRY_HEADER.unpack_from(raw)
+    serializer_id = flags & 0x0F
+    compression_id = (flags >> 4) & 0x07
+    body = raw[_ENTRY_HEADER.size:]
+
+    if compression_id == _COMPRESSIONS["zstd"]:
+        body = zstandard.decompress(body)
+    elif compression_id == _COMPRESSIONS["lz4"]:
+        body = lz4_frame.decompress(body)
+    elif compression_id:
+        return None
+
+    if serializer_id == _ERROR_SERIALIZER:
+        payload = json.loads(body)
+        error = _CachedError(payload["type"], payload["args"], payload["attrs"])
+        return error, expires_at, compute_time, len(body)
+
+    adapter = None
+    if adapters is not None:
+        adapter = adapters[1] if flags & _LIST_FLAG else adapters[0]
+
+    if serializer_id == _SERIALIZERS["json"]:
+        if adapter is not None:
+            return adapter.validate_json(body), expires_at, compute_time, len(body)
+        data = json.loads(body)
+    elif serializer_id == _SERIALIZERS["orjson"]:
+        data = orjson.loads(body)
+    elif serializer_id == _SERIALIZERS["msgpack"]:
+        data = msgpack.unpackb(body)
+    else:
+        return None
+
+    value = adapter.validate_python(data) if adapter is not None else _decode_cached(decoder, data)
+    return value, expires_at, compute_time, len(body)
+
+
+async def _tag_snapshot(redis_client: redis.Redis) -> int:
+    # Берется до загрузки из БД: все, что сброшено позже, запись в кэш отклонит
+    return int(await redis_client.get(_TAG_SEQUENCE_KEY) or 0)
+
+
+async def _write_entries(redis_client: redis.Redis, entries, ttl: int, snapshot: int) -> list[bool]:
+    keys = []
+    args = [snapshot, ttl]
+    for cache_key, payload, entry_tags in entries:
+        keys.append(cache_key)
+        for tag in entry_tags:
+            keys += [_tag_key(tag), _tag_version_key(tag)]
+        args += [payload, len(entry_tags)]
+
+    write = redis_client.register_script(_WRITE_ENTRIES_SCRIPT)
+    written = [bool(flag) for flag in await write(keys=keys, args=args)]
+    if not all(written):
+        _CACHE_STALE_WRITES.inc(amount=len(written) - sum(written))
+    return written
+
+
+async def _single_flight(cache_key: str, loader):
+    while True:
+        future = _inflight.get(cache_key)
+        if future is None:
+            break
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # Лидер отменен (клиент отвалился) — загрузку берет на себя следующий
+            if not future.cancelled() or asyncio.current_task().cancelling():
+                raise
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[cache_key] = future
+    try:
+        result = await loader()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        if _inflight.get(cache_key) is future:
+            del _inflight[cache_key]
+
+
+def _spawn_background(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _template_name(key: str) -> str:
+    return key.split(":{", 1)[0]
+
+
+def _record_lookup(template: str, result: str, amount: int = 1) -> None:
+    if not amount:
+        return
+    _CACHE_REQUESTS.inc(template, result, amount=amount)
+
+    holder = _request_cache_status.get()
+    if holder is None:
+        return
+    status = _RESULT_STATUS[result]
+    current = holder.get("status")
+    if current is None or _STATUS_PRIORITY[status] > _STATUS_PRIORITY[current]:
+        holder["status"] = status
+
+
+class CacheStatusMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Изменяемый контейнер: значения, записанные во вложенных контекстах, видны здесь
+        holder = {"status": None}
+        token = _request_cache_status.set(holder)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start" and holder["status"] is not None:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-cache", holder["status"].encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_cache_status.reset(token)
+
+
 def cacheable(
     ttl: int,
     key: str,
     exclude: Iterable[str] | None = None,
     decoder=None,
+    tags: Iterable[str] | None = None,
+    result_tags=None,
+    local_ttl: float | None = None,
+    lock_ttl: float | None = None,
+    stale_ttl: int = 0,
+    early_refresh_beta: float = 0.0,
+    serializer: str = "json",
+    compression: str | None = None,
+    compress_threshold: int = _COMPRESS_THRESHOLD,
+    cache_exceptions: tuple[type[Exception], ...] = (),
+    negative_ttl: int = 10,
 ):
+    tag_templates = list(tags or [])
+    cache_exceptions = tuple(cache_exceptions)
+    exception_types = {exc_type.__name__: exc_type for exc_type in cache_exceptions}
+    negative_ttl = min(negative_ttl, ttl)
     exclude_set = set(exclude or [])
-    exclude_set.update({"db", "current_user", "current_admin", "admin", "user", "background_tasks"})
+    exclude_set.update(_DEFAULT_EXCLUDE)
+    local_ttl = min(local_ttl, ttl) if local_ttl else None
+    serializer, compression = _check_codec(serializer, compression)
+    adapters = _model_adapters(decoder)
 
     def decorator(fn):
         sig = inspect.signature(fn)
+        uses_db = "db" in sig.parameters
+        build_key = _compile_template(key, fn, exclude_set)
+        template = _template_name(key)
+        tag_builders = [_compile_template(template, fn, exclude_set) for template in tag_templates]
+
+        def unwrap(value):
+            if isinstance(value, _CachedError):
+                raise value.rebuild(exception_types)
+            return value
 
         @functools.wraps(fn)
         async def wrapper(*args, **kwargs):
@@ -94,30 +774,173 @@ def cacheable(
             if redis_client is None:
                 return await fn(*args, **kwargs)
 
-            cache_key = _build_cache_key(key, fn, args, kwargs, exclude_set)
+            cache_key = f"api_cache:{build_key(args, kwargs)}"
 
-            try:
-                cached = await redis_client.get(cache_key)
-                if cached is not None:
-                    return _decode_cached(decoder, json.loads(cached))
-            except Exception:
-                logger.debug("Cache read failed for key %s", cache_key, exc_info=True)
+            local_cache = get_local_cache() if local_ttl else None
+            if local_cache is not None:
+                local = local_cache.get(cache_key)
+                if local is not None:
+                    _record_lookup(template, "hit_l1")
+                    return unwrap(local)
 
-            result = await fn(*args, **kwargs)
-            if decoder is not None:
-                result = _decode_cached(decoder, jsonable_encoder(result))
+            async def compute(call_args, call_kwargs):
+                try:
+                    snapshot = await _tag_snapshot(redis_client)
+                except Exception:
+                    snapshot = None
+                    logger.debug("Cache tag snapshot failed for key %s", cache_key, exc_info=True)
 
-            try:
-                payload = json.dumps(
-                    jsonable_encoder(result),
-                    ensure_ascii=False,
-                    default=str,
-                )
-                await redis_client.set(cache_key, payload, ex=ttl)
-            except Exception:
-                logger.debug("Cache write failed for key %s", cache_key, exc_info=True)
+                started = time.perf_counter()
+                try:
+                    result = _coerce_result(decoder, adapters, await fn(*call_args, **call_kwargs))
+                except cache_exceptions as exc:
+                    result = _CachedError.from_exception(exc)
+                elapsed = time.perf_counter() - started
+                _CACHE_LOAD_SECONDS.observe(template, value=elapsed)
 
-            return result
+                negative = isinstance(result, _CachedError)
+                entry_ttl = negative_ttl if negative else ttl
+                if snapshot is None:
+                    return result
+
+                try:
+                    payload, size = _encode_entry(
+                        result,
+                        adapters,
+                        serializer,
+                        compression,
+                        compress_threshold,
+                        expires_at=time.time() + entry_ttl,
+                        compute_time=elapsed,
+                    )
+                    # Для ошибки теги по результату не вычислить — хватает тегов из аргументов
+                    entry_tags = _resolve_tags(tag_builders, args, kwargs, None if negative else result_tags, result)
+                    written = await _write_entries(
+                        redis_client,
+                        [(cache_key, payload, entry_tags)],
+                        entry_ttl if negative else ttl + stale_ttl,
+                        snapshot,
+                    )
+                    if written[0]:
+                        _CACHE_BYTES.inc(template, "write", amount=len(payload))
+                        if local_cache is not None:
+                            local_cache.set(cache_key, result, size, _local_ttl(local_ttl, entry_ttl))
+                except Exception:
+                    _CACHE_ERRORS.inc(template, "write")
+                    logger.debug("Cache write failed for key %s", cache_key, exc_info=True)
+
+                return result
+
+            async def refresh():
+                refresh_key = f"api_cache:refresh:{cache_key}"
+                acquired = False
+                try:
+                    acquired = await redis_client.set(refresh_key, "1", nx=True, ex=_REFRESH_LOCK_TTL)
+                    if not acquired:
+                        return
+                    bound = sig.bind_partial(*args, **kwargs)
+                    if not uses_db:
+                        await compute(bound.args, bound.kwargs)
+                    else:
+                        # Сессия запроса к этому моменту уже закрыта. Заполнение кэша читает с primary,
+                        # иначе отстающая реплика вернет в кэш строку, только что снятую инвалидацией
+                        from backend.core.database import AsyncSessionLocal
+
+                        async with AsyncSessionLocal() as session:
+                            bound.arguments["db"] = session
+                            await compute(bound.args, bound.kwargs)
+                except Exception:
+                    _CACHE_ERRORS.inc(template, "refresh")
+                    logger.warning("Background cache refresh failed for key %s", cache_key, exc_info=True)
+                finally:
+                    _refreshing.discard(cache_key)
+                    if acquired:
+                        try:
+                            await redis_client.delete(refresh_key)
+                        except Exception:
+                            logger.debug("Cache refresh unlock failed for key %s", cache_key, exc_info=True)
+
+            def schedule_refresh() -> None:
+                if cache_key in _refreshing:
+                    return
+                _refreshing.add(cache_key)
+                _spawn_background(refresh())
+
+            async def read():
+                try:
+                    cached = await redis_client.get(cache_key)
+                    if cached is None:
+                        return _MISSING, None
+                    _CACHE_BYTES.inc(template, "read", amount=len(cached))
+                    entry = _decode_entry(cached, decoder, adapters)
+                    if entry is None:
+                        return _MISSING, None
+
+                    value, expires_at, compute_time, size = entry
+                    if isinstance(value, _CachedError) and value.type_name not in exception_types:
+                        return _MISSING, None
+                    now = time.time()
+                    if now >= expires_at:
+                        if now >= expires_at + stale_ttl:
+                            return _MISSING, None
+                        schedule_refresh()
+                        return value, "stale"
+
+                    # XFetch: чем ближе истечение и дороже пересчет, тем вероятнее ранний refresh
+                    if early_refresh_beta and now - compute_time * early_refresh_beta * math.log(1.0 - random.random()) >= expires_at:
+                        schedule_refresh()
+                    if local_cache is not None:
+                        local_cache.set(cache_key, value, size, _local_ttl(local_ttl, expires_at - now))
+                    return value, "hit"
+                except Exception:
+                    _CACHE_ERRORS.inc(template, "read")
+                    logger.debug("Cache read failed for key %s", cache_key, exc_info=True)
+                return _MISSING, None
+
+            async def load():
+                value, result = await read()
+                if value is not _MISSING:
+                    _record_lookup(template, result)
+                    return value
+                if not lock_ttl:
+                    _record_lookup(template, "miss")
+                    return await compute(args, kwargs)
+
+                lock = redis_client.lock(f"api_cache:lock:{cache_key}", timeout=lock_ttl)
+                try:
+                    acquired = await lock.acquire(blocking=False)
+                except Exception:
+                    _CACHE_ERRORS.inc(template, "lock")
+                    logger.debug("Cache lock failed for key %s", cache_key, exc_info=True)
+                    _record_lookup(template, "miss")
+                    return await compute(args, kwargs)
+
+                if not acquired:
+                    # Другой воркер уже грузит значение — ждем, пока оно появится в Redis
+                    deadline = time.monotonic() + lock_ttl
+                    while time.monotonic() < deadline:
+                        await asyncio.sleep(_LOCK_POLL_INTERVAL)
+                        value, _ = await read()
+                        if value is not _MISSING:
+                            _record_lookup(template, "coalesced")
+                            return value
+                    _record_lookup(template, "miss")
+                    return await compute(args, kwargs)
+
+                _record_lookup(template, "miss")
+
+                try:
+                    return await compute(args, kwargs)
+                finally:
+                    try:
+                        await lock.release()
+                    except Exception:
+                        logger.debug("Cache lock release failed for key %s", cache_key, exc_info=True)
+
+            if cache_key in _inflight:
+                # Значение уже грузит другой запрос этого процесса
+                _record_lookup(template, "coalesced")
+            return unwrap(await _single_flight(cache_key, load))
 
         wrapper.__signature__ = sig
         return wrapper
@@ -125,7 +948,93 @@ def cacheable(
     return decorator
 
 
+async def get_entities(
+    namespace: str,
+    ids: Iterable[int],
+    decoder,
+    loader,
+    ttl: int,
+    tag: str | None = None,
+    local_ttl: float | None = None,
+) -> list:
+    ids = list(ids)
+    adapters = _model_adapters(decoder)
+    found = {}
+
+    redis_client = get_redis()
+    local_cache = get_local_cache() if redis_client is not None and local_ttl else None
+    keys = {entity_id: f"api_cache:{namespace}:{entity_id}" for entity_id in ids}
+
+    if local_cache is not None:
+        for entity_id in ids:
+            local = local_cache.get(keys[entity_id])
+            if local is not None:
+                found[entity_id] = local
+
+    lookup = [entity_id for entity_id in ids if entity_id not in found]
+    if redis_client is not None:
+        _record_lookup(namespace, "hit_l1", len(ids) - len(lookup))
+    if redis_client is not None and lookup:
+        try:
+            cached = await redis_client.mget([keys[entity_id] for entity_id in lookup])
+            for entity_id, raw in zip(lookup, cached):
+                if raw is None:
+                    continue
+                _CACHE_BYTES.inc(namespace, "read", amount=len(raw))
+                entry = _decode_entry(raw, decoder, adapters)
+                if entry is None:
+                    continue
+                found[entity_id] = entry[0]
+                if local_cache is not None:
+                    local_cache.set(keys[entity_id], entry[0], entry[3], _local_ttl(local_ttl, entry[1] - time.time()))
+        except Exception:
+            _CACHE_ERRORS.inc(namespace, "read")
+            logger.debug("Entity cache read failed for %s", namespace, exc_info=True)
+
+    missing = [entity_id for entity_id in ids if entity_id not in found]
+    if redis_client is not None:
+        _record_lookup(namespace, "hit", len(lookup) - len(missing))
+        _record_lookup(namespace, "miss", len(missing))
+    if missing:
+        snapshot = None
+        if redis_client is not None:
+            try:
+                snapshot = await _tag_snapshot(redis_client)
+            except Exception:
+                logger.debug("Entity cache tag snapshot failed for %s", namespace, exc_info=True)
+
+        started = time.perf_counter()
+        loaded = _coerce_result(decoder, adapters, list(await loader(missing)))
+        _CACHE_LOAD_SECONDS.observe(namespace, value=time.perf_counter() - started)
+        entries = []
+        sizes = []
+        for entity in loaded:
+            found[entity.id] = entity
+            if snapshot is None:
+                continue
+            cache_key = f"api_cache:{namespace}:{entity.id}"
+            payload, size = _encode_entry(entity, adapters, "json", None, 0, time.time() + ttl, 0.0)
+            entries.append((cache_key, payload, [f"{tag}:{entity.id}"] if tag else []))
+            sizes.append((entity, size))
+        if entries:
+            try:
+                written = await _write_entries(redis_client, entries, ttl, snapshot)
+                _CACHE_BYTES.inc(
+                    namespace, "write", amount=sum(len(entry[1]) for entry, ok in zip(entries, written) if ok)
+                )
+                if local_cache is not None:
+                    for (cache_key, _, _), (entity, size), ok in zip(entries, sizes, written):
+                        if ok:
+                            local_cache.set(cache_key, entity, size, _local_ttl(local_ttl, ttl))
+            except Exception:
+                _CACHE_ERRORS.inc(namespace, "write")
+                logger.debug("Entity cache write failed for %s", namespace, exc_info=True)
+
+    return [found[entity_id] for entity_id in ids if entity_id in found]
+
+
 async def _delete_pattern(redis_client: redis.Redis, pattern: str) -> None:
+    started = time.perf_counter()
     cursor = 0
     while True:
         cursor, keys = await redis_client.scan(cursor=cursor, match=pattern, count=200)
@@ -133,13 +1042,56 @@ async def _delete_pattern(redis_client: redis.Redis, pattern: str) -> None:
             await redis_client.delete(*keys)
         if cursor == 0:
             break
+    _CACHE_INVALIDATION_SECONDS.observe("pattern", value=time.perf_counter() - started)
+
+
+async def _delete_tags(redis_client: redis.Redis, tags: Iterable[str]) -> set[str]:
+    tag_keys = [_tag_key(tag) for tag in tags]
+    if not tag_keys:
+        return set()
+
+    started = time.perf_counter()
+    # Версии тегов растут в том же скрипте: загрузка, начатая до сброса, свою запись уже не сделает
+    delete = redis_client.register_script(_DELETE_TAGS_SCRIPT)
+    script_keys = [_TAG_SEQUENCE_KEY]
+    for tag in tags:
+        script_keys += [_tag_key(tag), _tag_version_key(tag)]
+    members = await delete(keys=script_keys, args=[_TAG_VERSION_TTL])
 
+    keys = {k.decode() if isinstance(k, bytes) else k for k in members}
+    if keys:
+        await redis_client.delete(*keys)
+    _CACHE_INVALIDATION_SECONDS.observe("tags", value=time.perf_counter() - started)
+    return keys
 
-def cache_invalidate(patterns: Iterable[str]):
-    patterns_list = list(patterns)
+
+async def invalidate_tags(*tags: str) -> None:
+    redis_client = get_redis()
+    if redis_client is None or not tags:
+        return
+
+    try:
+        keys = await _delete_tags(redis_client, tags)
+        await _publish_invalidation(redis_client, keys=keys)
+    except Exception:
+        _CACHE_INVALIDATION_ERRORS.inc("tags")
+        logger.debug("Cache invalidation failed for tags %s", tags, exc_info=True)
+
+
+def cache_invalidate(
+    patterns: Iterable[str] | None = None,
+    tags: Iterable[str] | None = None,
+    result_tags=None,
+    exclude: Iterable[str] | None = None,
+):
+    patterns_list = list(patterns or [])
+    tag_templates = list(tags or [])
+    exclude_set = set(exclude or [])
+    exclude_set.update(_DEFAULT_EXCLUDE)
 
     def decorator(fn):
         sig = inspect.signature(fn)
+        tag_builders = [_compile_template(template, fn, exclude_set) for template in tag_templates]
 
         @functools.wraps(fn)
         async def wrapper(*args, **kwargs):
@@ -153,9 +1105,21 @@ def cache_invalidate(patterns: Iterable[str]):
                 full_pattern = f"api_cache:{pattern}"
                 try:
                     await _delete_pattern(redis_client, full_pattern)
+                    await _publish_invalidation(redis_client, patterns=[full_pattern])
                 except Exception:
+                    _CACHE_INVALIDATION_ERRORS.inc("pattern")
                     logger.debug("Cache invalidation failed for pattern %s", full_pattern, exc_info=True)
 
+            if tag_templates or result_tags is not None:
+                invalidated: set[str] = set()
+                try:
+                    invalidated = _resolve_tags(tag_builders, args, kwargs, result_tags, result)
+                    keys = await _delete_tags(redis_client, invalidated)
+                    await _publish_invalidation(redis_client, keys=keys)
+                except Exception:
+                    _CACHE_INVALIDATION_ERRORS.inc("tags")
+                    logger.debug("Cache invalidation failed for tags %s", invalidated, exc_info=True)
+
             return result
 
         wrapper.__signature__ = sig
@@ -4,8 +4,56 @@ class Settings(BaseSettings):
     DEBUG: bool = False
     DATABASE_URL: str
     TEST_DATABASE_URL: str
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_USE_NULLPOOL: bool = False
+    READ_REPLICA_URLS: list[str] = []
+    READ_REPLICA_HEALTH_CHECK_INTERVAL: float = 5
+    READ_REPLICA_HEALTH_CHECK_TIMEOUT: float = 1
+    READ_YOUR_WRITES_SECONDS: int = 0
+    SEARCH_SIMILARITY_THRESHOLD: float = 0.3
+    SEARCH_WORD_SIMILARITY_THRESHOLD: float = 0.4
+    SEARCH_PRICE_BUCKETS: list[int] = [1000, 5000, 20000, 50000, 100000]
+    SEARCH_MAX_TERMS: int = 8
     SECRET_KEY: str
     REDIS_URL: str | None = None
+    CACHE_L1_ENABLED: bool = False
+    CACHE_L1_MAX_ENTRIES: int = 10_000
+    CACHE_L1_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_L1_TRACKING: bool = False
+    CACHE_DEBUG_HEADERS: bool = False
+    CACHE_WARMUP_ON_STARTUP: bool = False
+    CACHE_WARMUP_PAGES: int = 3
+    CACHE_WARMUP_PAGE_SIZE: int = 10
+    CACHE_WARMUP_TOP_PRODUCTS: int = 50
+    CACHE_WARMUP_CONCURRENCY: int = 4
+    PRODUCT_VIEWS_FLUSH_SECONDS: int = 5
+    PRODUCT_VIEWS_KEEP: int = 1000
+    AUTOCOMPLETE_ENABLED: bool = False
+    AUTOCOMPLETE_POPULARITY_TOP: int = 1000
+    AUTOCOMPLETE_POPULARITY_REFRESH_SECONDS: int = 60
+    INVENTORY_REDIS_ENABLED: bool = False
+    INVENTORY_SHARDS: int = 8
+    INVENTORY_RECONCILE_INTERVAL: float = 1.0
+    INVENTORY_RECONCILE_BATCH: int = 1000
+    INVENTORY_RECONCILER_ON_STARTUP: bool = False
+    CART_HOLD_TTL_SECONDS: int = 900
+    CART_HOLD_SWEEP_INTERVAL: float = 5.0
+    CART_HOLD_SWEEP_BATCH: int = 1000
+    CART_HOLD_SWEEPER_ON_STARTUP: bool = False
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+    IDEMPOTENCY_LOCK_TTL_SECONDS: int = 30
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    OUTBOX_RELAY_ON_STARTUP: bool = False
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_MAX_BACKOFF_SECONDS: float = 60.0
+    OUTBOX_CLAIM_LEASE_SECONDS: float = 60.0
 
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
@@ -24,6 +72,10 @@ class Settings(BaseSettings):
     RABBITMQ_DLQ_QUEUE: str = "email.order_confirmation.dlq"
     RABBITMQ_RETRY_DELAY_SECONDS: int = 30
     RABBITMQ_MAX_RETRIES: int = 5
+    RABBITMQ_PUBLISH_TIMEOUT: float = 10.0
+    RABBITMQ_PUBLISHER_POOL_SIZE: int = 4
+    EMAIL_DEDUP_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    EMAIL_DEDUP_PROCESSING_SECONDS: int = 120
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,12 +1,115 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
     async_sessionmaker, create_async_engine, AsyncSession
 )
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from backend.core.cache import get_redis
 from backend.core.config import settings
+from backend.core.metrics import Counter, Gauge, Summary
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+_DB_POOL_CHECKOUT_SECONDS = Summary(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a pooled database connection",
+    ("engine",)
+)
+_DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Connection checkouts that hit pool_timeout",
+    ("engine",)
+)
+_DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Database connections currently checked out of the pool",
+    ("engine",)
+)
+
+
+class _CheckoutTimingMixin:
+    # primary или хост реплики; задается в instrument_pool
+    metrics_engine = "primary"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            _DB_POOL_CHECKOUT_TIMEOUTS.inc(self.metrics_engine)
+            raise
+        finally:
+            _DB_POOL_CHECKOUT_SECONDS.observe(self.metrics_engine, value=time.perf_counter() - started)
+
+    def recreate(self):
+        # Пул пересоздается после dispose/инвалидации: слушатели переезжают вместе с dispatch, метка — здесь
+        pool = super().recreate()
+        pool.metrics_engine = self.metrics_engine
+        return pool
+
+
+class MeteredQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class MeteredNullPool(_CheckoutTimingMixin, NullPool):
+    pass
+
+
+def _engine_options(url: str = DATABASE_URL) -> dict:
+    options = {"echo": settings.DB_ECHO, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+
+    if settings.DB_USE_NULLPOOL:
+        # PgBouncer в режиме transaction pooling сам держит пул — локальный не нужен
+        options["poolclass"] = MeteredNullPool
+    else:
+        options.update(
+            poolclass=MeteredQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+
+    if make_url(url).get_driver_name() == "asyncpg":
+        # За PgBouncer в transaction pooling соседние транзакции попадают на разные серверные соединения:
+        # подготовленные выражения там ломаются ("already exists"/"does not exist"), поэтому кэш выключаем
+        cache_size = 0 if settings.DB_USE_NULLPOOL else settings.DB_STATEMENT_CACHE_SIZE
+        options["connect_args"] = {
+            "statement_cache_size": cache_size,
+            "prepared_statement_cache_size": cache_size,
+        }
+
+    return options
+
+
+def instrument_pool(pool, name: str) -> None:
+    # Каждый движок (primary и каждая реплика) метится своим именем, чтобы исчерпание пула было видно по отдельности
+    pool.metrics_engine = name
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        _DB_POOL_IN_USE.inc(name)
+
+    def on_checkin(dbapi_connection, connection_record):
+        _DB_POOL_IN_USE.dec(name)
+
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
+
+
+engine = create_async_engine(DATABASE_URL, **_engine_options())
+instrument_pool(engine.sync_engine.pool, "primary")
+
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -16,6 +119,108 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+
+class ReadReplica:
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_async_engine(url, **_engine_options(url))
+        instrument_pool(self.engine.sync_engine.pool, f"replica:{make_url(url).host}")
+        self.session_factory = async_sessionmaker(
+            self.engine,
+            class_=AsyncSession,
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False
+        )
+        self.healthy = True
+        self.checked_at = 0.0
+
+    async def is_available(self) -> bool:
+        now = time.monotonic()
+        if now - self.checked_at < settings.READ_REPLICA_HEALTH_CHECK_INTERVAL:
+            return self.healthy
+
+        # Отмечаем время заранее, чтобы параллельные запросы не проверяли реплику одновременно
+        self.checked_at = now
+        try:
+            async with asyncio.timeout(settings.READ_REPLICA_HEALTH_CHECK_TIMEOUT):
+                async with self.engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+        except Exception:
+            if self.healthy:
+                logger.warning("Read replica %s is unavailable", make_url(self.url).host, exc_info=True)
+            self.healthy = False
+        else:
+            self.healthy = True
+        return self.healthy
+
+    def mark_down(self) -> None:
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+read_replicas = [ReadReplica(url) for url in settings.READ_REPLICA_URLS]
+_replica_cycle = itertools.count()
+
+
+async def _pick_replica() -> ReadReplica | None:
+    if not read_replicas:
+        return None
+
+    start = next(_replica_cycle)
+    for offset in range(len(read_replicas)):
+        replica = read_replicas[(start + offset) % len(read_replicas)]
+        if await replica.is_available():
+            return replica
+    return None
+
+
+@asynccontextmanager
+async def read_session():
+    replica = await _pick_replica()
+    # Нет живых реплик — читаем с primary
+    session_factory = replica.session_factory if replica is not None else AsyncSessionLocal
+
+    async with session_factory() as session:
+        try:
+            yield session
+        except (exc.OperationalError, exc.InterfaceError):
+            if replica is not None:
+                replica.mark_down()
+            raise
+
+
+def _recent_write_key(user_id: int) -> str:
+    return f"db:recent_write:{user_id}"
+
+
+async def mark_recent_write(user_id: int) -> None:
+    redis_client = get_redis()
+    if not settings.READ_YOUR_WRITES_SECONDS or redis_client is None:
+        return
+
+    try:
+        await redis_client.set(_recent_write_key(user_id), "1", ex=settings.READ_YOUR_WRITES_SECONDS)
+    except Exception:
+        logger.debug("Recent write mark failed for user %s", user_id, exc_info=True)
+
+
+async def has_recent_write(user_id: int) -> bool:
+    if not settings.READ_YOUR_WRITES_SECONDS or not read_replicas:
+        return False
+
+    redis_client = get_redis()
+    # Без Redis пометки не хранятся — безопаснее читать с primary
+    if redis_client is None:
+        return True
+
+    try:
+        return bool(await redis_client.exists(_recent_write_key(user_id)))
+    except Exception:
+        logger.debug("Recent write check failed for user %s", user_id, exc_info=True)
+        return True
+
 class Base(DeclarativeBase):
     pass
 
@@ -27,4 +232,14 @@ async def get_db() -> AsyncSession:
             await session.rollback()
             raise
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+async def get_read_db() -> AsyncSession:
+    async with read_session() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
@@ -0,0 +1,16 @@
+from backend.core.exceptions.base import AppError
+
+class IdempotencyKeyInvalidError(AppError):
+    default_message = "Некорректный Idempotency-Key: нужна непустая строка до 255 печатных символов"
+    error_code = "idempotency_key_invalid"
+    status_code = 400
+
+class IdempotencyKeyReusedError(AppError):
+    default_message = "Idempotency-Key уже использован для запроса с другими данными"
+    error_code = "idempotency_key_reused"
+    status_code = 422
+
+class IdempotencyRequestInProgressError(AppError):
+    default_message = "Запрос с этим Idempotency-Key еще выполняется, повторите позже"
+    error_code = "idempotency_request_in_progress"
+    status_code = 409
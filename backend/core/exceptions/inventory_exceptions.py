@@ -0,0 +1,11 @@
+from backend.core.exceptions.base import AppError
+
+class InventoryUnavailableError(AppError):
+    default_message = "Склад временно недоступен, повторите попытку"
+    error_code = "inventory_unavailable"
+    status_code = 503
+
+class ProductInventoryManagedError(AppError):
+    default_message = "Остатком товара управляет Redis-склад: отключите этот режим перед изменением остатка"
+    error_code = "product_inventory_managed"
+    status_code = 409
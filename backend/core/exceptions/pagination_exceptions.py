@@ -0,0 +1,6 @@
+from backend.core.exceptions.base import AppError
+
+class InvalidCursorError(AppError):
+    default_message = "Некорректный курсор пагинации"
+    error_code = "invalid_cursor"
+    status_code = 400
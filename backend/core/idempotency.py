@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from backend.core.cache import get_redis
+from backend.core.config import settings
+from backend.core.metrics import Counter
+from backend.core.exceptions.base import AppError
+from backend.core.exceptions.idempotency_exceptions import *
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+_RECORD_KEY = "idempotency:{scope}:{user_id}:{key}"
+_POLL_INTERVAL = 0.05
+_MAX_KEY_LENGTH = 255
+
+# Ждущие дубли этого процесса просыпаются сразу по завершении первого запроса, остальные опрашивают Redis
+_waiters: dict[str, asyncio.Event] = {}
+# Сколько дублей ждет событие: если первый запрос идет в другом процессе, будить их некому,
+# и запись снимает последний ждущий
+_waiting: dict[str, int] = {}
+
+_IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Requests carrying an Idempotency-Key by outcome",
+    ("scope", "result"),
+)
+
+
+def _validate_key(key: str) -> None:
+    if not key or len(key) > _MAX_KEY_LENGTH or not key.isprintable():
+        raise IdempotencyKeyInvalidError()
+
+
+def request_fingerprint(payload: Any) -> str:
+    data = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _replay(record: dict, fingerprint: str) -> JSONResponse:
+    # Тот же ключ с другим телом — ошибка клиента, а не повтор
+    if record["fingerprint"] != fingerprint:
+        raise IdempotencyKeyReusedError()
+
+    return JSONResponse(record["body"], status_code=record["status"], headers={REPLAYED_HEADER: "true"})
+
+
+async def _read(redis_client, record_key: str) -> Optional[dict]:
+    raw = await redis_client.get(record_key)
+    return None if raw is None else json.loads(raw)
+
+
+async def _store(redis_client, record_key: str, fingerprint: str, status: int, body) -> None:
+    record = {"fingerprint": fingerprint, "status": status, "body": body}
+    try:
+        await redis_client.set(record_key, json.dumps(record), ex=settings.IDEMPOTENCY_TTL_SECONDS)
+    except Exception:
+        # Без записи повтор дойдет до сервиса, и дубль заказа отсечет уникальный ключ в Postgres
+        logger.warning("Idempotency record write failed for %s", record_key, exc_info=True)
+
+
+async def _wait_for_leader(record_key: str) -> None:
+    event = _waiters.setdefault(record_key, asyncio.Event())
+    _waiting[record_key] = _waiting.get(record_key, 0) + 1
+    try:
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(event.wait(), _POLL_INTERVAL)
+    finally:
+        _waiting[record_key] -= 1
+        if not _waiting[record_key]:
+            del _waiting[record_key]
+            if _waiters.get(record_key) is event:
+                del _waiters[record_key]
+
+
+def _wake_waiters(record_key: str) -> None:
+    event = _waiters.pop(record_key, None)
+    if event is not None:
+        event.set()
+
+
+async def idempotent(
+    scope: str,
+    user_id: int,
+    key: Optional[str],
+    payload: Any,
+    handler: Callable[[], Awaitable[Any]],
+    encoder: Callable[[Any], Any]
+):
+    if key is None:
+        return encoder(await handler())
+
+    _validate_key(key)
+
+    redis_client = get_redis()
+
+    if redis_client is None:
+        _IDEMPOTENCY_REQUESTS.inc(scope, "unprotected")
+        return encoder(await handler())
+
+    record_key = _RECORD_KEY.format(scope=scope, user_id=user_id, key=key)
+    fingerprint = request_fingerprint(payload)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+
+    try:
+        while True:
+            record = await _read(redis_client, record_key)
+
+            if record is not None:
+                _IDEMPOTENCY_REQUESTS.inc(scope, "replayed")
+                return _replay(record, fingerprint)
+
+            lock = redis_client.lock(f"{record_key}:lock", timeout=settings.IDEMPOTENCY_LOCK_TTL_SECONDS)
+
+            if await lock.acquire(blocking=False):
+                break
+
+            # Такой же запрос уже выполняется — ждем его ответ, а не запускаем оформление второй раз
+            if time.monotonic() >= deadline:
+                _IDEMPOTENCY_REQUESTS.inc(scope, "in_progress")
+                raise IdempotencyRequestInProgressError()
+
+            await _wait_for_leader(record_key)
+    except AppError:
+        raise
+    except Exception:
+        logger.warning("Idempotency store unavailable for %s", record_key, exc_info=True)
+        _IDEMPOTENCY_REQUESTS.inc(scope, "unprotected")
+        return encoder(await handler())
+
+    try:
+        # Предыдущий владелец мог записать ответ между чтением и захватом блокировки
+        record = await _read(redis_client, record_key)
+
+        if record is not None:
+            _IDEMPOTENCY_REQUESTS.inc(scope, "replayed")
+            return _replay(record, fingerprint)
+
+        try:
+            result = await handler()
+        except AppError as exc:
+            # Отказ по бизнес-правилам повторяется как есть; 5xx не сохраняем, чтобы повтор мог пройти
+            if exc.status_code < 500:
+                await _store(redis_client, record_key, fingerprint, exc.status_code, {"message": exc.message, "code": exc.error_code})
+            raise
+
+        body = encoder(result)
+        await _store(redis_client, record_key, fingerprint, 200, body)
+        _IDEMPOTENCY_REQUESTS.inc(scope, "executed")
+
+        return body
+    finally:
+        try:
+            await lock.release()
+        except Exception:
+            logger.debug("Idempotency lock release failed for %s", record_key, exc_info=True)
+        _wake_waiters(record_key)
@@ -78,50 +78,146 @@ async def setup_rabbitmq() -> None:
     _topology_ready = True
 
 
-async def publisher_email_event(payload: dict) -> None:
-    await setup_rabbitmq()
-
-    connection = await _get_connection()
-    channel = await connection.channel(publisher_confirms=True)
-    email_exchange = await channel.get_exchange(settings.RABBITMQ_EMAIL_EXCHANGE)
-
-    message = aio_pika.Message(
+def _build_message(payload: dict, message_id: Optional[str] = None) -> aio_pika.Message:
+    return aio_pika.Message(
         body=json.dumps(payload).encode(),
         delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
         content_type="application/json",
+        message_id=message_id,
     )
 
-    last_error: Optional[Exception] = None
-    try:
-        for attempt in range(1, settings.RABBITMQ_MAX_RETRIES + 1):
-            try:
-                await email_exchange.publish(
-                    message, routing_key=settings.RABBITMQ_EMAIL_QUEUE
-                )
-                return
-            except Exception as exc:  # pragma: no cover - depends on broker state
-                last_error = exc
-                delay = min(2 ** attempt, 10)
-                logger.warning(
-                    "RabbitMQ publish failed (attempt %s/%s). Retrying in %ss.",
-                    attempt,
-                    settings.RABBITMQ_MAX_RETRIES,
-                    delay,
-                    exc_info=True,
-                )
-                await asyncio.sleep(delay)
-        logger.error("RabbitMQ publish failed after retries.", exc_info=last_error)
-        if last_error:
-            raise last_error
-    finally:
+
+class _PooledChannel:
+
+    def __init__(self, channel: aio_pika.abc.AbstractChannel):
+        self.channel = channel
+        self.in_flight = 0
+        # Объекты exchange привязаны к каналу, поэтому кэш живет вместе с ним
+        self.exchanges: dict[str, aio_pika.abc.AbstractExchange] = {}
+
+    async def get_exchange(self, name: str) -> aio_pika.abc.AbstractExchange:
+        exchange = self.exchanges.get(name)
+        if exchange is None:
+            exchange = self.exchanges[name] = await self.channel.get_exchange(name)
+        return exchange
+
+
+class RabbitPublisher:
+
+    def __init__(self, pool_size: Optional[int] = None):
+        self._pool_size = pool_size
+        self._channels: list[_PooledChannel] = []
+        self._opening: Optional[asyncio.Lock] = None
+
+    async def _open_channel(self) -> _PooledChannel:
+        await setup_rabbitmq()
+        connection = await _get_connection()
+
+        pooled = _PooledChannel(await connection.channel(publisher_confirms=True))
+        self._channels.append(pooled)
+
+        return pooled
+
+    async def _acquire(self) -> _PooledChannel:
+        # Каналы общие: подтверждения на одном канале конвейеризуются, поэтому публикация
+        # не держит канал монопольно, а берет наименее загруженный. Новый канал открывается,
+        # только когда все заняты и пул не заполнен
+        self._channels = [pooled for pooled in self._channels if not pooled.channel.is_closed]
+        pool_size = self._pool_size or settings.RABBITMQ_PUBLISHER_POOL_SIZE
+        pooled = min(self._channels, key=lambda item: item.in_flight, default=None)
+
+        if pooled is None or (pooled.in_flight and len(self._channels) < pool_size):
+            if self._opening is None:
+                self._opening = asyncio.Lock()
+
+            async with self._opening:
+                self._channels = [item for item in self._channels if not item.channel.is_closed]
+                idle = next((item for item in self._channels if not item.in_flight), None)
+
+                if idle is not None:
+                    pooled = idle
+                elif len(self._channels) < pool_size:
+                    pooled = await self._open_channel()
+                else:
+                    pooled = min(self._channels, key=lambda item: item.in_flight)
+
+        pooled.in_flight += 1
+
+        return pooled
+
+    async def publish(
+        self,
+        exchange_name: str,
+        routing_key: str,
+        payload: dict,
+        message_id: Optional[str] = None
+    ) -> None:
+        pooled = await self._acquire()
+
         try:
-            await channel.close()
-        except Exception:
-            logger.debug("RabbitMQ channel close failed.", exc_info=True)
+            exchange = await pooled.get_exchange(exchange_name)
+            await exchange.publish(
+                _build_message(payload, message_id),
+                routing_key=routing_key,
+                timeout=settings.RABBITMQ_PUBLISH_TIMEOUT,
+            )
+        finally:
+            pooled.in_flight -= 1
+
+    async def publish_batch(self, messages: list[tuple[str, str, dict, Optional[str]]]) -> list[Optional[Exception]]:
+        # (exchange, routing_key, payload, message_id) -> ошибка по каждому сообщению или None, если брокер подтвердил
+        if not messages:
+            return []
+
+        pooled = await self._acquire()
+
+        try:
+            exchanges = {}
+            for exchange_name, _, _, _ in messages:
+                if exchange_name not in exchanges:
+                    exchanges[exchange_name] = await pooled.get_exchange(exchange_name)
+
+            # Публикуем все сразу: подтверждения приходят пачкой, а не по round trip на сообщение
+            results = await asyncio.gather(
+                *(
+                    exchanges[exchange_name].publish(
+                        _build_message(payload, message_id),
+                        routing_key=routing_key,
+                        timeout=settings.RABBITMQ_PUBLISH_TIMEOUT,
+                    )
+                    for exchange_name, routing_key, payload, message_id in messages
+                ),
+                return_exceptions=True,
+            )
+        finally:
+            pooled.in_flight -= 1
+
+        return [result if isinstance(result, Exception) else None for result in results]
+
+    async def close(self) -> None:
+        channels, self._channels = self._channels, []
+
+        for pooled in channels:
+            await _close_channel(pooled.channel)
+
+
+async def _close_channel(channel: aio_pika.abc.AbstractChannel) -> None:
+    try:
+        await channel.close()
+    except Exception:
+        logger.debug("RabbitMQ channel close failed.", exc_info=True)
+
+
+publisher = RabbitPublisher()
+
+
+async def publish_batch(messages: list[tuple[str, str, dict, Optional[str]]]) -> list[Optional[Exception]]:
+    return await publisher.publish_batch(messages)
 
 
 async def close_rabbitmq() -> None:
     global _connection, _topology_ready
+    await publisher.close()
     if _connection is None:
         return
     try:
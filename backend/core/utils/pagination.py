@@ -0,0 +1,114 @@
+import base64
+import binascii
+import json
+from typing import Iterable, Optional
+
+from fastapi import Response
+
+from backend.core.exceptions.pagination_exceptions import InvalidCursorError
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PREV_CURSOR_HEADER = "X-Prev-Cursor"
+
+
+def _encode_payload(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_payload(token: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursorError()
+
+    if not isinstance(payload, dict):
+        raise InvalidCursorError()
+
+    return payload
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def encode_cursor(value: int) -> str:
+    return _encode_payload({"id": value})
+
+
+def decode_cursor(token: Optional[str]) -> Optional[int]:
+    if token is None:
+        return None
+
+    value = _decode_payload(token).get("id")
+
+    if not _is_int(value):
+        raise InvalidCursorError()
+
+    return value
+
+
+def encode_rank_cursor(rank: float, value: int) -> str:
+    return _encode_payload({"rank": rank, "id": value})
+
+
+def decode_rank_cursor(token: Optional[str]) -> Optional[tuple[float, int]]:
+    if token is None:
+        return None
+
+    payload = _decode_payload(token)
+    rank, value = payload.get("rank"), payload.get("id")
+
+    if not isinstance(rank, (int, float)) or isinstance(rank, bool) or not _is_int(value):
+        raise InvalidCursorError()
+
+    return float(rank), value
+
+
+class CursorParams:
+
+    def __init__(self, after: Optional[str] = None, before: Optional[str] = None):
+        if after is not None and before is not None:
+            raise InvalidCursorError("Нельзя передавать after и before одновременно")
+
+        self.after = decode_cursor(after)
+        self.before = decode_cursor(before)
+
+
+def apply_keyset(query, column, after: Optional[int] = None, before: Optional[int] = None, descending: bool = False):
+    if after is not None:
+        query = query.where(column < after if descending else column > after)
+
+    if before is not None:
+        query = query.where(column > before if descending else column < before)
+
+    # Для before идем в обратную сторону от курсора, а страницу потом разворачиваем
+    ascending = descending == (before is not None)
+
+    return query.order_by(column.asc() if ascending else column.desc())
+
+
+def set_cursor_headers(
+    response: Response,
+    ids: Iterable[int],
+    limit: int,
+    cursor: CursorParams,
+    skip: int = 0
+) -> None:
+    ids = list(ids)
+
+    if not ids:
+        return
+
+    if cursor.before is not None:
+        has_next, has_prev = True, len(ids) == limit
+    else:
+        has_next, has_prev = len(ids) == limit, cursor.after is not None or skip > 0
+
+    if has_next:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(ids[-1])
+
+    if has_prev:
+        response.headers[PREV_CURSOR_HEADER] = encode_cursor(ids[0])
@@ -1,9 +1,10 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 
 from backend.models.category import Category
 from backend.schemas.category import CategoryCreate, CategoryUpdate
+from backend.core.utils.pagination import apply_keyset
 
 class CategoryCRUD:
 
@@ -11,20 +12,26 @@ class CategoryCRUD:
     async def get_all_categories(
         db: AsyncSession,
         skip: int = 0,
-        limit: int = 10
+        limit: int = 10,
+        after: Optional[int] = None,
+        before: Optional[int] = None
     ) -> List[Category]:
-        query = select(Category).where(Category.is_delete == False).offset(skip).limit(limit)
+        query = select(Category).where(Category.is_delete == False)
 
-        categories = await db.execute(query)
+        query = apply_keyset(query, Category.id, after, before).offset(skip).limit(limit)
 
-        return categories.scalars().all()
+        categories = (await db.execute(query)).scalars().all()
+
+        return categories[::-1] if before is not None else categories
     
     @staticmethod
     async def get_all_categories_for_admin(
         db: AsyncSession,
         is_delete: bool,
         skip: int = 0,
-        limit: int = 10
+        limit: int = 10,
+        after: Optional[int] = None,
+        before: Optional[int] = None
     ) -> List[Category]:
         
         query = select(Category)
@@ -32,11 +39,11 @@ class CategoryCRUD:
         if is_delete is not None:
             query = query.where(Category.is_delete == is_delete)
 
-        query = query.offset(skip).limit(limit)
+        query = apply_keyset(query, Category.id, after, before).offset(skip).limit(limit)
 
-        result = await db.execute(query)
+        categories = (await db.execute(query)).scalars().all()
 
-        return result.scalars().all()
+        return categories[::-1] if before is not None else categories
 
     @staticmethod
     async def get_category_by_id(
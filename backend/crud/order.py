@@ -1,12 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, func
 from sqlalchemy.orm import selectinload, joinedload
 from decimal import Decimal
+from datetime import timedelta
 from typing import Optional, List
 
 from backend.models.order import Order
 from backend.schemas.order import OrderCreate, OrderUpdate
 from backend.core.utils.order_status_enums import OrderStatus
+from backend.core.utils.pagination import apply_keyset
 
 class OrderCRUD:
 
@@ -28,12 +30,23 @@ class OrderCRUD:
         return result.scalar_one_or_none()
     
     @staticmethod
-    async def _create_order_record(db: AsyncSession, user_id: int, total_price: Decimal, items: list) -> Order:
+    async def _create_order_record(
+        db: AsyncSession,
+        user_id: int,
+        total_price: Decimal,
+        items: list,
+        idempotency_key: Optional[str] = None,
+        idempotency_scope: Optional[str] = None,
+        idempotency_fingerprint: Optional[str] = None
+    ) -> Order:
         order = Order(
             user_id=user_id,
             total_price=total_price,
             status=OrderStatus.NEW,
-            items=items
+            items=items,
+            idempotency_key=idempotency_key,
+            idempotency_scope=idempotency_scope,
+            idempotency_fingerprint=idempotency_fingerprint
         )
         
         db.add(order)
@@ -41,6 +54,44 @@ class OrderCRUD:
 
         return order
     
+    @staticmethod
+    async def get_order_by_idempotency_key(
+        db: AsyncSession,
+        user_id: int,
+        idempotency_key: str
+    ) -> Order | None:
+        
+        result = await db.execute(
+            select(Order)
+            .options(
+                selectinload(Order.items),
+                selectinload(Order.user)
+            )
+            .where(Order.user_id == user_id, Order.idempotency_key == idempotency_key)
+        )
+
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def release_expired_idempotency_key(
+        db: AsyncSession,
+        user_id: int,
+        idempotency_key: str,
+        ttl: int
+    ) -> None:
+
+        # Ключ живет столько же, сколько запись в Redis; после этого его можно использовать снова
+        await db.execute(
+            update(Order)
+            .where(
+                Order.user_id == user_id,
+                Order.idempotency_key == idempotency_key,
+                Order.created_at <= func.now() - timedelta(seconds=ttl)
+            )
+            .values(idempotency_key=None, idempotency_scope=None, idempotency_fingerprint=None)
+            .execution_options(synchronize_session=False)
+        )
+    
     @staticmethod
     async def edit_order_status_by_id(
         db: AsyncSession,
@@ -66,7 +117,9 @@ class OrderCRUD:
         user_id: Optional[int] = None,
         status: Optional[OrderStatus] = None,
         skip: int = 0,
-        limit: int = 10
+        limit: int = 10,
+        after: Optional[int] = None,
+        before: Optional[int] = None
     ) -> List[Order]:
         
         query = select(Order).options(
@@ -80,11 +133,11 @@ class OrderCRUD:
         if status is not None:
             query = query.where(Order.status == status)
 
-        query = query.offset(skip).limit(limit).order_by(Order.id.desc())
+        query = apply_keyset(query, Order.id, after, before, descending=True).offset(skip).limit(limit)
 
-        result = await db.execute(query)
+        orders = (await db.execute(query)).scalars().all()
 
-        return result.scalars().all()
+        return orders[::-1] if before is not None else orders
 
 
 
@@ -0,0 +1,76 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, func
+
+from backend.models.outbox import OutboxEvent
+
+class OutboxCRUD:
+
+    @staticmethod
+    def add_event(
+        db: AsyncSession,
+        exchange: str,
+        routing_key: str,
+        payload: dict
+    ) -> OutboxEvent:
+        
+        # Событие пишется в транзакции заказа: уйдет в брокер, только если заказ закоммичен
+        event = OutboxEvent(exchange=exchange, routing_key=routing_key, payload=payload)
+        db.add(event)
+
+        return event
+
+    @staticmethod
+    async def claim_batch(
+        db: AsyncSession,
+        batch: int,
+        lease: float
+    ) -> list[OutboxEvent]:
+        
+        # Строки блокируются только на время захвата, другие ретрансляторы их пропускают
+        result = await db.execute(
+            select(OutboxEvent)
+            .where(OutboxEvent.available_at <= func.now())
+            .order_by(OutboxEvent.id)
+            .limit(batch)
+            .with_for_update(skip_locked=True)
+        )
+        events = list(result.scalars().all())
+
+        # Аренда: до ее истечения событие считается отправляемым; если ретранслятор упал, его заберет другой
+        if events:
+            await db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_([event.id for event in events]))
+                .values(available_at=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, float(lease)))
+            )
+
+        return events
+
+    @staticmethod
+    async def delete_events(
+        db: AsyncSession,
+        event_ids: list[int]
+    ) -> None:
+        
+        if event_ids:
+            await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(event_ids)))
+
+    @staticmethod
+    async def postpone_event(
+        db: AsyncSession,
+        event_id: int,
+        delay: float,
+        error: str
+    ) -> None:
+        
+        await db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id == event_id)
+            .values(
+                attempts=OutboxEvent.attempts + 1,
+                available_at=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, float(delay)),
+                last_error=error
+            )
+        )
+
+outbox_crud = OutboxCRUD()
@@ -1,26 +1,122 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func, or_, cast, literal, true, tuple_, text, bindparam, Boolean, Integer, String, Float, Numeric
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, array
 from decimal import Decimal
 from typing import Optional
+import re
 
-from backend.models.product import Product
+from backend.models.product import Product, SEARCH_CONFIG
+from backend.models.order_item import OrderItem
+from backend.models.category import Category
 from backend.schemas.product import ProductCreate, ProductEdit
+from backend.core.config import settings
+from backend.core.utils.pagination import apply_keyset
+
+# Строки блокируются в CTE по возрастанию id, поэтому встречные резервирования не взаимоблокируются.
+# Бронь покупателя (r.held) переходит в продажу тем же оператором: чужие брони остаются вычтенными из остатка
+_RESERVE_STOCK_SQL = text("""
+    WITH requested AS (
+        SELECT * FROM unnest(:product_ids, :quantities, :held) AS r(product_id, quantity, held)
+    ), locked AS (
+        SELECT p.id FROM products AS p
+        JOIN requested AS r ON r.product_id = p.id
+        ORDER BY p.id
+        FOR UPDATE OF p
+    )
+    UPDATE products AS p
+    SET stock = p.stock - r.quantity, held = p.held - r.held
+    FROM requested AS r, locked AS l
+    WHERE p.id = r.product_id AND l.id = p.id AND p.is_delete = false
+        AND NOT (p.redis_inventory AND :redis_enabled)
+        AND p.stock - (p.held - r.held) - (
+            SELECT coalesce(sum(oi.quantity), 0) FROM order_items AS oi
+            WHERE oi.product_id = p.id AND oi.stock_deferred
+        ) >= r.quantity
+    RETURNING p.id, p.price, p.name
+""").bindparams(
+    bindparam("product_ids", type_=ARRAY(Integer)),
+    bindparam("quantities", type_=ARRAY(Integer)),
+    bindparam("held", type_=ARRAY(Integer)),
+    bindparam("redis_enabled", type_=Boolean)
+)
+
+_RELEASE_STOCK_SQL = text("""
+    WITH requested AS (
+        SELECT * FROM unnest(:product_ids, :quantities) AS r(product_id, quantity)
+    ), locked AS (
+        SELECT p.id FROM products AS p
+        JOIN requested AS r ON r.product_id = p.id
+        ORDER BY p.id
+        FOR UPDATE OF p
+    )
+    UPDATE products AS p
+    SET stock = p.stock + r.quantity
+    FROM requested AS r, locked AS l
+    WHERE p.id = r.product_id AND l.id = p.id AND p.is_delete = false
+""").bindparams(
+    bindparam("product_ids", type_=ARRAY(Integer)),
+    bindparam("quantities", type_=ARRAY(Integer))
+)
+
+# Продажи из Redis переносятся в products.stock пачками; один сверщик за раз, товары блокируются по возрастанию id
+_RECONCILE_STOCK_SQL = text("""
+    WITH done AS (
+        UPDATE order_items SET stock_deferred = false
+        WHERE id IN (
+            SELECT id FROM order_items WHERE stock_deferred
+            ORDER BY id
+            LIMIT :batch
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING product_id, quantity
+    ), totals AS (
+        SELECT product_id, sum(quantity) AS quantity FROM done GROUP BY product_id
+    ), locked AS (
+        SELECT p.id FROM products AS p
+        JOIN totals AS t ON t.product_id = p.id
+        ORDER BY p.id
+        FOR UPDATE OF p
+    )
+    UPDATE products AS p
+    SET stock = p.stock - t.quantity
+    FROM totals AS t, locked AS l
+    WHERE p.id = t.product_id AND l.id = p.id
+    RETURNING p.id, p.stock
+""")
+
+_AVAILABLE_STOCK_SQL = text("""
+    SELECT p.stock - p.held - (
+        SELECT coalesce(sum(oi.quantity), 0) FROM order_items AS oi
+        WHERE oi.product_id = p.id AND oi.stock_deferred
+    )
+    FROM products AS p
+    WHERE p.id = :product_id AND p.is_delete = false AND (p.redis_inventory OR NOT :managed_only)
+    FOR UPDATE OF p
+""").bindparams(bindparam("managed_only", type_=Boolean))
+
+_RECONCILE_LOCK_KEY = 0x1A7E_5700
+
+# Тот же расчет, что проверяет резервирование: минус брони и несверенные продажи из Redis.
+# Считается только там, где остаток показывают или проверяют, а не в каждой выборке товаров;
+# подзапрос идет по частичному индексу ix_order_items_stock_deferred
+AVAILABLE_STOCK = func.greatest(
+    Product.stock - Product.held - select(func.coalesce(func.sum(OrderItem.quantity), 0))
+    .where(OrderItem.product_id == Product.id, OrderItem.stock_deferred)
+    .scalar_subquery(),
+    0
+)
 
 class ProductCRUD:
 
     @staticmethod
-    async def get_all_products(
-        db: AsyncSession,
-        skip: int = 0,
-        limit: int = 10,
+    def _filter_products(
+        query,
         min_price: Optional[Decimal] = None,
         max_price: Optional[Decimal] = None,
         category_id: Optional[int] = None,
         show_deleted: bool = False
     ):
         
-        query = select(Product)
-
         if not show_deleted:
             query = query.where(Product.is_delete == False)
 
@@ -33,11 +129,188 @@ class ProductCRUD:
         if category_id:
             query = query.where(Product.category_id == category_id)
 
-        query = query.order_by(Product.id.asc()).offset(skip).limit(limit)
+        return query
+
+    @staticmethod
+    async def get_all_products(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 10,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        category_id: Optional[int] = None,
+        show_deleted: bool = False,
+        after: Optional[int] = None,
+        before: Optional[int] = None
+    ):
+        
+        query = ProductCRUD._filter_products(
+            select(Product), min_price, max_price, category_id, show_deleted
+        )
+
+        query = apply_keyset(query, Product.id, after, before).offset(skip).limit(limit)
+
+        products = (await db.execute(query)).scalars().all()
+
+        return products[::-1] if before is not None else products
+    
+    @staticmethod
+    async def get_product_ids(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 10,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        category_id: Optional[int] = None,
+        show_deleted: bool = False,
+        after: Optional[int] = None,
+        before: Optional[int] = None
+    ) -> list[int]:
+        
+        query = ProductCRUD._filter_products(
+            select(Product.id), min_price, max_price, category_id, show_deleted
+        )
+
+        query = apply_keyset(query, Product.id, after, before).offset(skip).limit(limit)
+
+        product_ids = list((await db.execute(query)).scalars().all())
+
+        return product_ids[::-1] if before is not None else product_ids
+    
+    @staticmethod
+    async def get_products_by_ids(
+        db: AsyncSession,
+        product_ids: list[int]
+    ) -> list[Product]:
+        
+        if not product_ids:
+            return []
+
+        result = await db.execute(select(Product).where(Product.id.in_(product_ids)))
+
+        return result.scalars().all()
+
+    @staticmethod
+    def _expire_stock(db: AsyncSession, product_ids) -> None:
+        # Остаток и брони меняются в обход ORM: уже загруженные товары должны перечитать их
+        for product_id in product_ids:
+            product = db.identity_map.get(db.identity_key(Product, product_id))
+            if product is not None:
+                db.expire(product, ["stock", "held"])
+
+    @staticmethod
+    async def reserve_stock(
+        db: AsyncSession,
+        quantities: dict[int, int],
+        holds: Optional[dict[int, int]] = None
+    ) -> tuple[dict[int, dict], list[int]]:
+        
+        if not quantities:
+            return {}, []
+
+        # Проверка остатка и списание — один оператор: блокировка держится без лишних round trip до приложения
+        result = await db.execute(
+            _RESERVE_STOCK_SQL,
+            {
+                "product_ids": list(quantities),
+                "quantities": list(quantities.values()),
+                "held": [(holds or {}).get(product_id, 0) for product_id in quantities],
+                "redis_enabled": settings.INVENTORY_REDIS_ENABLED
+            }
+        )
+
+        reserved = {row.id: {"price": row.price, "name": row.name} for row in result}
+        failed = [product_id for product_id in quantities if product_id not in reserved]
+
+        ProductCRUD._expire_stock(db, reserved)
+
+        return reserved, failed
+
+    @staticmethod
+    async def release_stock(
+        db: AsyncSession,
+        quantities: dict[int, int]
+    ) -> None:
+        
+        if not quantities:
+            return
+
+        await db.execute(
+            _RELEASE_STOCK_SQL,
+            {"product_ids": list(quantities), "quantities": list(quantities.values())}
+        )
+
+        ProductCRUD._expire_stock(db, quantities)
+
+    @staticmethod
+    async def get_checkout_products(
+        db: AsyncSession,
+        product_ids: list[int]
+    ) -> dict:
+        
+        if not product_ids:
+            return {}
+
+        result = await db.execute(
+            select(Product.id, Product.price, Product.name, Product.redis_inventory)
+            .where(Product.id.in_(product_ids), Product.is_delete == False)
+        )
+
+        return {row.id: row for row in result.all()}
+
+    @staticmethod
+    async def get_available_stocks(
+        db: AsyncSession,
+        product_ids: list[int]
+    ) -> list:
+        
+        if not product_ids:
+            return []
+
+        result = await db.execute(
+            select(Product.id, AVAILABLE_STOCK.label("available_stock")).where(Product.id.in_(product_ids))
+        )
+
+        return result.all()
+
+    @staticmethod
+    async def get_available_stock_for_update(
+        db: AsyncSession,
+        product_id: int,
+        managed_only: bool = False
+    ) -> Optional[int]:
+        
+        # Остаток за вычетом броней и еще не сверенных продаж из Redis; строка товара блокируется до конца транзакции
+        result = await db.execute(_AVAILABLE_STOCK_SQL, {"product_id": product_id, "managed_only": managed_only})
+
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def reconcile_deferred_stock(
+        db: AsyncSession,
+        batch: int
+    ) -> list[tuple[int, int]]:
+        
+        acquired = (await db.execute(select(func.pg_try_advisory_xact_lock(_RECONCILE_LOCK_KEY)))).scalar_one()
+
+        if not acquired:
+            return []
 
-        products = await db.execute(query)
+        result = await db.execute(_RECONCILE_STOCK_SQL, {"batch": batch})
+        updated = [(row.id, row.stock) for row in result]
 
-        return products.scalars().all()
+        ProductCRUD._expire_stock(db, [product_id for product_id, _ in updated])
+
+        return updated
+
+    @staticmethod
+    async def get_active_product_names(
+        db: AsyncSession
+    ) -> list[tuple[int, str]]:
+        
+        result = await db.execute(select(Product.id, Product.name).where(Product.is_delete == False))
+
+        return [(product_id, name) for product_id, name in result.all()]
 
     @staticmethod
     async def get_product_by_id(
@@ -66,21 +339,28 @@ class ProductCRUD:
         limit: int = 10
     ) -> list[Product]:
         
-        word_sim = func.word_similarity(Product.name, name_query)
+        # Пороги операторов % и <% задаются на транзакцию: так условия остаются индексируемыми
+        await db.execute(select(
+            func.set_config("pg_trgm.similarity_threshold", str(settings.SEARCH_SIMILARITY_THRESHOLD), True),
+            func.set_config("pg_trgm.word_similarity_threshold", str(settings.SEARCH_WORD_SIMILARITY_THRESHOLD), True)
+        ))
 
-        full_sim = func.similarity(Product.name, name_query)
+        search = literal(name_query, String)
 
         query = (
             select(Product)
             .where(
                 or_(
                     Product.name.ilike(f"%{name_query}%"),
-                    word_sim > 0.4,
-                    full_sim > 0.1,
+                    search.op("<%", is_comparison=True)(Product.name),
+                    Product.name.op("%", is_comparison=True)(search),
                 ),
                 Product.is_delete == False
             )
-            .order_by(word_sim.desc(), full_sim.desc())
+            .order_by(
+                search.op("<<->", return_type=Float)(Product.name),
+                Product.name.op("<->", return_type=Float)(search)
+            )
             .limit(limit)
         )
 
@@ -88,6 +368,84 @@ class ProductCRUD:
 
         return result.scalars().all()
     
+    @staticmethod
+    def build_tsquery(text_query: str) -> Optional[str]:
+        # Каждое слово ищем по префиксу; в запрос попадают только буквы и цифры, так что синтаксис tsquery не сломать
+        terms = re.findall(r"\w+", text_query.lower())[:settings.SEARCH_MAX_TERMS]
+
+        if not terms:
+            return None
+
+        return " & ".join(f"{term}:*" for term in terms)
+
+    @staticmethod
+    async def search_products(
+        db: AsyncSession,
+        ts_query: str,
+        limit: int = 10,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        category_id: Optional[int] = None,
+        after: Optional[tuple[float, int]] = None,
+        price_buckets: tuple[int, ...] = ()
+    ) -> dict:
+
+        query = func.to_tsquery(SEARCH_CONFIG, ts_query)
+        rank = func.ts_rank_cd(Product.search_vector, query)
+
+        matched = ProductCRUD._filter_products(
+            select(Product.id, Product.category_id, Product.price, rank.label("rank"))
+            .where(Product.search_vector.op("@@")(query)),
+            min_price, max_price, category_id
+        ).cte("matched")
+
+        page_query = select(matched.c.id, matched.c.rank)
+
+        if after is not None:
+            page_query = page_query.where(tuple_(matched.c.rank, matched.c.id) < tuple_(*after))
+
+        page = page_query.order_by(matched.c.rank.desc(), matched.c.id.desc()).limit(limit).cte("page")
+
+        category_counts = (
+            select(Category.id, Category.name, func.count().label("count"))
+            .join(matched, matched.c.category_id == Category.id)
+            .group_by(Category.id, Category.name)
+            .subquery()
+        )
+
+        bucket = func.width_bucket(matched.c.price, cast(array(price_buckets), ARRAY(Numeric))).label("bucket")
+        price_counts = select(bucket, func.count().label("count")).group_by(bucket).subquery()
+
+        # Выдача, общее число совпадений и фасеты собираются одним запросом; matched материализуется один раз
+        facets = select(
+            select(func.count()).select_from(matched).scalar_subquery().label("total"),
+            select(func.json_agg(aggregate_order_by(
+                func.json_build_array(category_counts.c.id, category_counts.c.name, category_counts.c.count),
+                category_counts.c.count.desc()
+            ))).scalar_subquery().label("categories"),
+            select(func.json_agg(aggregate_order_by(
+                func.json_build_array(price_counts.c.bucket, price_counts.c.count),
+                price_counts.c.bucket
+            ))).scalar_subquery().label("prices")
+        ).cte("facets")
+
+        statement = (
+            select(Product, page.c.rank, facets.c.total, facets.c.categories, facets.c.prices)
+            .select_from(facets)
+            .outerjoin(page, true())
+            .outerjoin(Product, Product.id == page.c.id)
+            .order_by(page.c.rank.desc(), page.c.id.desc())
+        )
+
+        rows = (await db.execute(statement)).all()
+
+        return {
+            "items": [(row.Product, row.rank) for row in rows if row.Product is not None],
+            "total": rows[0].total,
+            "categories": rows[0].categories or [],
+            "prices": rows[0].prices or []
+        }
+
     @staticmethod
     async def create_product(
         db: AsyncSession,
@@ -0,0 +1,168 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, text
+from typing import Optional
+
+from backend.models.stock_hold import StockHold
+from backend.models.product import Product
+from backend.crud.product import ProductCRUD, AVAILABLE_STOCK
+
+_SET_HOLD_SQL = text("""
+    WITH upsert AS (
+        INSERT INTO stock_holds (user_id, product_id, quantity, expires_at)
+        VALUES (:user_id, :product_id, :quantity, now() + CAST(:ttl AS integer) * interval '1 second')
+        ON CONFLICT (user_id, product_id)
+        DO UPDATE SET quantity = excluded.quantity, expires_at = excluded.expires_at
+    )
+    UPDATE products SET held = held + :delta WHERE id = :product_id
+""")
+
+# Снятые брони возвращают held пачкой; товары блокируются по возрастанию id, как при резервировании
+_RELEASE_HOLDS_SQL = """
+    WITH released AS (
+        DELETE FROM stock_holds WHERE id IN ({victims})
+        RETURNING product_id, quantity
+    ), totals AS (
+        SELECT product_id, sum(quantity) AS quantity FROM released GROUP BY product_id
+    ), locked AS (
+        SELECT p.id FROM products AS p
+        JOIN totals AS t ON t.product_id = p.id
+        ORDER BY p.id
+        FOR UPDATE OF p
+    )
+    UPDATE products AS p
+    SET held = p.held - t.quantity
+    FROM totals AS t, locked AS l
+    WHERE p.id = t.product_id AND l.id = p.id
+    RETURNING p.id
+"""
+
+_SWEEP_HOLDS_SQL = text(_RELEASE_HOLDS_SQL.format(victims="""
+    SELECT id FROM stock_holds WHERE expires_at <= now()
+    ORDER BY expires_at
+    LIMIT :batch
+    FOR UPDATE SKIP LOCKED
+"""))
+
+_RELEASE_USER_HOLDS_SQL = text(_RELEASE_HOLDS_SQL.format(victims="""
+    SELECT id FROM stock_holds WHERE user_id = :user_id
+    FOR UPDATE
+"""))
+
+_RELEASE_PRODUCT_HOLDS_SQL = text(_RELEASE_HOLDS_SQL.format(victims="""
+    SELECT id FROM stock_holds WHERE product_id = :product_id
+    FOR UPDATE
+"""))
+
+class StockHoldCRUD:
+
+    @staticmethod
+    async def hold(
+        db: AsyncSession,
+        user_id: int,
+        product_id: int,
+        quantity: int,
+        ttl: int
+    ) -> tuple[bool, Optional[int]]:
+
+        # Порядок блокировок как у сборщика и оформления заказа: сначала бронь, затем товар
+        await db.execute(
+            select(StockHold.id)
+            .where(StockHold.user_id == user_id, StockHold.product_id == product_id)
+            .with_for_update()
+        )
+        locked = await db.execute(
+            select(Product.id)
+            .where(Product.id == product_id, Product.is_delete == False)
+            .with_for_update()
+        )
+
+        if locked.scalar_one_or_none() is None:
+            return False, None
+
+        # Читается уже под блокировкой товара, отдельным оператором: снимок берется после ожидания блокировки.
+        # Доступный остаток — тот же AVAILABLE_STOCK, что видят клиенты
+        row = (await db.execute(
+            select(
+                AVAILABLE_STOCK.label("available"),
+                func.coalesce(
+                    select(StockHold.quantity)
+                    .where(StockHold.user_id == user_id, StockHold.product_id == product_id)
+                    .scalar_subquery(),
+                    0
+                ).label("held")
+            )
+            .where(Product.id == product_id)
+        )).one()
+
+        # Своя бронь уже входит в held, поэтому проверяется только прирост
+        delta = quantity - row.held
+
+        if delta > row.available:
+            return False, row.available + row.held
+
+        await db.execute(
+            _SET_HOLD_SQL,
+            {"user_id": user_id, "product_id": product_id, "quantity": quantity, "ttl": ttl, "delta": delta}
+        )
+
+        ProductCRUD._expire_stock(db, [product_id])
+
+        return True, row.available - delta
+
+    @staticmethod
+    async def take_user_holds(
+        db: AsyncSession,
+        user_id: int,
+        product_ids: list[int]
+    ) -> dict[int, int]:
+
+        if not product_ids:
+            return {}
+
+        # Брони удаляются при оформлении, а held уменьшает само резервирование тем же оператором.
+        # Строки броней остаются заблокированными до коммита: сборщик их пропускает
+        result = await db.execute(
+            delete(StockHold)
+            .where(StockHold.user_id == user_id, StockHold.product_id.in_(product_ids))
+            .returning(StockHold.product_id, StockHold.quantity)
+        )
+
+        return {product_id: quantity for product_id, quantity in result.all()}
+
+    @staticmethod
+    async def release_user_holds(
+        db: AsyncSession,
+        user_id: int
+    ) -> list[int]:
+
+        result = await db.execute(_RELEASE_USER_HOLDS_SQL, {"user_id": user_id})
+        product_ids = list(result.scalars().all())
+
+        ProductCRUD._expire_stock(db, product_ids)
+
+        return product_ids
+
+    @staticmethod
+    async def release_product_holds(
+        db: AsyncSession,
+        product_id: int
+    ) -> bool:
+
+        result = await db.execute(_RELEASE_PRODUCT_HOLDS_SQL, {"product_id": product_id})
+        released = bool(result.scalars().all())
+
+        ProductCRUD._expire_stock(db, [product_id])
+
+        return released
+
+    @staticmethod
+    async def sweep_expired_holds(
+        db: AsyncSession,
+        batch: int
+    ) -> list[int]:
+
+        result = await db.execute(_SWEEP_HOLDS_SQL, {"batch": batch})
+
+        return list(result.scalars().all())
+
+stock_hold_crud = StockHoldCRUD()
@@ -1,20 +1,46 @@
 import os
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi.staticfiles import StaticFiles
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.routers import user, product, order, category, cart
-from backend.core.cache import close_redis
+from backend.routers import user, product, order, category, cart, metrics
+from backend.core.cache import CacheStatusMiddleware, close_redis, start_cache_listener
+from backend.core.config import settings
 from backend.core.rabbitmq import close_rabbitmq
+from backend.worker.cache_warmup import warm_cache_on_startup
+from backend.services.autocomplete_service import start_autocomplete, stop_autocomplete
+from backend.services.product_service import start_product_views_flush, stop_product_views_flush
+from backend.worker.inventory_reconciler import start_inventory_reconciler, stop_inventory_reconciler
+from backend.worker.hold_sweeper import start_hold_sweeper, stop_hold_sweeper
+from backend.worker.outbox_relay import start_outbox_relay, stop_outbox_relay
 
 from backend.core.exception_handlers import register_exception_handlers
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    start_cache_listener()
+    start_autocomplete()
+    start_product_views_flush()
+    # Фоновые циклы по умолчанию работают отдельными процессами (python -m backend.worker.*), здесь — только по флагам *_ON_STARTUP
+    start_inventory_reconciler()
+    start_hold_sweeper()
+    start_outbox_relay()
+    # Прогрев идет в фоне, чтобы не задерживать готовность приложения
+    warmup_task = asyncio.create_task(warm_cache_on_startup()) if settings.CACHE_WARMUP_ON_STARTUP else None
     try:
         yield
     finally:
+        if warmup_task is not None:
+            warmup_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await warmup_task
+        await stop_autocomplete()
+        await stop_product_views_flush()
+        await stop_inventory_reconciler()
+        await stop_hold_sweeper()
+        await stop_outbox_relay()
         await close_redis()
         await close_rabbitmq()
 
@@ -32,8 +58,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor", "X-Cache", "Idempotent-Replayed"],
 )
 
+if settings.CACHE_DEBUG_HEADERS:
+    app.add_middleware(CacheStatusMiddleware)
+
 if not os.path.exists("static"):
     os.makedirs("static/products")
 
@@ -44,6 +74,7 @@ app.include_router(product.router, prefix="/api")
 app.include_router(order.router, prefix="/api")
 app.include_router(category.router, prefix="/api")
 app.include_router(cart.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
 app.include_router(product.admin_router, prefix="/api")
 app.include_router(order.admin_router, prefix="/api")
 app.include_router(category.admin_router, prefix="/api")
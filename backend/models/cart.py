@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, ForeignKey
+from sqlalchemy import Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import List
 
@@ -7,6 +7,9 @@ from backend.core.database import Base
 class CartItem(Base):
     
     __tablename__ = "cart_items"
+    __table_args__ = (
+        Index("ix_cart_items_user_id_product_id", "user_id", "product_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
@@ -1,8 +1,8 @@
-from sqlalchemy import Integer, String, DateTime, Numeric, ForeignKey
+from sqlalchemy import Integer, String, DateTime, Numeric, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from sqlalchemy import Enum as SQLEnum
-from typing import List
+from typing import List, Optional
 
 from backend.core.database import Base
 from backend.core.utils.order_status_enums import OrderStatus
@@ -10,12 +10,24 @@ from backend.core.utils.order_status_enums import OrderStatus
 class Order(Base):
 
     __tablename__ = "orders"
+    __table_args__ = (
+        # id в конце индекса дает ORDER BY id DESC обратным проходом без сортировки
+        Index("ix_orders_user_id_id", "user_id", "id"),
+        Index("ix_orders_user_id_status_id", "user_id", "status", "id"),
+        Index("ix_orders_status_id", "status", "id"),
+        # Повтор запроса с тем же Idempotency-Key не создаст второй заказ, даже если Redis потерял ключ
+        Index("uq_orders_user_id_idempotency_key", "user_id", "idempotency_key", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
     status: Mapped[OrderStatus] = mapped_column(SQLEnum(OrderStatus))
     total_price: Mapped[float] = mapped_column(Numeric(10, 2))
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # Чем был запрос с этим ключом: повтор с другим телом или на другой ручке отклоняется и без Redis
+    idempotency_scope: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    idempotency_fingerprint: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     #связи
     user: Mapped["User"] = relationship(
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, Numeric, ForeignKey
+from sqlalchemy import Integer, String, Numeric, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from backend.core.database import Base
@@ -6,12 +6,18 @@ from backend.core.database import Base
 class OrderItem(Base):
 
     __tablename__ = "order_items"
+    __table_args__ = (
+        # Очередь сверки остатков: в индексе только еще не перенесенные в products.stock позиции
+        Index("ix_order_items_stock_deferred", "product_id", postgresql_where=text("stock_deferred")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    order_id: Mapped[int] = mapped_column(Integer, ForeignKey("orders.id"))
+    order_id: Mapped[int] = mapped_column(Integer, ForeignKey("orders.id"), index=True)
     product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id"))
     quantity: Mapped[int] = mapped_column(Integer)
     price_at_purchase: Mapped[float] = mapped_column(Numeric(10, 2))
+    # Продано из Redis: products.stock уменьшит сверка, а не сам заказ
+    stock_deferred: Mapped[bool] = mapped_column(Boolean, default=False, server_default=text("false"), nullable=False)
 
     #связи
     order: Mapped["Order"] = relationship(
@@ -0,0 +1,25 @@
+from sqlalchemy import Integer, String, Text, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from typing import Optional
+
+from backend.core.database import Base
+
+class OutboxEvent(Base):
+
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # Ретранслятор забирает готовые к отправке события по порядку
+        Index("ix_outbox_available_at_id", "available_at", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    exchange: Mapped[str] = mapped_column(String(255))
+    routing_key: Mapped[str] = mapped_column(String(255))
+    payload: Mapped[dict] = mapped_column(JSONB)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Неудачная отправка откладывает событие; строка удаляется только после подтверждения брокера
+    available_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
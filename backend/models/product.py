@@ -1,12 +1,31 @@
-from sqlalchemy import Integer, String, Text, Numeric, ForeignKey, Boolean
+from sqlalchemy import Integer, String, Text, Numeric, ForeignKey, Boolean, Index, DDL, event, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from typing import List
+from typing import List, Optional
 
 from backend.core.database import Base
 
 class Product(Base):
 
     __tablename__ = "products"
+    __table_args__ = (
+        # Частичные индексы под витрину: удаленные товары в выборку не попадают
+        Index("ix_products_active_category_id_id", "category_id", "id", postgresql_where=text("is_delete = false")),
+        Index("ix_products_active_price", "price", postgresql_where=text("is_delete = false")),
+        Index(
+            "ix_products_active_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_where=text("is_delete = false")
+        ),
+        Index(
+            "ix_products_active_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+            postgresql_where=text("is_delete = false")
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
@@ -21,6 +40,15 @@ class Product(Base):
 
     is_delete: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
+    # Остаток продается из шардированных счетчиков Redis (см. inventory_service)
+    redis_inventory: Mapped[bool] = mapped_column(Boolean, default=False, server_default=text("false"), nullable=False)
+
+    # Сумма активных броней из корзин; меняется вместе с бронями, а не пересчитывается на каждый запрос
+    held: Mapped[int] = mapped_column(Integer, default=0, server_default=text("0"), nullable=False)
+
+    # Заполняется триггером: название (A), описание (B), название категории (C)
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, nullable=True, deferred=True)
+
     #связи
     category: Mapped["Category"] = relationship(
         "Category",
@@ -31,3 +59,45 @@ class Product(Base):
         "OrderItem",
         back_populates="product"
     )
+
+
+SEARCH_CONFIG = "russian"
+
+# Вектор зависит от таблицы категорий, поэтому GENERATED-колонка не подходит: поддерживаем его триггерами.
+# Переименование категории "трогает" category_id у ее товаров, чтобы сработал триггер товаров.
+SEARCH_VECTOR_DDL = (
+    f"""
+    CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((SELECT name FROM categories WHERE id = NEW.category_id), '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER products_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, description, category_id ON products
+        FOR EACH ROW EXECUTE FUNCTION products_search_vector_update()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION categories_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE products SET category_id = category_id WHERE category_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE TRIGGER categories_search_vector_trigger
+        AFTER UPDATE OF name ON categories
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION categories_search_vector_update()
+    """,
+)
+
+# Триггеры нужны и там, где схема создается через create_all (тесты), а не миграциями
+for statement in SEARCH_VECTOR_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
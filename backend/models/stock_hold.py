@@ -0,0 +1,20 @@
+from sqlalchemy import Integer, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.core.database import Base
+
+class StockHold(Base):
+
+    __tablename__ = "stock_holds"
+    __table_args__ = (
+        # Одна бронь на строку корзины: повторное добавление меняет количество и продлевает срок
+        UniqueConstraint("user_id", "product_id", name="uq_stock_holds_user_id_product_id"),
+        # Сборщик просроченных броней идет по сроку
+        Index("ix_stock_holds_expires_at", "expires_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id", ondelete="CASCADE"))
+    quantity: Mapped[int] = mapped_column(Integer)
+    expires_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True))
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 
@@ -7,6 +7,7 @@ from backend.models.user import User
 from backend.services.category_service import category_service
 from backend.services.user_service import user_service, get_current_admin_user
 from backend.core.database import get_db
+from backend.core.utils.pagination import CursorParams, set_cursor_headers
 
 router = APIRouter(prefix="/category", tags=["categories"])
 
@@ -25,17 +26,23 @@ async def create_new_category(
 
 @router.get("/", response_model=List[CategoryResponse])
 async def get_categories(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
+    cursor: CursorParams = Depends(),
     db: AsyncSession = Depends(get_db)
 ):
     
     categories = await category_service.get_all_categories(
         db,
         skip=skip,
-        limit=limit
+        limit=limit,
+        after=cursor.after,
+        before=cursor.before
     )
 
+    set_cursor_headers(response, [category.id for category in categories], limit, cursor, skip)
+
     return categories
 
 @router.get("/{category_id}", response_model=CategoryResponse)
@@ -80,17 +87,25 @@ async def restore_category_by_id(
 
 @admin_router.get("/", response_model=List[CategoryResponse])
 async def get_all_categories_admin(
+    response: Response,
     is_delete: bool | None = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: CursorParams = Depends(),
     user: User = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     
-    return await category_service.get_all_categories_for_admin(
+    categories = await category_service.get_all_categories_for_admin(
         db,
         is_delete=is_delete,
         skip=skip,
-        limit=limit
+        limit=limit,
+        after=cursor.after,
+        before=cursor.before
     )
 
+    set_cursor_headers(response, [category.id for category in categories], limit, cursor, skip)
+
+    return categories
+
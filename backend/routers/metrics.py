@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from backend.core.metrics import REGISTRY
+from backend.models.user import User
+from backend.services.user_service import get_current_admin_user
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/", response_class=PlainTextResponse)
+async def get_metrics(
+    user: User = Depends(get_current_admin_user)
+):
+
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,25 +1,32 @@
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, BackgroundTasks, Response, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 
 from backend.schemas.order import OrderCreate, OrderResponse
 from backend.core.utils.order_status_enums import OrderStatus
-from backend.services.order_service import order_service
+from backend.services.order_service import order_service, ORDER_CREATE_SCOPE, ORDER_CHECKOUT_SCOPE
 from backend.models.user import User
-from backend.core.database import get_db
-from backend.services.user_service import get_current_admin_user, get_current_user
+from backend.core.database import get_db, get_read_db
+from backend.core.utils.pagination import CursorParams, set_cursor_headers
+from backend.core.idempotency import IDEMPOTENCY_HEADER, idempotent
+from backend.services.user_service import get_current_admin_user, get_current_user, get_user_read_db
 
 router = APIRouter(prefix="/order", tags=["orders"])
 
+def _encode_order(order) -> dict:
+    return OrderResponse.model_validate(order).model_dump(mode="json")
+
 admin_router = APIRouter(prefix="/admin/order", tags=["admin-orders"])
 
 @router.get("/history", response_model=List[OrderResponse])
 async def get_orders_history(
+    response: Response,
     status: Optional[OrderStatus] = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: CursorParams = Depends(),
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_user_read_db)
 ):
     
     orders_history = await order_service.get_user_orders_history(
@@ -27,27 +34,37 @@ async def get_orders_history(
         current_user=current_user,
         status=status,
         skip=skip,
-        limit=limit
+        limit=limit,
+        after=cursor.after,
+        before=cursor.before
     )
 
+    set_cursor_headers(response, [order.id for order in orders_history], limit, cursor, skip)
+
     return orders_history
 
 @router.post("/", response_model=OrderResponse)
 async def create_order(
     order_data: OrderCreate,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
 ):
     
-    order = await order_service.create_order(db, order_data, current_user.id)
-
-    return order
+    return await idempotent(
+        ORDER_CREATE_SCOPE,
+        current_user.id,
+        idempotency_key,
+        order_data,
+        lambda: order_service.create_order(db, order_data, current_user.id, idempotency_key=idempotency_key),
+        _encode_order
+    )
 
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order_by_id(
     order_id: int,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_user_read_db)
 ):
     
     order = await order_service.get_one_order_by_id(db, order_id, current_user)
@@ -68,12 +85,14 @@ async def edit_order_status_by_id(
 
 @admin_router.get("/all", response_model=List[OrderResponse])
 async def get_all_orders_admin(
+    response: Response,
     user_id: Optional[int] = None,
     status: Optional[OrderStatus] = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: CursorParams = Depends(),
     admin: User = Depends(get_current_admin_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     
     orders = await order_service.get_all_orders_for_admin(
@@ -81,22 +100,35 @@ async def get_all_orders_admin(
         user_id,
         status,
         skip,
-        limit
+        limit,
+        after=cursor.after,
+        before=cursor.before
     )
 
+    set_cursor_headers(response, [order.id for order in orders], limit, cursor, skip)
+
     return orders
 
 @router.post("/checkout", response_model=OrderResponse)
 async def checkout_cart(
     background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
 ):
     
-    return await order_service.create_order_from_cart(
-        db,
-        user_id=current_user.id,
-        email=current_user.email,
-        background_tasks=background_tasks
+    return await idempotent(
+        ORDER_CHECKOUT_SCOPE,
+        current_user.id,
+        idempotency_key,
+        None,
+        lambda: order_service.create_order_from_cart(
+            db,
+            user_id=current_user.id,
+            email=current_user.email,
+            background_tasks=background_tasks,
+            idempotency_key=idempotency_key
+        ),
+        _encode_order
     )
 
@@ -1,26 +1,35 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 from fastapi import UploadFile, File
 
-from backend.schemas.product import ProductResponse, ProductCreate, ProductEdit
+from backend.schemas.product import ProductResponse, ProductCreate, ProductEdit, ProductSearchResponse, ProductSuggestion, InventoryStatus
 from backend.models.user import User
 from backend.services.user_service import get_current_admin_user
 from backend.services.product_service import product_service
+from backend.services.autocomplete_service import autocomplete_service
+from backend.services.inventory_service import inventory_service
 from backend.core.database import get_db
+from backend.core.utils.pagination import (
+    CursorParams, set_cursor_headers, decode_rank_cursor, encode_rank_cursor, NEXT_CURSOR_HEADER
+)
 
 router = APIRouter(prefix="/product", tags=["products"])
 
 admin_router = APIRouter(prefix="/admin/product", tags=["admin-products"])
 
+# Ответы каталога уходят в общий кэш, поэтому читаем с primary: строка с отстающей реплики
+# вернулась бы в Redis сразу после инвалидации и жила бы до истечения TTL
 @router.get("/", response_model=List[ProductResponse])
 async def get_all_products(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 10,
     min_price: Optional[int] = None,
     max_price: Optional[int] = None,
-    category_id: Optional[int] = None
+    category_id: Optional[int] = None,
+    cursor: CursorParams = Depends()
 ):
     
     products = await product_service.get_products_list(
@@ -29,10 +38,57 @@ async def get_all_products(
         limit=limit,
         min_price=min_price,
         max_price=max_price,
-        category_id=category_id
+        category_id=category_id,
+        after=cursor.after,
+        before=cursor.before
     )
 
-    return products
+    set_cursor_headers(response, [product.id for product in products], limit, cursor, skip)
+
+    return await product_service.with_availability(db, products)
+
+# Объявлены до /{product_id}, иначе "autocomplete" и "search" уйдут в параметр пути
+@router.get("/autocomplete", response_model=List[ProductSuggestion])
+async def autocomplete_products(
+    q: str,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_db)
+):
+
+    # Пока индекс строится после старта, подсказки отдает поиск в БД
+    if not autocomplete_service.ready():
+        products = await product_service.search_products_by_name(db, q)
+        return [ProductSuggestion(id=product.id, name=product.name) for product in products[:limit]]
+
+    return [ProductSuggestion(id=product_id, name=name) for product_id, name in autocomplete_service.suggest(q, limit)]
+
+@router.get("/search", response_model=ProductSearchResponse)
+async def search_products_full_text(
+    response: Response,
+    q: str,
+    db: AsyncSession = Depends(get_db),
+    limit: int = 10,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    category_id: Optional[int] = None,
+    after: Optional[str] = None
+):
+
+    result = await product_service.search_products(
+        db,
+        q,
+        limit=limit,
+        min_price=min_price,
+        max_price=max_price,
+        category_id=category_id,
+        after=decode_rank_cursor(after)
+    )
+
+    if result.items and len(result.items) == limit:
+        last = result.items[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_rank_cursor(last.rank, last.id)
+
+    return result.model_copy(update={"items": await product_service.with_availability(db, result.items)})
 
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product_by_id(
@@ -42,23 +98,33 @@ async def get_product_by_id(
     
     product = await product_service.get_one_product_by_id(db, product_id)
 
-    return product
+    product_service.record_product_view(product_id)
+
+    return (await product_service.with_availability(db, [product]))[0]
 
 @admin_router.get("/", response_model=List[ProductResponse])
 async def get_all_products_for_admin(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
+    cursor: CursorParams = Depends(),
     db: AsyncSession = Depends(get_db),
     current_admin: User = Depends(get_current_admin_user)
 ):
     
-    return await product_service.get_products_list(
+    products = await product_service.get_products_list(
         db,
         skip=skip,
         limit=limit,
-        show_deleted=True
+        show_deleted=True,
+        after=cursor.after,
+        before=cursor.before
     )
 
+    set_cursor_headers(response, [product.id for product in products], limit, cursor, skip)
+
+    return products
+
 @admin_router.get("/{product_id}", response_model=ProductResponse)
 async def get_product_by_id_for_admin(
     product_id: int,
@@ -92,6 +158,24 @@ async def upload_product_image(
 
     return product
 
+@admin_router.post("/{product_id}/redis-inventory", response_model=InventoryStatus)
+async def enable_redis_inventory(
+    product_id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_current_admin_user)
+):
+    
+    return await inventory_service.enable(db, product_id)
+
+@admin_router.delete("/{product_id}/redis-inventory", response_model=InventoryStatus)
+async def disable_redis_inventory(
+    product_id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_current_admin_user)
+):
+    
+    return await inventory_service.disable(db, product_id)
+
 @router.get("/name/{product_name}", response_model=List[ProductResponse])
 async def search_products(
     product_name: str,
@@ -100,7 +184,7 @@ async def search_products(
     
     products = await product_service.search_products_by_name(db, product_name)
 
-    return products
+    return await product_service.with_availability(db, products)
 
 @admin_router.put("/{product_id}", response_model=ProductResponse)
 async def edit_product_by_id(
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import Optional, List
 from decimal import Decimal
 
 class ProductBase(BaseModel):
@@ -16,6 +16,14 @@ class ProductResponse(ProductBase):
     category_id: int
     is_delete: bool
     image_url: Optional[str] = None
+    # Остаток за вычетом броней в корзинах; в карточки каталога не входит, подставляется из отдельного кэша
+    available_stock: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ProductAvailability(BaseModel):
+    id: int
+    available_stock: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -24,3 +32,34 @@ class ProductEdit(BaseModel):
     description: Optional[str] = Field(None, min_length=3, max_length=1050)
     price: Optional[Decimal] = None
     stock: Optional[int] = None
+
+class ProductSearchItem(ProductResponse):
+    rank: float
+
+class CategoryFacet(BaseModel):
+    category_id: int
+    name: str
+    count: int
+
+class PriceFacet(BaseModel):
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+    count: int
+
+class ProductSearchFacets(BaseModel):
+    categories: List[CategoryFacet] = []
+    prices: List[PriceFacet] = []
+
+class ProductSearchResponse(BaseModel):
+    items: List[ProductSearchItem] = []
+    total: int = 0
+    facets: ProductSearchFacets = ProductSearchFacets()
+
+class ProductSuggestion(BaseModel):
+    id: int
+    name: str
+
+class InventoryStatus(BaseModel):
+    product_id: int
+    redis_inventory: bool
+    available: Optional[int] = None
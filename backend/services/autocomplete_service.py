@@ -0,0 +1,276 @@
+import asyncio
+import bisect
+import heapq
+import json
+import logging
+import re
+from contextlib import suppress
+from typing import Iterable, Optional
+
+from backend.core.cache import get_redis
+from backend.core.config import settings
+from backend.core.database import read_session
+from backend.crud.product import product_crud
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_CHANNEL = "autocomplete:events"
+_WORD = re.compile(r"\w+")
+_PREFIX_END = "\U0010ffff"
+
+_tasks: list[asyncio.Task] = []
+# События, пришедшие во время пересборки: новый индекс проигрывает их перед подменой
+_pending_events: Optional[list[dict]] = None
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class AutocompleteIndex:
+
+    def __init__(self):
+        # Отсортированные пары (ключ, id); ключ — хвост названия, начиная с каждого слова
+        self._entries: list[tuple[str, int]] = []
+        # Такие же пары только для популярных товаров: их мало, поэтому их диапазон можно ранжировать целиком
+        self._popular_entries: list[tuple[str, int]] = []
+        self._names: dict[int, str] = {}
+        self._popularity: dict[int, float] = {}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @staticmethod
+    def _keys(name: str) -> list[str]:
+        normalized = _normalize(name)
+        return list(dict.fromkeys(normalized[match.start():] for match in _WORD.finditer(normalized)))
+
+    @staticmethod
+    def _insert(entries: list, product_id: int, name: str) -> None:
+        for key in AutocompleteIndex._keys(name):
+            bisect.insort(entries, (key, product_id))
+
+    @staticmethod
+    def _delete(entries: list, product_id: int, name: str) -> None:
+        for key in AutocompleteIndex._keys(name):
+            position = bisect.bisect_left(entries, (key, product_id))
+            if position < len(entries) and entries[position] == (key, product_id):
+                del entries[position]
+
+    @staticmethod
+    def _range(entries: list, prefix: str) -> tuple[int, int]:
+        low = bisect.bisect_left(entries, (prefix,))
+        return low, bisect.bisect_left(entries, (prefix + _PREFIX_END,), low)
+
+    def build(self, products: Iterable[tuple[int, str]], popularity: Optional[dict[int, float]] = None) -> None:
+        names = dict(products)
+        self._entries = sorted((key, product_id) for product_id, name in names.items() for key in self._keys(name))
+        self._names = names
+        self.set_popularity(self._popularity if popularity is None else popularity)
+        self.ready = True
+
+    def set_popularity(self, popularity: dict[int, float]) -> None:
+        self._popularity = {product_id: score for product_id, score in popularity.items() if product_id in self._names}
+        self._popular_entries = sorted(
+            (key, product_id) for product_id in self._popularity for key in self._keys(self._names[product_id])
+        )
+
+    def upsert(self, product_id: int, name: str) -> None:
+        score = self._popularity.get(product_id)
+        self.remove(product_id)
+        self._insert(self._entries, product_id, name)
+        self._names[product_id] = name
+        if score is not None:
+            self._popularity[product_id] = score
+            self._insert(self._popular_entries, product_id, name)
+
+    def remove(self, product_id: int) -> None:
+        name = self._names.pop(product_id, None)
+        if name is None:
+            return
+        self._delete(self._entries, product_id, name)
+        if self._popularity.pop(product_id, None) is not None:
+            self._delete(self._popular_entries, product_id, name)
+
+    def suggest(self, prefix: str, limit: int = 10) -> list[int]:
+        prefix = _normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        # Сначала самые популярные из подходящих, затем добираем остальные в алфавитном порядке ключей:
+        # так работа ограничена размером популярного среза и limit, а не числом совпадений
+        low, high = self._range(self._popular_entries, prefix)
+        popularity = self._popularity
+        result = heapq.nlargest(
+            limit,
+            {product_id for _, product_id in self._popular_entries[low:high]},
+            key=lambda product_id: (popularity[product_id], -product_id)
+        )
+
+        seen = set(result)
+        entries = self._entries
+        position, _ = self._range(entries, prefix)
+        while len(result) < limit and position < len(entries):
+            key, product_id = entries[position]
+            if not key.startswith(prefix):
+                break
+            if product_id not in seen:
+                seen.add(product_id)
+                result.append(product_id)
+            position += 1
+
+        return result
+
+    def name(self, product_id: int) -> str:
+        return self._names[product_id]
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+class AutocompleteService:
+
+    @staticmethod
+    async def build_index():
+        global autocomplete_index, _pending_events
+
+        # Буфер открывается до чтения из БД: повтор уже учтенного события идемпотентен, а пропуск — нет
+        _pending_events = []
+        try:
+            async with read_session() as session:
+                products = await product_crud.get_active_product_names(session)
+
+            # Сортировка миллиона ключей занимает секунды — уводим ее из event loop.
+            # Поток собирает отдельный индекс: рабочий меняется только в event loop
+            index = AutocompleteIndex()
+            await asyncio.to_thread(index.build, products, dict(autocomplete_index._popularity))
+
+            # Между проигрыванием и подменой нет await: новое событие не проскочит мимо обоих индексов
+            for event in _pending_events:
+                AutocompleteService._apply(index, event)
+            autocomplete_index = index
+        finally:
+            _pending_events = None
+
+        await AutocompleteService.refresh_popularity()
+
+        logger.info("Autocomplete index built: %s products", len(autocomplete_index))
+
+    @staticmethod
+    def ready() -> bool:
+        return autocomplete_index.ready
+
+    @staticmethod
+    async def refresh_popularity():
+        from backend.services.product_service import PRODUCT_VIEWS_KEY
+
+        redis_client = get_redis()
+
+        if redis_client is None:
+            return
+
+        try:
+            top = await redis_client.zrevrange(
+                PRODUCT_VIEWS_KEY, 0, settings.AUTOCOMPLETE_POPULARITY_TOP - 1, withscores=True
+            )
+        except Exception:
+            logger.debug("Autocomplete popularity refresh failed", exc_info=True)
+            return
+
+        autocomplete_index.set_popularity({int(product_id): score for product_id, score in top})
+
+    @staticmethod
+    def _apply(index: AutocompleteIndex, event: dict):
+        if event.get("name") is None:
+            index.remove(event["id"])
+        else:
+            index.upsert(event["id"], event["name"])
+
+    @staticmethod
+    def apply_event(event: dict):
+        AutocompleteService._apply(autocomplete_index, event)
+        if _pending_events is not None:
+            _pending_events.append(event)
+
+    @staticmethod
+    async def product_changed(product_id: int, name: Optional[str]):
+        # name=None — товар больше не должен попадать в подсказки
+        event = {"id": product_id, "name": name}
+        AutocompleteService.apply_event(event)
+
+        redis_client = get_redis()
+
+        if redis_client is None:
+            return
+
+        try:
+            await redis_client.publish(AUTOCOMPLETE_CHANNEL, json.dumps(event))
+        except Exception:
+            logger.warning("Autocomplete event publish failed for %s", product_id, exc_info=True)
+
+    @staticmethod
+    def suggest(prefix: str, limit: int = 10) -> list[tuple[int, str]]:
+        return [(product_id, autocomplete_index.name(product_id)) for product_id in autocomplete_index.suggest(prefix, limit)]
+
+
+async def _listen_events() -> None:
+    # Индекс собирается уже после подписки, чтобы не пропустить изменения между загрузкой и подпиской
+    rebuild = True
+    while True:
+        redis_client = get_redis()
+        try:
+            if redis_client is None:
+                await AutocompleteService.build_index()
+                return
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(AUTOCOMPLETE_CHANNEL)
+                # После переподписки часть событий потеряна — индекс собираем заново
+                if rebuild:
+                    await AutocompleteService.build_index()
+                    rebuild = False
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    # Свои события тоже приходят сюда: применение идемпотентно и закрывает гонку с пересборкой
+                    AutocompleteService.apply_event(json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Неудачная сборка тоже повторяется, иначе индекс так и не станет готов
+            logger.warning("Autocomplete listener failed, resubscribing", exc_info=True)
+            rebuild = True
+            await asyncio.sleep(1)
+
+
+async def _refresh_popularity_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.AUTOCOMPLETE_POPULARITY_REFRESH_SECONDS)
+        await AutocompleteService.refresh_popularity()
+
+
+async def _run_autocomplete() -> None:
+    try:
+        await asyncio.gather(_listen_events(), _refresh_popularity_periodically())
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        # Без индекса эндпоинт отвечает через поиск в БД
+        logger.exception("Autocomplete index build failed")
+
+
+def start_autocomplete() -> None:
+    if _tasks or not settings.AUTOCOMPLETE_ENABLED:
+        return
+    _tasks.append(asyncio.create_task(_run_autocomplete()))
+
+
+async def stop_autocomplete() -> None:
+    while _tasks:
+        task = _tasks.pop()
+        task.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await task
+
+
+autocomplete_service = AutocompleteService()
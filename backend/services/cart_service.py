@@ -1,19 +1,27 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 from sqlalchemy import select
+from redis.exceptions import RedisError
 
 
 from backend.models.cart import CartItem
 from backend.schemas.cart import CartItemAdd
 from backend.crud.cart import cart_crud
 from backend.crud.product import product_crud
+from backend.crud.stock_hold import stock_hold_crud
+from backend.core.config import settings
+from backend.core.cache import cache_invalidate, id_tags, invalidate_tags
+from backend.services.inventory_service import inventory_service
 
 from backend.core.exceptions.cart_exceptions import *
 from backend.core.exceptions.product_exceptions import *
+from backend.core.exceptions.inventory_exceptions import InventoryUnavailableError
 
 class CartItemService:
 
+    # Бронь меняет только доступный остаток: карточки каталога под тегом product:{id} остаются в кэше
     @staticmethod
+    @cache_invalidate(result_tags=id_tags("stock", attr="product_id"))
     async def add_item_into_cart(
         db: AsyncSession,
         user_id: int,
@@ -28,8 +36,37 @@ class CartItemService:
         if product.is_delete:
             raise ProductDeletedError()
         
-        if product.stock < item_data.quantity:
-            raise CartInsufficientStockError(product.name, product.stock)
+        cart_item = await cart_crud.get_cart_item(db, item_data.product_id, user_id)
+        quantity = item_data.quantity + (cart_item.quantity if cart_item else 0)
+
+        if product.redis_inventory and settings.INVENTORY_REDIS_ENABLED:
+            # Ходовые товары продаются из Redis в порядке оформления, корзина их не бронирует.
+            # Сверяемся со счетчиками, из которых будет продажа; без них — с остатком из Postgres
+            try:
+                available = await inventory_service.available(product.id)
+            except (InventoryUnavailableError, RedisError):
+                available = None
+
+            if available is None:
+                available = (await product_crud.get_available_stocks(db, [product.id]))[0].available_stock
+
+            if available < quantity:
+                raise CartInsufficientStockError(product.name, available)
+        else:
+            # Бронь покрывает всю строку корзины и продлевается при каждом добавлении
+            held, available = await stock_hold_crud.hold(
+                db,
+                user_id,
+                item_data.product_id,
+                quantity,
+                settings.CART_HOLD_TTL_SECONDS
+            )
+
+            if not held:
+                if available is None:
+                    raise ProductNotFoundError(item_data.product_id)
+
+                raise CartInsufficientStockError(product.name, available)
         
         cart_item = await cart_crud.add_product_into_cart(
             db,
@@ -70,6 +107,9 @@ class CartItemService:
     ):
         
         await cart_crud.delete_all_cart_items_by_user_id(db, user_id)
+        product_ids = await stock_hold_crud.release_user_holds(db, user_id)
         await db.commit()
 
+        await invalidate_tags(*(f"stock:{product_id}" for product_id in product_ids))
+
 cart_service = CartItemService()
\ No newline at end of file
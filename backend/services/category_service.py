@@ -1,17 +1,18 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from slugify import slugify
 
 from backend.crud.category import category_crud
 from backend.crud.product import product_crud
 from backend.schemas.category import CategoryCreate, CategoryUpdate, CategoryResponse
-from backend.core.cache import cacheable, cache_invalidate
+from backend.core.cache import cacheable, cache_invalidate, id_tags
 
 from backend.core.exceptions.category_exceptions import *
 
 class CategoryService:
     
     @staticmethod
-    @cache_invalidate(patterns=["categories:*"])
+    @cache_invalidate(tags=["categories:list"], result_tags=id_tags("category"))
     async def create_category(
         db: AsyncSession,
         category_data: CategoryCreate
@@ -31,7 +32,7 @@ class CategoryService:
         return category
     
     @staticmethod
-    @cache_invalidate(patterns=["categories:*"])
+    @cache_invalidate(tags=["category:{category_id}", "categories:list"])
     async def delete_one_category_by_id(
         db: AsyncSession,
         category_id: int
@@ -52,7 +53,8 @@ class CategoryService:
         return True
     
     @staticmethod
-    @cache_invalidate(patterns=["categories:*"])
+    # Название категории входит в поисковый вектор товаров
+    @cache_invalidate(tags=["category:{category_id}", "products:fts"])
     async def edit_one_category_by_id(
         db: AsyncSession,
         category_id: int,
@@ -70,7 +72,17 @@ class CategoryService:
         return category
     
     @staticmethod
-    @cacheable(ttl=120, key="categories:by_id:{category_id}", decoder=CategoryResponse)
+    @cacheable(
+        ttl=120,
+        key="categories:by_id:{category_id}",
+        decoder=CategoryResponse,
+        tags=["category:{category_id}"],
+        local_ttl=30,
+        stale_ttl=120,
+        early_refresh_beta=1.0,
+        cache_exceptions=(CategoryNotFoundError,),
+        negative_ttl=30
+    )
     async def get_one_category_by_id(
         db: AsyncSession,
         category_id: int
@@ -84,17 +96,30 @@ class CategoryService:
         return category
     
     @staticmethod
-    @cacheable(ttl=60, key="categories:list:{skip}:{limit}", decoder=CategoryResponse)
+    @cacheable(
+        ttl=60,
+        key="categories:list:{skip}:{limit}:{after}:{before}",
+        decoder=CategoryResponse,
+        tags=["categories:list"],
+        result_tags=id_tags("category"),
+        local_ttl=30,
+        stale_ttl=60,
+        early_refresh_beta=1.0
+    )
     async def get_all_categories(
         db: AsyncSession,
         skip: int = 0,
-        limit: int = 10
+        limit: int = 10,
+        after: Optional[int] = None,
+        before: Optional[int] = None
     ):
         
         categories = await category_crud.get_all_categories(
             db,
             skip=skip,
-            limit=limit
+            limit=limit,
+            after=after,
+            before=before
         )
 
         return categories
@@ -104,20 +129,24 @@ class CategoryService:
         db: AsyncSession,
         is_delete: bool,
         skip: int = 0,
-        limit: int = 10
+        limit: int = 10,
+        after: Optional[int] = None,
+        before: Optional[int] = None
     ):
         
         categories = await category_crud.get_all_categories_for_admin(
             db,
             is_delete=is_delete,
             skip=skip,
-            limit=limit
+            limit=limit,
+            after=after,
+            before=before
         )
 
         return categories
     
     @staticmethod
-    @cache_invalidate(patterns=["categories:*"])
+    @cache_invalidate(tags=["category:{category_id}", "categories:list"])
     async def restore_category(
         db: AsyncSession,
         category_id: int
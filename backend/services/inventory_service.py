@@ -0,0 +1,285 @@
+import logging
+import random
+from typing import Optional
+
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.cache import get_redis, invalidate_tags
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.core.metrics import Counter
+from backend.crud.product import product_crud
+from backend.crud.stock_hold import stock_hold_crud
+
+from backend.core.exceptions.product_exceptions import ProductNotFoundError
+from backend.core.exceptions.inventory_exceptions import InventoryUnavailableError
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_KEY = "inventory:{product_id}:{shard}"
+
+# Берет из шарда сколько есть, но не больше запрошенного; счетчик никогда не уходит в минус.
+# -1 — шарда нет (Redis перезапущен или товар еще не засеян)
+_TAKE_SCRIPT = """
+local available = redis.call('GET', KEYS[1])
+if not available then
+    return -1
+end
+local taken = math.min(tonumber(available), tonumber(ARGV[1]))
+if taken > 0 then
+    redis.call('DECRBY', KEYS[1], taken)
+end
+return taken
+"""
+
+# Возвращаем только в существующий шард: после потери данных остаток заново считается из Postgres
+_REFUND_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return -1
+"""
+
+_INVENTORY_TAKES = Counter(
+    "inventory_redis_takes_total",
+    "Reservations against Redis inventory counters",
+    ("result",),
+)
+_INVENTORY_RESEEDS = Counter(
+    "inventory_redis_reseeds_total",
+    "Redis inventory counters recreated from Postgres",
+)
+_INVENTORY_RECONCILED = Counter(
+    "inventory_reconciled_products_total",
+    "Products whose deferred Redis sales were applied to products.stock",
+)
+
+
+def _shard_keys(product_id: int) -> list[str]:
+    return [INVENTORY_KEY.format(product_id=product_id, shard=shard) for shard in range(settings.INVENTORY_SHARDS)]
+
+
+def _require_redis():
+    redis_client = get_redis()
+
+    if redis_client is None:
+        raise InventoryUnavailableError()
+
+    return redis_client
+
+
+async def _take_from_shards(redis_client, product_id: int, quantity: int) -> tuple[dict[str, int], bool]:
+    keys = _shard_keys(product_id)
+    # Случайный стартовый шард разводит конкурентные покупки по разным счетчикам
+    start = random.randrange(len(keys))
+    keys = keys[start:] + keys[:start]
+    take = redis_client.register_script(_TAKE_SCRIPT)
+
+    taken: dict[str, int] = {}
+    remaining = quantity
+
+    for index, key in enumerate(keys):
+        got = await take(keys=[key], args=[remaining])
+        if got < 0:
+            return taken, True
+
+        if got:
+            taken[key] = got
+            remaining -= got
+
+        if remaining == 0:
+            break
+
+        if index == 0 and len(keys) > 1:
+            # Первого шарда не хватило: одним запросом проверяем, наберется ли остаток по остальным
+            values = await redis_client.mget(keys[1:])
+            if any(value is None for value in values):
+                return taken, True
+            if sum(int(value) for value in values) < remaining:
+                break
+
+    return taken, False
+
+
+class InventoryService:
+
+    @staticmethod
+    async def take(product_id: int, quantity: int) -> Optional[dict[str, int]]:
+        redis_client = _require_redis()
+        taken: dict[str, int] = {}
+
+        try:
+            for attempt in range(2):
+                taken, missing = await _take_from_shards(redis_client, product_id, quantity)
+
+                if missing:
+                    await InventoryService.refund(taken)
+                    taken = {}
+                    if attempt == 0 and await InventoryService.reseed(product_id):
+                        continue
+                    break
+
+                if sum(taken.values()) == quantity:
+                    _INVENTORY_TAKES.inc("ok")
+                    return taken
+
+                await InventoryService.refund(taken)
+                _INVENTORY_TAKES.inc("insufficient")
+                return None
+        except RedisError:
+            logger.warning("Redis inventory take failed for %s", product_id, exc_info=True)
+            await InventoryService.refund(taken)
+
+        # Без счетчиков продавать нельзя: отказ вместо риска перепродажи
+        _INVENTORY_TAKES.inc("unavailable")
+        raise InventoryUnavailableError()
+
+    @staticmethod
+    async def refund(taken) -> None:
+        redis_client = get_redis()
+
+        if redis_client is None:
+            return
+
+        refund = redis_client.register_script(_REFUND_SCRIPT)
+        items = taken.items() if isinstance(taken, dict) else ((key, amount) for part in taken for key, amount in part.items())
+
+        for key, amount in items:
+            try:
+                await refund(keys=[key], args=[amount])
+            except RedisError:
+                # Потерянный возврат — это недопродажа, а не перепродажа; лечится пересевом
+                logger.warning("Redis inventory refund failed for %s", key, exc_info=True)
+
+    @staticmethod
+    async def release(product_id: int, quantity: int) -> None:
+        await InventoryService.refund({random.choice(_shard_keys(product_id)): quantity})
+
+    @staticmethod
+    async def _seed(product_id: int, available: int) -> None:
+        keys = _shard_keys(product_id)
+
+        async with _require_redis().pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(*keys)
+                    values = await pipe.mget(keys)
+                    missing = [key for key, value in zip(keys, values) if value is None]
+
+                    if not missing:
+                        return
+
+                    # Уцелевшие шарды не перезаписываем: проданные из них единицы иначе вернутся в продажу.
+                    # Пропавшим достается только то, что осталось сверх уцелевших
+                    remaining = available - sum(int(value) for value in values if value is not None)
+                    base, extra = divmod(max(remaining, 0), len(missing))
+
+                    pipe.multi()
+                    for index, key in enumerate(missing):
+                        pipe.set(key, base + (1 if index < extra else 0))
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    @staticmethod
+    async def reseed(product_id: int) -> bool:
+        # Строка товара заблокирована, пока пишем счетчики: остаток в Postgres в это время не меняется
+        async with AsyncSessionLocal() as session:
+            available = await product_crud.get_available_stock_for_update(session, product_id, managed_only=True)
+
+            if available is None:
+                return False
+
+            await InventoryService._seed(product_id, available)
+            await session.commit()
+
+        _INVENTORY_RESEEDS.inc()
+        logger.warning("Redis inventory for product %s reseeded from Postgres: %s", product_id, available)
+
+        return True
+
+    @staticmethod
+    async def available(product_id: int) -> Optional[int]:
+        values = await _require_redis().mget(_shard_keys(product_id))
+
+        if any(value is None for value in values):
+            return None
+
+        return sum(int(value) for value in values)
+
+    @staticmethod
+    async def enable(
+        db: AsyncSession,
+        product_id: int
+    ):
+        if not settings.INVENTORY_REDIS_ENABLED:
+            raise InventoryUnavailableError("Redis-склад выключен (INVENTORY_REDIS_ENABLED)")
+
+        # Товары из Redis продаются без броней: снимаем брони в той же транзакции, иначе их единицы
+        # либо продадутся второй раз, либо застрянут в held до сборщика и исказят пересев при выключении.
+        # Брони блокируются раньше товара — тот же порядок, что у корзины и сборщика
+        holds_released = await stock_hold_crud.release_product_holds(db, product_id)
+
+        available = await product_crud.get_available_stock_for_update(db, product_id)
+
+        if available is None:
+            raise ProductNotFoundError(product_id)
+
+        product = await product_crud.get_product_by_id(db, product_id)
+
+        if not product.redis_inventory:
+            # Счетчики от прошлого включения могли остаться, если тогда не прошел коммит
+            await _require_redis().delete(*_shard_keys(product_id))
+            await InventoryService._seed(product_id, available)
+            product.redis_inventory = True
+
+        await db.commit()
+
+        if holds_released:
+            await invalidate_tags(f"stock:{product_id}")
+
+        return {"product_id": product_id, "redis_inventory": True, "available": await InventoryService.available(product_id)}
+
+    @staticmethod
+    async def disable(
+        db: AsyncSession,
+        product_id: int
+    ):
+        product = await product_crud.get_product_by_id(db, product_id, for_update=True)
+
+        if not product:
+            raise ProductNotFoundError(product_id)
+
+        was_enabled = product.redis_inventory
+        product.redis_inventory = False
+        await db.commit()
+
+        if was_enabled:
+            await _require_redis().delete(*_shard_keys(product_id))
+
+        available = await product_crud.get_available_stock_for_update(db, product_id)
+        await db.commit()
+
+        return {"product_id": product_id, "redis_inventory": False, "available": available}
+
+    @staticmethod
+    async def reconcile(
+        db: AsyncSession,
+        batch: int
+    ) -> list[tuple[int, int]]:
+
+        updated = await product_crud.reconcile_deferred_stock(db, batch)
+        await db.commit()
+
+        _INVENTORY_RECONCILED.inc(amount=len(updated))
+
+        for product_id, stock in updated:
+            if stock < 0:
+                logger.error("Product %s stock went negative after reconciliation: %s", product_id, stock)
+
+        return updated
+
+
+inventory_service = InventoryService()
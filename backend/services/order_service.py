@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from typing import Optional
-from sqlalchemy import select
 from fastapi import BackgroundTasks
 import logging
 
@@ -9,64 +9,205 @@ from backend.crud.product import product_crud
 from backend.schemas.order import OrderCreate
 from backend.models.order_item import OrderItem
 from backend.models.user import User
-from backend.models.product import Product
 from backend.core.utils.order_status_enums import OrderStatus
 
 from backend.crud.cart import cart_crud
+from backend.crud.stock_hold import stock_hold_crud
 
-from backend.core.rabbitmq import publisher_email_event
-from backend.core.cache import cache_invalidate
+from backend.crud.outbox import outbox_crud
+from backend.worker.outbox_relay import notify_outbox
+from backend.core.cache import cache_invalidate, id_tags
+from backend.core.database import mark_recent_write
+from backend.core.config import settings
+from backend.core.idempotency import request_fingerprint
+from backend.services.inventory_service import inventory_service
 
 from backend.core.exceptions.product_exceptions import *
 from backend.core.exceptions.order_exceptions import *
 from backend.core.exceptions.cart_exceptions import CartEmptyError
+from backend.core.exceptions.idempotency_exceptions import IdempotencyKeyReusedError
 
 logger = logging.getLogger(__name__)
 
+ORDER_CREATE_SCOPE = "order:create"
+ORDER_CHECKOUT_SCOPE = "order:checkout"
+
+
+def _order_product_tags(order) -> list[str]:
+    return id_tags("product", attr="product_id")(order.items) + id_tags("stock", attr="product_id")(order.items)
+
+
 class OrderService:
 
     @staticmethod
-    @cache_invalidate(patterns=["products:*"])
-    async def create_order(
+    def _merge_quantities(items) -> dict[int, int]:
+        # Повторы одного товара в заказе складываем в одну позицию, порядок первого появления сохраняем
+        quantities: dict[int, int] = {}
+        for product_id, quantity in items:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+        return quantities
+
+    @staticmethod
+    async def _split_redis_managed(
         db: AsyncSession,
-        order_data: OrderCreate,
-        user_id: int
+        quantities: dict[int, int]
+    ) -> tuple[dict[int, int], dict]:
+
+        if not settings.INVENTORY_REDIS_ENABLED:
+            return quantities, {}
+
+        products = await product_crud.get_checkout_products(db, list(quantities))
+        managed = {product_id: product for product_id, product in products.items() if product.redis_inventory}
+
+        return {product_id: quantity for product_id, quantity in quantities.items() if product_id not in managed}, managed
+
+    @staticmethod
+    async def _reserve_stock(
+        db: AsyncSession,
+        quantities: dict[int, int],
+        hold_owner_id: Optional[int] = None
     ):
+        db_quantities, managed = await OrderService._split_redis_managed(db, quantities)
+        takes = []
+
+        try:
+            # Ходовые товары списываются из счетчиков Redis, в products.stock их переносит сверщик
+            for product_id, product in managed.items():
+                taken = await inventory_service.take(product_id, quantities[product_id])
+
+                if taken is None:
+                    raise ProductInsufficientStockError(product.name)
+
+                takes.append(taken)
+
+            # Брони корзины переходят в продажу; если заказ не пройдет, они вернутся с откатом транзакции
+            holds = {}
+            if hold_owner_id is not None:
+                holds = await stock_hold_crud.take_user_holds(db, hold_owner_id, list(db_quantities))
+
+            reserved, failed = await product_crud.reserve_stock(db, db_quantities, holds)
+
+            if failed:
+                # Списание по остальным позициям откатится вместе с транзакцией
+                product = await product_crud.get_product_by_id(db, failed[0])
+
+                if not product:
+                    raise ProductNotFoundError(failed[0])
+
+                raise ProductInsufficientStockError(product.name)
+        except Exception:
+            await inventory_service.refund(takes)
+            raise
+
+        for product_id, product in managed.items():
+            reserved[product_id] = {"price": product.price, "name": product.name}
+
         total_price = 0
         order_items = []
-        try: 
-            for item in order_data.items:
-                product = await product_crud.get_product_by_id(db, item.product_id, for_update=True)
 
-                if not product:
-                    raise ProductNotFoundError(item.product_id)
-                
-                if product.stock < item.quantity:
-                    raise ProductInsufficientStockError(product.name)
-            
-                total_price += product.price * item.quantity
-                product.stock -= item.quantity
+        for product_id, quantity in quantities.items():
+            price = reserved[product_id]["price"]
+            total_price += price * quantity
+
+            order_items.append(OrderItem(
+                product_id=product_id,
+                quantity=quantity,
+                price_at_purchase=price,
+                stock_deferred=product_id in managed
+            ))
+
+        return total_price, order_items, reserved, takes
+
+    @staticmethod
+    async def _find_idempotent_order(
+        db: AsyncSession,
+        user_id: int,
+        idempotency_key: Optional[str],
+        scope: str,
+        fingerprint: str
+    ):
+        if idempotency_key is None:
+            return None
 
-                order_items.append(OrderItem(
-                    product_id=product.id,
-                    quantity=item.quantity,
-                    price_at_purchase=product.price
-                ))
+        await order_crud.release_expired_idempotency_key(
+            db, user_id, idempotency_key, settings.IDEMPOTENCY_TTL_SECONDS
+        )
+
+        order = await order_crud.get_order_by_idempotency_key(db, user_id, idempotency_key)
+
+        if order is None:
+            return None
+
+        # Те же проверки, что и у записи в Redis: ключ от другого запроса не отдает чужой заказ
+        if order.idempotency_scope != scope or order.idempotency_fingerprint != fingerprint:
+            raise IdempotencyKeyReusedError()
+
+        return order
+
+    @staticmethod
+    @cache_invalidate(result_tags=_order_product_tags)
+    async def create_order(
+        db: AsyncSession,
+        order_data: OrderCreate,
+        user_id: int,
+        idempotency_key: Optional[str] = None
+    ):
+        fingerprint = request_fingerprint(order_data)
+
+        # Повтор уже выполненного запроса: отдаем заказ, не трогая остатки
+        existing = await OrderService._find_idempotent_order(
+            db, user_id, idempotency_key, ORDER_CREATE_SCOPE, fingerprint
+        )
+
+        if existing is not None:
+            return existing
+
+        takes = []
+
+        try: 
+            quantities = OrderService._merge_quantities(
+                (item.product_id, item.quantity) for item in order_data.items
+            )
+
+            total_price, order_items, _, takes = await OrderService._reserve_stock(db, quantities)
 
             new_order = await order_crud._create_order_record(
                 db,
                 user_id=user_id,
                 total_price=total_price,
-                items=order_items
+                items=order_items,
+                idempotency_key=idempotency_key,
+                idempotency_scope=ORDER_CREATE_SCOPE,
+                idempotency_fingerprint=fingerprint
             )
 
             await db.commit()
+            # После коммита единицы проданы: возвращать их в Redis уже нельзя
+            takes = []
             await db.refresh(new_order, attribute_names=["items"])
+            await mark_recent_write(user_id)
 
             return new_order
+
+        except IntegrityError:
+            await db.rollback()
+            await inventory_service.refund(takes)
+
+            # Параллельный дубль успел создать заказ с тем же ключом — возвращаем его
+            existing = await OrderService._find_idempotent_order(
+                db, user_id, idempotency_key, ORDER_CREATE_SCOPE, fingerprint
+            )
+
+            if existing is None:
+                raise
+
+            return existing
         
         except Exception as e:
             await db.rollback()
+            # Заказ не сохранился — единицы возвращаются в счетчики Redis
+            await inventory_service.refund(takes)
             raise e
 
     @staticmethod
@@ -92,7 +233,9 @@ class OrderService:
         user_id: Optional[int] = None,
         status: Optional[OrderStatus] = None,
         skip: int = 0,
-        limit: int = 10
+        limit: int = 10,
+        after: Optional[int] = None,
+        before: Optional[int] = None
     ):
         
         return await order_crud.get_multi_orders(
@@ -100,11 +243,13 @@ class OrderService:
             user_id=user_id,
             status=status,
             skip=skip,
-            limit=limit
+            limit=limit,
+            after=after,
+            before=before
         )
     
     @staticmethod
-    @cache_invalidate(patterns=["products:*"])
+    @cache_invalidate(result_tags=_order_product_tags)
     async def edit_one_order_status_by_id(
         db: AsyncSession,
         order_id: int,
@@ -138,15 +283,21 @@ class OrderService:
                 "Нельзя изменить статус отмененного заказа"
             )
             
+        released = {}
+        managed = {}
+
         if new_status == OrderStatus.CANCELLED and old_status != OrderStatus.CANCELLED:
-            for item in order.items:
-                product = await product_crud.get_product_by_id(db, item.product_id)
-                if product:
-                    product.stock += item.quantity
+            released = OrderService._merge_quantities((item.product_id, item.quantity) for item in order.items)
+            # products.stock возвращается для всех позиций: несверенные продажи сверщик спишет позже, итог сходится
+            await product_crud.release_stock(db, released)
+            _, managed = await OrderService._split_redis_managed(db, released)
 
         updated_order = await order_crud.edit_order_status_by_id(db, order_id, new_status)
 
         await db.commit()
+
+        for product_id in managed:
+            await inventory_service.release(product_id, released[product_id])
         await db.refresh(updated_order, attribute_names=["user", "items"])
 
         return updated_order
@@ -157,24 +308,40 @@ class OrderService:
         current_user: User,
         status: Optional[OrderStatus] = None,
         skip: int = 0,
-        limit: int = 10
+        limit: int = 10,
+        after: Optional[int] = None,
+        before: Optional[int] = None
     ):
         return await order_crud.get_multi_orders(
             db,
             user_id=current_user.id,
             status=status,
             skip=skip,
-            limit=limit
+            limit=limit,
+            after=after,
+            before=before
         )
     
     @staticmethod
-    @cache_invalidate(patterns=["products:*"])
+    @cache_invalidate(result_tags=_order_product_tags)
     async def create_order_from_cart(
         db: AsyncSession,
         user_id: int,
         email: str,
-        background_tasks: BackgroundTasks
+        background_tasks: BackgroundTasks,
+        idempotency_key: Optional[str] = None
     ):
+        # Тело у оформления пустое — отпечаток тот же, что считает слой идемпотентности для payload=None
+        fingerprint = request_fingerprint(None)
+
+        # Проверка до корзины: после первого оформления она уже пуста
+        existing = await OrderService._find_idempotent_order(
+            db, user_id, idempotency_key, ORDER_CHECKOUT_SCOPE, fingerprint
+        )
+
+        if existing is not None:
+            return existing
+
         cart_items = await cart_crud.get_user_cart(db, user_id)
 
         if not cart_items:
@@ -182,50 +349,33 @@ class OrderService:
                 "Ваша корзина пуста. Нечего заказывать!"
             )
         
-        products_ids = [ci.product_id for ci in cart_items]
-
-        prodcut_query = await db.execute(
-            select(Product)
-            .where(Product.id.in_(products_ids))
-            .with_for_update()
-        )
-
-        products_map = {p.id: p for p in prodcut_query.scalars().all()}
-        
-        total_price = 0
-        order_items_to_create = []
+        takes = []
 
         try:
-            for cart_item in cart_items:
-                product = products_map.get(cart_item.product_id)
-
-                if not product:
-                    raise ProductNotFoundError(cart_item.product_id)
-
-                if product.stock < cart_item.quantity:
-                    raise ProductInsufficientStockError(product.name)
-
-                total_price += product.price * cart_item.quantity
-                product.stock -= cart_item.quantity
+            quantities = OrderService._merge_quantities(
+                (cart_item.product_id, cart_item.quantity) for cart_item in cart_items
+            )
 
-                order_items_to_create.append(OrderItem(
-                    product_id=product.id,
-                    quantity=cart_item.quantity,
-                    price_at_purchase=product.price
-                ))
+            total_price, order_items_to_create, reserved, takes = await OrderService._reserve_stock(
+                db, quantities, hold_owner_id=user_id
+            )
 
-            new_order = await order_crud._create_order_record(db, user_id, total_price, order_items_to_create)
+            new_order = await order_crud._create_order_record(
+                db,
+                user_id,
+                total_price,
+                order_items_to_create,
+                idempotency_key=idempotency_key,
+                idempotency_scope=ORDER_CHECKOUT_SCOPE,
+                idempotency_fingerprint=fingerprint
+            )
             await cart_crud.delete_all_cart_items_by_user_id(db, user_id)
 
-            await db.commit()
-            await db.refresh(new_order, attribute_names=["items"])
-
             email_items = []
 
             for item in order_items_to_create:
-                p = products_map.get(item.product_id)
                 email_items.append({
-                    "product_name": p.name if p else "Товар",
+                    "product_name": reserved[item.product_id]["name"],
                     "quantity": item.quantity,
                     "price": float(item.price_at_purchase)
                 })
@@ -240,18 +390,44 @@ class OrderService:
                 "template_data": email_data
             }
 
+            # Письмо уходит через outbox в той же транзакции: без заказа события нет, а с заказом оно не потеряется
+            outbox_crud.add_event(
+                db,
+                settings.RABBITMQ_EMAIL_EXCHANGE,
+                settings.RABBITMQ_EMAIL_QUEUE,
+                email_payload
+            )
+
+            await db.commit()
+            # После коммита единицы проданы: возвращать их в Redis уже нельзя
+            takes = []
+            await db.refresh(new_order, attribute_names=["items"])
+            await mark_recent_write(user_id)
+
+            # Брокер в запросе не участвует: только будим ретранслятор после ответа
             if background_tasks is not None:
-                background_tasks.add_task(publisher_email_event, email_payload)
+                background_tasks.add_task(notify_outbox)
             else:
-                try:
-                    await publisher_email_event(email_payload)
-                except Exception:
-                    logger.warning("Failed to publish email event.", exc_info=True)
+                notify_outbox()
 
             return new_order
+
+        except IntegrityError:
+            await db.rollback()
+            await inventory_service.refund(takes)
+
+            existing = await OrderService._find_idempotent_order(
+                db, user_id, idempotency_key, ORDER_CHECKOUT_SCOPE, fingerprint
+            )
+
+            if existing is None:
+                raise
+
+            return existing
         
         except Exception as e:
             await db.rollback()
+            await inventory_service.refund(takes)
             raise e
     
 order_service = OrderService()
@@ -7,22 +7,43 @@ from PIL import Image
 import io
 import uuid
 import aiofiles
+import functools
+import logging
+import asyncio
+from collections import Counter
+from contextlib import suppress
 
 from backend.crud.product import product_crud
 from backend.crud.category import category_crud
-from backend.schemas.product import ProductCreate, ProductEdit, ProductResponse
-from backend.core.cache import cacheable, cache_invalidate
+from backend.schemas.product import (
+    ProductCreate, ProductEdit, ProductResponse, ProductAvailability,
+    ProductSearchItem, ProductSearchResponse, ProductSearchFacets, CategoryFacet, PriceFacet
+)
+from backend.core.config import settings
+from backend.services.autocomplete_service import autocomplete_service
+from backend.core.cache import cacheable, cache_invalidate, get_entities, get_redis, id_tags, invalidate_tags
 
 from backend.core.exceptions.product_exceptions import *
 from backend.core.exceptions.category_exceptions import *
+from backend.core.exceptions.inventory_exceptions import ProductInventoryManagedError
 
 MAX_FILE_SIZE = 5 * 1024 * 1024
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png"}
+PRODUCT_ENTITY_TTL = 600
+# Остаток меняется с каждой бронью: короткий TTL и свой тег stock:{id}, чтобы корзина не сбрасывала карточки товаров
+PRODUCT_AVAILABILITY_TTL = 5
+PRODUCT_VIEWS_KEY = "stats:product_views"
+
+# Просмотры копятся в памяти воркера и уходят в Redis пачкой, а не ZINCRBY на каждый GET
+_pending_views: Counter[int] = Counter()
+_tasks: list[asyncio.Task] = []
+
+logger = logging.getLogger(__name__)
 
 class ProductService:
     
     @staticmethod
-    @cache_invalidate(patterns=["products:*"])
+    @cache_invalidate(tags=["products:list", "products:search", "products:fts"], result_tags=id_tags("product"))
     async def create_product(
         db: AsyncSession,
         product_data: ProductCreate
@@ -42,14 +63,45 @@ class ProductService:
         await db.commit()
         await db.refresh(product)
 
+        await autocomplete_service.product_changed(product.id, product.name)
+
         return product
     
     @staticmethod
     @cacheable(
         ttl=30,
-        key="products:list:{skip}:{limit}:{min_price}:{max_price}:{category_id}:{show_deleted}",
-        decoder=ProductResponse
+        key="products:ids:{skip}:{limit}:{min_price}:{max_price}:{category_id}:{show_deleted}:{after}:{before}",
+        tags=["products:list"],
+        local_ttl=5,
+        lock_ttl=5,
+        stale_ttl=30,
+        early_refresh_beta=1.0
     )
+    async def get_product_ids(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 10,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        category_id: Optional[int] = None,
+        show_deleted: bool = False,
+        after: Optional[int] = None,
+        before: Optional[int] = None
+    ):
+
+        return await product_crud.get_product_ids(
+            db,
+            skip=skip,
+            limit=limit,
+            min_price=min_price,
+            max_price=max_price,
+            category_id=category_id,
+            show_deleted=show_deleted,
+            after=after,
+            before=before
+        )
+    
+    @staticmethod
     async def get_products_list(
         db: AsyncSession,
         skip: int = 0,
@@ -57,21 +109,67 @@ class ProductService:
         min_price: Optional[Decimal] = None,
         max_price: Optional[Decimal] = None,
         category_id: Optional[int] = None,
-        show_deleted: bool = False
+        show_deleted: bool = False,
+        after: Optional[int] = None,
+        before: Optional[int] = None
     ):
 
-        return await product_crud.get_all_products(
+        product_ids = await ProductService.get_product_ids(
             db,
             skip=skip,
             limit=limit,
             min_price=min_price,
             max_price=max_price,
             category_id=category_id,
-            show_deleted=show_deleted
+            show_deleted=show_deleted,
+            after=after,
+            before=before
+        )
+
+        return await get_entities(
+            "products:entity",
+            product_ids,
+            ProductResponse,
+            loader=functools.partial(product_crud.get_products_by_ids, db),
+            ttl=PRODUCT_ENTITY_TTL,
+            tag="product",
+            local_ttl=10
         )
     
     @staticmethod
-    @cacheable(ttl=60, key="products:by_id:{product_id}:{show_deleted}", decoder=ProductResponse)
+    async def with_availability(
+        db: AsyncSession,
+        products: list
+    ) -> list:
+
+        if not products:
+            return []
+
+        stocks = await get_entities(
+            "products:available",
+            [product.id for product in products],
+            ProductAvailability,
+            loader=functools.partial(product_crud.get_available_stocks, db),
+            ttl=PRODUCT_AVAILABILITY_TTL,
+            tag="stock"
+        )
+        available = {item.id: item.available_stock for item in stocks}
+
+        # Карточки могут быть общими объектами из L1, поэтому копируем, а не меняем на месте
+        return [product.model_copy(update={"available_stock": available.get(product.id)}) for product in products]
+    
+    @staticmethod
+    @cacheable(
+        ttl=60,
+        key="products:by_id:{product_id}:{show_deleted}",
+        decoder=ProductResponse,
+        tags=["product:{product_id}"],
+        local_ttl=10,
+        stale_ttl=60,
+        early_refresh_beta=1.0,
+        cache_exceptions=(ProductNotFoundError,),
+        negative_ttl=30
+    )
     async def get_one_product_by_id(
         db: AsyncSession,
         product_id: int,
@@ -86,7 +184,54 @@ class ProductService:
         return product
     
     @staticmethod
-    @cacheable(ttl=20, key="products:search:{name_query}", decoder=ProductResponse)
+    def record_product_view(product_id: int):
+        _pending_views[product_id] += 1
+
+    @staticmethod
+    async def flush_product_views() -> int:
+        redis_client = get_redis()
+
+        if redis_client is None or not _pending_views:
+            return 0
+
+        views = dict(_pending_views)
+        _pending_views.clear()
+
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for product_id, count in views.items():
+                    pipe.zincrby(PRODUCT_VIEWS_KEY, count, product_id)
+                # Хвост рейтинга не нужен ни прогреву, ни автокомплиту
+                pipe.zremrangebyrank(PRODUCT_VIEWS_KEY, 0, -(settings.PRODUCT_VIEWS_KEEP + 1))
+                await pipe.execute()
+        except Exception:
+            # Возвращаем счетчики в буфер, чтобы не потерять их до следующего сброса
+            _pending_views.update(views)
+            logger.debug("Product view flush failed", exc_info=True)
+            return 0
+
+        return len(views)
+    
+    @staticmethod
+    async def get_most_viewed_product_ids(limit: int) -> list[int]:
+        redis_client = get_redis()
+
+        if redis_client is None or limit <= 0:
+            return []
+
+        product_ids = await redis_client.zrevrange(PRODUCT_VIEWS_KEY, 0, limit - 1)
+
+        return [int(product_id) for product_id in product_ids]
+    
+    @staticmethod
+    @cacheable(
+        ttl=20,
+        key="products:search:{name_query}",
+        decoder=ProductResponse,
+        tags=["products:search"],
+        result_tags=id_tags("product"),
+        compression="zstd"
+    )
     async def search_products_by_name(
         db: AsyncSession,
         name_query: str
@@ -102,7 +247,71 @@ class ProductService:
         return products
     
     @staticmethod
-    @cache_invalidate(patterns=["products:*"])
+    @cacheable(
+        ttl=20,
+        key="products:fts:{text_query}:{limit}:{min_price}:{max_price}:{category_id}:{after}",
+        decoder=ProductSearchResponse,
+        tags=["products:fts"],
+        result_tags=lambda result: [f"product:{item.id}" for item in result.items],
+        compression="zstd"
+    )
+    async def search_products(
+        db: AsyncSession,
+        text_query: str,
+        limit: int = 10,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        category_id: Optional[int] = None,
+        after: Optional[tuple[float, int]] = None
+    ):
+
+        ts_query = product_crud.build_tsquery(text_query)
+
+        if ts_query is None:
+            return ProductSearchResponse()
+
+        buckets = settings.SEARCH_PRICE_BUCKETS
+
+        found = await product_crud.search_products(
+            db,
+            ts_query,
+            limit=limit,
+            min_price=min_price,
+            max_price=max_price,
+            category_id=category_id,
+            after=after,
+            price_buckets=tuple(buckets)
+        )
+
+        items = [
+            ProductSearchItem(**ProductResponse.model_validate(product).model_dump(), rank=rank)
+            for product, rank in found["items"]
+        ]
+
+        # width_bucket возвращает 0 для цен ниже первой границы и len(buckets) для цен выше последней
+        prices = [
+            PriceFacet(
+                min_price=buckets[bucket - 1] if bucket > 0 else None,
+                max_price=buckets[bucket] if bucket < len(buckets) else None,
+                count=count
+            )
+            for bucket, count in found["prices"]
+        ]
+
+        return ProductSearchResponse(
+            items=items,
+            total=found["total"],
+            facets=ProductSearchFacets(
+                categories=[
+                    CategoryFacet(category_id=category_id, name=name, count=count)
+                    for category_id, name, count in found["categories"]
+                ],
+                prices=prices
+            )
+        )
+    
+    @staticmethod
+    @cache_invalidate(tags=["product:{product_id}", "stock:{product_id}"])
     async def edit_one_product_by_id(
         db: AsyncSession,
         product_id: int,
@@ -113,14 +322,32 @@ class ProductService:
 
         if product is None:
             raise ProductNotFoundError(product_id)
+
+        if "stock" in updated_data.model_fields_set and product.redis_inventory and settings.INVENTORY_REDIS_ENABLED:
+            # Остаток живет в счетчиках Redis: правка в обход них разъедется при сверке
+            await db.rollback()
+            raise ProductInventoryManagedError()
         
         await db.commit()
         await db.refresh(product)
 
+        # Списки хранят только id: сбрасываем их, лишь если правка меняет выборку
+        stale_tags = []
+        if "price" in updated_data.model_fields_set:
+            stale_tags.append("products:list")
+        if "name" in updated_data.model_fields_set:
+            stale_tags.append("products:search")
+        if updated_data.model_fields_set & {"name", "description", "price"}:
+            stale_tags.append("products:fts")
+        await invalidate_tags(*stale_tags)
+
+        if "name" in updated_data.model_fields_set and not product.is_delete:
+            await autocomplete_service.product_changed(product.id, product.name)
+
         return product
     
     @staticmethod
-    @cache_invalidate(patterns=["products:*"])
+    @cache_invalidate(tags=["product:{product_id}", "products:list", "products:search", "products:fts"])
     async def delete_one_product_by_id(
         db: AsyncSession,
         product_id: int
@@ -133,10 +360,12 @@ class ProductService:
         
         await db.commit()
 
+        await autocomplete_service.product_changed(product_id, None)
+
         return {"message": f"Товар с ID({product_id}) успешно удален"}
     
     @staticmethod
-    @cache_invalidate(patterns=["products:*"])
+    @cache_invalidate(tags=["product:{product_id}", "products:list", "products:search", "products:fts"])
     async def restore_one_product_by_id(
         db: AsyncSession,
         product_id: int
@@ -150,6 +379,8 @@ class ProductService:
             await db.commit()
             await db.refresh(product)
 
+            await autocomplete_service.product_changed(product.id, product.name)
+
             return product
         
         except ValueError:
@@ -166,7 +397,7 @@ class ProductService:
         return products
     
     @staticmethod
-    @cache_invalidate(patterns=["products:*"])
+    @cache_invalidate(tags=["product:{product_id}"])
     async def update_product_image(
         db: AsyncSession,
         product_id: int,
@@ -220,4 +451,26 @@ class ProductService:
 
         return product
     
+async def _flush_views_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.PRODUCT_VIEWS_FLUSH_SECONDS)
+        await ProductService.flush_product_views()
+
+
+def start_product_views_flush() -> None:
+    if _tasks:
+        return
+    _tasks.append(asyncio.create_task(_flush_views_periodically()))
+
+
+async def stop_product_views_flush() -> None:
+    while _tasks:
+        task = _tasks.pop()
+        task.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await task
+    # Остаток буфера отправляем до закрытия Redis
+    await ProductService.flush_product_views()
+
+
 product_service = ProductService()
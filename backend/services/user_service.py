@@ -6,7 +6,7 @@ from fastapi.security import OAuth2PasswordBearer
 from backend.crud.user import user_crud
 from backend.schemas.user import UserRegister, UserLogin
 from backend.core.utils.security import hash_password
-from backend.core.database import get_db
+from backend.core.database import get_db, get_read_db, has_recent_write
 from backend.models.user import User
 
 from backend.core.exceptions.auth_exceptions import *
@@ -53,6 +53,16 @@ async def get_current_admin_user(
             raise AuthorizationError()
         return current_user
 
+async def get_user_read_db(
+        current_user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db),
+        read_db: AsyncSession = Depends(get_read_db)
+) -> AsyncSession:
+    # Сессии ленивые: соединение берет только та, которую вернем
+    if await has_recent_write(current_user.id):
+        return db
+    return read_db
+
 class UserService:
 
     @staticmethod
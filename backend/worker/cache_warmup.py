@@ -0,0 +1,132 @@
+import asyncio
+import logging
+
+from backend.core.cache import close_redis, get_redis
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.core.exceptions.product_exceptions import ProductNotFoundError
+from backend.services.category_service import category_service
+from backend.services.product_service import PRODUCT_VIEWS_KEY, product_service
+
+logger = logging.getLogger(__name__)
+
+WARMUP_LOCK_KEY = "cache_warmup:lock"
+WARMUP_LOCK_TTL = 60
+
+
+async def _warm_categories(page_size: int) -> list[int]:
+    category_ids = []
+    skip = 0
+
+    # Страницы категорий идут последовательно: следующая нужна, только если текущая полная
+    async with AsyncSessionLocal() as session:
+        while True:
+            categories = await category_service.get_all_categories(session, skip=skip, limit=page_size)
+            category_ids.extend(category.id for category in categories)
+            if len(categories) < page_size:
+                break
+            skip += page_size
+
+    return category_ids
+
+
+async def _warm_product_pages(semaphore: asyncio.Semaphore, category_id: int | None, pages: int, page_size: int) -> int:
+    warmed = 0
+
+    async with semaphore:
+        async with AsyncSessionLocal() as session:
+            for page in range(pages):
+                products = await product_service.get_products_list(
+                    session,
+                    skip=page * page_size,
+                    limit=page_size,
+                    category_id=category_id
+                )
+                warmed += 1
+                if len(products) < page_size:
+                    break
+
+    return warmed
+
+
+async def _warm_product(semaphore: asyncio.Semaphore, product_id: int) -> bool:
+    async with semaphore:
+        async with AsyncSessionLocal() as session:
+            try:
+                await product_service.get_one_product_by_id(session, product_id)
+            except ProductNotFoundError:
+                await get_redis().zrem(PRODUCT_VIEWS_KEY, product_id)
+                return False
+
+    return True
+
+
+async def warm_cache(
+    pages: int | None = None,
+    page_size: int | None = None,
+    top_products: int | None = None,
+    concurrency: int | None = None
+) -> dict[str, int]:
+    pages = settings.CACHE_WARMUP_PAGES if pages is None else pages
+    page_size = settings.CACHE_WARMUP_PAGE_SIZE if page_size is None else page_size
+    top_products = settings.CACHE_WARMUP_TOP_PRODUCTS if top_products is None else top_products
+    concurrency = settings.CACHE_WARMUP_CONCURRENCY if concurrency is None else concurrency
+
+    stats = {"categories": 0, "product_pages": 0, "products": 0}
+    redis_client = get_redis()
+
+    if redis_client is None:
+        return stats
+
+    category_ids = await _warm_categories(page_size)
+    stats["categories"] = len(category_ids)
+
+    # Семафор ограничивает число одновременных сессий, чтобы не забить пул Postgres
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    await redis_client.zremrangebyrank(PRODUCT_VIEWS_KEY, 0, -(settings.PRODUCT_VIEWS_KEEP + 1))
+    product_ids = await product_service.get_most_viewed_product_ids(top_products)
+
+    tasks = [_warm_product_pages(semaphore, None, pages, page_size)]
+    tasks += [_warm_product_pages(semaphore, category_id, pages, page_size) for category_id in category_ids]
+    tasks += [_warm_product(semaphore, product_id) for product_id in product_ids]
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.warning("Cache warm-up task failed", exc_info=result)
+        elif index <= len(category_ids):
+            stats["product_pages"] += result
+        elif result:
+            stats["products"] += 1
+
+    logger.info("Cache warm-up finished: %s", stats)
+
+    return stats
+
+
+async def warm_cache_on_startup() -> None:
+    redis_client = get_redis()
+
+    if redis_client is None:
+        return
+
+    # Несколько воркеров uvicorn стартуют одновременно — прогревает только один
+    try:
+        acquired = await redis_client.set(WARMUP_LOCK_KEY, "1", nx=True, ex=WARMUP_LOCK_TTL)
+        if acquired:
+            await warm_cache()
+    except Exception:
+        logger.warning("Cache warm-up failed", exc_info=True)
+
+
+async def main():
+    try:
+        await warm_cache()
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,6 +4,7 @@ import logging
 import aio_pika
 from pydantic import ValidationError
 
+from backend.core.cache import get_redis
 from backend.core.config import settings
 from backend.core.rabbitmq import setup_rabbitmq
 from backend.schemas.email_event import EmailOrderConfirmationEvent
@@ -24,6 +25,46 @@ def _get_retry_count(message: aio_pika.IncomingMessage) -> int:
             continue
     return count
 
+
+def _dedup_key(message_id: str) -> str:
+    return f"email:delivered:{message_id}"
+
+
+async def _claim_delivery(message_id: str | None) -> str:
+    # Outbox доставляет at-least-once: повтор с тем же message_id (outbox-{id}) не должен отправить второе письмо.
+    # "processing" живет недолго: если консюмер упал посреди отправки, повтор дойдет после истечения
+    redis_client = get_redis()
+
+    if redis_client is None or not message_id:
+        return "claimed"
+
+    try:
+        if await redis_client.set(_dedup_key(message_id), "processing", nx=True, ex=settings.EMAIL_DEDUP_PROCESSING_SECONDS):
+            return "claimed"
+        state = await redis_client.get(_dedup_key(message_id))
+    except Exception:
+        # Без Redis лучше повторное письмо, чем потерянное
+        logger.warning("Email dedup check failed for %s", message_id, exc_info=True)
+        return "claimed"
+
+    return "delivered" if state == b"delivered" else "in_progress"
+
+
+async def _finish_delivery(message_id: str | None, delivered: bool) -> None:
+    redis_client = get_redis()
+
+    if redis_client is None or not message_id:
+        return
+
+    try:
+        if delivered:
+            await redis_client.set(_dedup_key(message_id), "delivered", ex=settings.EMAIL_DEDUP_TTL_SECONDS)
+        else:
+            await redis_client.delete(_dedup_key(message_id))
+    except Exception:
+        logger.warning("Email dedup update failed for %s", message_id, exc_info=True)
+
+
 async def main():
     await setup_rabbitmq()
 
@@ -76,15 +117,29 @@ async def main():
                 await message.ack()
                 continue
 
+            claim = await _claim_delivery(message.message_id)
+            if claim == "delivered":
+                logger.info("Duplicate email event %s skipped.", message.message_id)
+                await message.ack()
+                continue
+            if claim == "in_progress":
+                # Тот же message_id сейчас отправляет другой консюмер: повторим через очередь ретраев
+                await message.nack(requeue=False)
+                continue
+
             try:
                 await email_service.send_order_confirmation(
                     email_to=event.email_to,
                     template_data=event.template_data
                 )
-                await message.ack()
             except Exception:
+                await _finish_delivery(message.message_id, delivered=False)
                 logger.warning("Email send failed; retrying via DLQ/TTL.", exc_info=True)
                 await message.nack(requeue=False)
+                continue
+
+            await _finish_delivery(message.message_id, delivered=True)
+            await message.ack()
 
 
 if __name__ == "__main__":
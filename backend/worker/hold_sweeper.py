@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from contextlib import suppress
+
+from backend.core.cache import invalidate_tags
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.crud.stock_hold import stock_hold_crud
+
+logger = logging.getLogger(__name__)
+
+_tasks: list[asyncio.Task] = []
+
+
+async def sweep_once(batch: int | None = None) -> int:
+    batch = settings.CART_HOLD_SWEEP_BATCH if batch is None else batch
+    released = 0
+
+    # Просроченные брони снимаются пачками, каждая — отдельная короткая транзакция
+    while True:
+        async with AsyncSessionLocal() as session:
+            product_ids = await stock_hold_crud.sweep_expired_holds(session, batch)
+            await session.commit()
+
+        if not product_ids:
+            return released
+
+        released += len(product_ids)
+        await invalidate_tags(*(f"stock:{product_id}" for product_id in product_ids))
+
+
+async def run_sweeper() -> None:
+    while True:
+        try:
+            await sweep_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Cart hold sweep failed", exc_info=True)
+        await asyncio.sleep(settings.CART_HOLD_SWEEP_INTERVAL)
+
+
+def start_hold_sweeper() -> None:
+    if _tasks or not settings.CART_HOLD_SWEEPER_ON_STARTUP:
+        return
+    _tasks.append(asyncio.create_task(run_sweeper()))
+
+
+async def stop_hold_sweeper() -> None:
+    while _tasks:
+        task = _tasks.pop()
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+if __name__ == "__main__":
+    asyncio.run(run_sweeper())
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from contextlib import suppress
+
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.services.inventory_service import inventory_service
+
+logger = logging.getLogger(__name__)
+
+_tasks: list[asyncio.Task] = []
+
+
+async def reconcile_once(batch: int | None = None) -> int:
+    batch = settings.INVENTORY_RECONCILE_BATCH if batch is None else batch
+    reconciled = 0
+
+    # Пачки идут подряд, пока очередь не опустеет; каждая — отдельная короткая транзакция
+    while True:
+        async with AsyncSessionLocal() as session:
+            updated = await inventory_service.reconcile(session, batch)
+
+        reconciled += len(updated)
+        if not updated:
+            return reconciled
+
+
+async def run_reconciler() -> None:
+    while True:
+        try:
+            await reconcile_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Inventory reconciliation failed", exc_info=True)
+        await asyncio.sleep(settings.INVENTORY_RECONCILE_INTERVAL)
+
+
+def start_inventory_reconciler() -> None:
+    if _tasks or not (settings.INVENTORY_REDIS_ENABLED and settings.INVENTORY_RECONCILER_ON_STARTUP):
+        return
+    _tasks.append(asyncio.create_task(run_reconciler()))
+
+
+async def stop_inventory_reconciler() -> None:
+    while _tasks:
+        task = _tasks.pop()
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+if __name__ == "__main__":
+    asyncio.run(run_reconciler())
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from contextlib import suppress
+
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.core.metrics import Counter
+from backend.core.rabbitmq import close_rabbitmq, publish_batch
+from backend.crud.outbox import outbox_crud
+
+logger = logging.getLogger(__name__)
+
+_tasks: list[asyncio.Task] = []
+# Будит ретранслятор этого процесса сразу после коммита заказа, не дожидаясь очередного опроса
+_wakeup: asyncio.Event | None = None
+
+_OUTBOX_PUBLISHED = Counter(
+    "outbox_events_published_total",
+    "Outbox events confirmed by the broker",
+)
+_OUTBOX_FAILURES = Counter(
+    "outbox_publish_failures_total",
+    "Outbox events postponed after a failed publish",
+)
+
+
+def notify_outbox() -> None:
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def relay_once(batch: int | None = None) -> int:
+    batch = settings.OUTBOX_BATCH_SIZE if batch is None else batch
+
+    # Захват — короткая транзакция: строки не держатся под FOR UPDATE, пока ждем подтверждений брокера
+    async with AsyncSessionLocal() as session:
+        events = await outbox_crud.claim_batch(session, batch, settings.OUTBOX_CLAIM_LEASE_SECONDS)
+        await session.commit()
+
+    if not events:
+        return 0
+
+    try:
+        errors = await publish_batch([
+            (event.exchange, event.routing_key, event.payload, f"outbox-{event.id}") for event in events
+        ])
+    except Exception as exc:
+        logger.warning("Outbox publish failed for %s events", len(events), exc_info=True)
+        errors = [exc] * len(events)
+
+    async with AsyncSessionLocal() as session:
+        # Удаляем только подтвержденные брокером: при падении до коммита событие уйдет повторно после аренды (at-least-once)
+        await outbox_crud.delete_events(session, [event.id for event, error in zip(events, errors) if error is None])
+
+        for event, error in zip(events, errors):
+            if error is not None:
+                delay = min(2 ** event.attempts, settings.OUTBOX_MAX_BACKOFF_SECONDS)
+                await outbox_crud.postpone_event(session, event.id, delay, repr(error))
+
+        await session.commit()
+
+    failed = sum(error is not None for error in errors)
+    _OUTBOX_PUBLISHED.inc(amount=len(events) - failed)
+    _OUTBOX_FAILURES.inc(amount=failed)
+
+    return len(events)
+
+
+async def run_relay() -> None:
+    global _wakeup
+    _wakeup = asyncio.Event()
+
+    while True:
+        try:
+            processed = await relay_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Outbox relay iteration failed", exc_info=True)
+            processed = 0
+
+        # Полная пачка — в очереди есть еще, забираем без паузы
+        if processed >= settings.OUTBOX_BATCH_SIZE:
+            continue
+
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(_wakeup.wait(), settings.OUTBOX_POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def start_outbox_relay() -> None:
+    if _tasks or not settings.OUTBOX_RELAY_ON_STARTUP:
+        return
+    _tasks.append(asyncio.create_task(run_relay()))
+
+
+async def stop_outbox_relay() -> None:
+    while _tasks:
+        task = _tasks.pop()
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+async def main():
+    try:
+        await run_relay()
+    finally:
+        await close_rabbitmq()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+import random
+import statistics
+import time
+
+from backend.services.autocomplete_service import AutocompleteIndex
+
+SIZES = (100_000, 1_000_000)
+LOOKUPS = 20_000
+
+BRANDS = ("Apple", "Samsung", "Xiaomi", "Lenovo", "Sony", "Asus", "Huawei", "Acer")
+LINES = ("iPhone", "Galaxy", "Redmi", "ThinkPad", "MacBook", "Ноутбук", "Наушники", "Планшет", "Смартфон", "Монитор")
+
+
+def _names(size: int):
+    for product_id in range(1, size + 1):
+        yield product_id, f"{BRANDS[product_id % 8]} {LINES[(product_id // 8) % 10]} {product_id % 997}"
+
+
+def _prefixes(rng: random.Random) -> list[str]:
+    # Имитация ввода: префиксы длиной 1-6 символов от случайных слов каталога
+    words = [word.lower() for word in BRANDS + LINES]
+    return [rng.choice(words)[:rng.randint(1, 6)] for _ in range(LOOKUPS)]
+
+
+def _measure(index: AutocompleteIndex, prefixes: list[str]) -> list[float]:
+    timings = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        index.suggest(prefix, 10)
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)
+
+
+def main() -> None:
+    rng = random.Random(42)
+    prefixes = _prefixes(rng)
+
+    print(f"{'products':>10} {'build':>9} {'p50':>9} {'p99':>9} {'max':>9}")
+    for size in SIZES:
+        started = time.perf_counter()
+        index = AutocompleteIndex()
+        index.build(_names(size))
+        index.set_popularity({rng.randint(1, size): float(rng.randint(1, 1000)) for _ in range(1000)})
+        build = time.perf_counter() - started
+
+        timings = _measure(index, prefixes)
+
+        print(
+            f"{size:>10} {build:>8.1f}s {statistics.median(timings) * 1e6:>6.0f} us"
+            f" {timings[int(len(timings) * 0.99) - 1] * 1e6:>6.0f} us {timings[-1] * 1e6:>6.0f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
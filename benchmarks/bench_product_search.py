@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from sqlalchemy import select, func, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from backend.core.config import settings
+from backend.crud.product import product_crud
+from backend.models.cart import CartItem
+from backend.models.category import Category
+from backend.models.order import Order
+from backend.models.order_item import OrderItem
+from backend.models.product import Product
+from backend.models.user import User
+
+SCHEMA = "bench_search"
+SIZES = (100_000, 1_000_000)
+ROUNDS = 5
+
+QUERIES = ("iphone", "galaxy", "ноутбук", "macbok", "xiaomi redmi", "thinkpad", "наушники sony", "zzz")
+
+# Названия собираются из бренда, линейки и номера модели, как в реальном каталоге
+SEED_SQL = """
+INSERT INTO {schema}.products (name, description, price, stock, category_id, is_delete)
+SELECT
+    (ARRAY['Apple','Samsung','Xiaomi','Lenovo','Sony','Asus','Huawei','Acer'])[1 + g % 8]
+    || ' ' || (ARRAY['iPhone','Galaxy','Redmi','ThinkPad','MacBook','Ноутбук','Наушники','Планшет','Смартфон','Монитор'])[1 + (g / 8) % 10]
+    || ' ' || (g % 997)::text,
+    'bench',
+    100 + g % 5000,
+    g % 50,
+    1,
+    g % 20 = 0
+FROM generate_series(1, :size) AS g
+"""
+
+
+def legacy_search(name_query: str, limit: int = 10):
+    # Запрос до перевода на операторы pg_trgm: функции в WHERE не используют индекс
+    word_sim = func.word_similarity(Product.name, name_query)
+    full_sim = func.similarity(Product.name, name_query)
+    return (
+        select(Product)
+        .where(
+            or_(
+                Product.name.ilike(f"%{name_query}%"),
+                word_sim > 0.4,
+                full_sim > 0.1,
+            ),
+            Product.is_delete == False
+        )
+        .order_by(word_sim.desc(), full_sim.desc())
+        .limit(limit)
+    )
+
+
+async def _timed(session_factory, run) -> list[float]:
+    timings = []
+    for _ in range(ROUNDS):
+        for name_query in QUERIES:
+            async with session_factory() as db:
+                started = time.perf_counter()
+                await run(db, name_query)
+                timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def _run_legacy(db, name_query):
+    await db.execute(legacy_search(name_query))
+
+
+async def _run_current(db, name_query):
+    await product_crud.seacrh_products_by_name(db, name_query)
+
+
+def _format(timings: list[float]) -> str:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    return f"{statistics.median(timings) * 1e3:>8.1f} / {p95 * 1e3:>7.1f} ms"
+
+
+async def bench(url: str, sizes, keep: bool) -> None:
+    engine = create_async_engine(url, execution_options={"schema_translate_map": {None: SCHEMA}})
+
+    def session_factory():
+        return AsyncSession(engine, expire_on_commit=False)
+
+    print(f"{'products':>10} {'legacy p50/p95':>22} {'no index p50/p95':>22} {'gin p50/p95':>22}")
+    try:
+        for size in sizes:
+            async with engine.begin() as conn:
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+                await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+                await conn.run_sync(
+                    lambda sync_conn: Category.metadata.create_all(
+                        sync_conn, tables=[Category.__table__, Product.__table__]
+                    )
+                )
+                await conn.execute(text(f"DROP INDEX {SCHEMA}.ix_products_active_name_trgm"))
+                await conn.execute(text(f"INSERT INTO {SCHEMA}.categories (name, slug, is_delete) VALUES ('bench', 'bench', false)"))
+                await conn.execute(text(SEED_SQL.format(schema=SCHEMA)), {"size": size})
+                await conn.execute(text(f"ANALYZE {SCHEMA}.products"))
+
+            legacy = await _timed(session_factory, _run_legacy)
+            no_index = await _timed(session_factory, _run_current)
+
+            async with engine.begin() as conn:
+                await conn.execute(text(
+                    f"CREATE INDEX ix_products_active_name_trgm ON {SCHEMA}.products "
+                    f"USING gin (name gin_trgm_ops) WHERE is_delete = false"
+                ))
+                await conn.execute(text(f"ANALYZE {SCHEMA}.products"))
+
+            indexed = await _timed(session_factory, _run_current)
+
+            print(f"{size:>10} {_format(legacy):>22} {_format(no_index):>22} {_format(indexed):>22}")
+    finally:
+        if not keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Поиск товаров по названию: старый запрос против pg_trgm + GIN")
+    parser.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL", settings.DATABASE_URL))
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--keep", action="store_true", help="не удалять схему с данными после прогона")
+    args = parser.parse_args()
+
+    asyncio.run(bench(args.url, args.sizes, args.keep))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import time
+
+from backend.core import rabbitmq
+from backend.core.rabbitmq import RabbitPublisher, _build_message
+
+MESSAGES = 2000
+CONCURRENCY = 50
+BATCH = 100
+EXCHANGE = "email.exchange"
+ROUTING_KEY = "email.order_confirmation"
+
+
+class StandInExchange:
+
+    def __init__(self, broker: "StandInBroker"):
+        self.broker = broker
+
+    async def publish(self, message, routing_key, timeout=None):
+        # basic.publish без ответа, ждем только basic.ack: подтверждения разных публикаций идут параллельно
+        await self.broker.round_trip()
+        self.broker.confirmed += 1
+
+
+class StandInChannel:
+
+    def __init__(self, broker: "StandInBroker"):
+        self.broker = broker
+        self.is_closed = False
+
+    async def get_exchange(self, name):
+        # exchange.declare passive
+        await self.broker.round_trip()
+        return StandInExchange(self.broker)
+
+    async def close(self):
+        await self.broker.round_trip()
+        self.is_closed = True
+
+
+class StandInBroker:
+    # Вместо брокера — задержка сети на каждый AMQP-вызов, которого клиент ждет
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.is_closed = False
+        self.confirmed = 0
+        self.amqp_calls = 0
+
+    async def round_trip(self):
+        self.amqp_calls += 1
+        await asyncio.sleep(self.rtt)
+
+    async def channel(self, publisher_confirms=False):
+        # channel.open + confirm.select
+        await self.round_trip()
+        await self.round_trip()
+        return StandInChannel(self)
+
+
+async def _channel_per_event(payload: dict) -> None:
+    # Прежняя публикация письма из запроса: канал, exchange и закрытие на каждое событие
+    connection = await rabbitmq._get_connection()
+    channel = await connection.channel(publisher_confirms=True)
+    try:
+        exchange = await channel.get_exchange(EXCHANGE)
+        await exchange.publish(_build_message(payload), routing_key=ROUTING_KEY)
+    finally:
+        await channel.close()
+
+
+async def _concurrently(messages: int, concurrency: int, publish) -> None:
+    pending = iter(range(messages))
+
+    async def worker():
+        for order_id in pending:
+            await publish({"order_id": order_id})
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def _batched(publisher: RabbitPublisher, messages: int, batch: int) -> None:
+    for start in range(0, messages, batch):
+        errors = await publisher.publish_batch([
+            (EXCHANGE, ROUTING_KEY, {"order_id": order_id}, f"outbox-{order_id}")
+            for order_id in range(start, min(start + batch, messages))
+        ])
+        assert not any(errors)
+
+
+async def bench(messages: int, concurrency: int, batch: int, rtt: float, pool_size: int) -> None:
+    rabbitmq._topology_ready = True
+
+    async def run(name: str, scenario) -> None:
+        broker = StandInBroker(rtt)
+        rabbitmq._connection = broker
+        publisher = RabbitPublisher(pool_size=pool_size)
+
+        started = time.perf_counter()
+        await scenario(publisher)
+        elapsed = time.perf_counter() - started
+
+        await publisher.close()
+        assert broker.confirmed == messages
+
+        print(
+            f"{name:<22} {messages / elapsed:>10.0f} msg/s {broker.amqp_calls / messages:>10.2f}"
+        )
+
+    print(f"{'mode':<22} {'throughput':>16} {'amqp/msg':>10}")
+    await run(f"channel per event x{concurrency}", lambda _: _concurrently(messages, concurrency, _channel_per_event))
+    await run(
+        f"pooled publish x{concurrency}",
+        lambda publisher: _concurrently(
+            messages, concurrency, lambda payload: publisher.publish(EXCHANGE, ROUTING_KEY, payload)
+        ),
+    )
+    await run(f"pooled batch of {batch}", lambda publisher: _batched(publisher, messages, batch))
+
+    rabbitmq._connection = None
+    rabbitmq._topology_ready = False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Публикация в RabbitMQ: канал на событие против пула каналов и пачек")
+    parser.add_argument("--messages", type=int, default=MESSAGES)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--batch", type=int, default=BATCH)
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="задержка на один AMQP round trip")
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    asyncio.run(bench(args.messages, args.concurrency, args.batch, args.rtt_ms / 1000, args.pool_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,8 @@ from backend.models.order_item import OrderItem
 from backend.models.order import Order
 from backend.models.category import Category
 from backend.models.cart import CartItem
+from backend.models.stock_hold import StockHold
+from backend.models.outbox import OutboxEvent
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,46 @@
+"""add cart stock holds
+
+Revision ID: a7c2e4f8b1d3
+Revises: e5f1a9c3b7d4
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c2e4f8b1d3'
+down_revision: Union[str, Sequence[str], None] = 'e5f1a9c3b7d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'products',
+        sa.Column('held', sa.Integer(), server_default=sa.text('0'), nullable=False)
+    )
+    op.create_table(
+        'stock_holds',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'product_id', name='uq_stock_holds_user_id_product_id')
+    )
+    op.create_index('ix_stock_holds_expires_at', 'stock_holds', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_holds_expires_at', table_name='stock_holds')
+    op.drop_table('stock_holds')
+    op.drop_column('products', 'held')
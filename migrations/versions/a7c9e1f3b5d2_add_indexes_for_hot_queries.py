@@ -0,0 +1,52 @@
+"""add indexes for hot queries
+
+Revision ID: a7c9e1f3b5d2
+Revises: f2a1c3d4e5f6
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c9e1f3b5d2'
+down_revision: Union[str, Sequence[str], None] = 'f2a1c3d4e5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_PRODUCTS = sa.text("is_delete = false")
+
+INDEXES = [
+    ("ix_products_active_category_id_id", "products", ["category_id", "id"], ACTIVE_PRODUCTS),
+    ("ix_products_active_price", "products", ["price"], ACTIVE_PRODUCTS),
+    ("ix_orders_user_id_id", "orders", ["user_id", "id"], None),
+    ("ix_orders_user_id_status_id", "orders", ["user_id", "status", "id"], None),
+    ("ix_orders_status_id", "orders", ["status", "id"], None),
+    ("ix_order_items_order_id", "order_items", ["order_id"], None),
+    ("ix_cart_items_user_id_product_id", "cart_items", ["user_id", "product_id"], None),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в таблицы, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=where,
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,39 @@
+"""add order idempotency key
+
+Revision ID: b3f9d2a6c8e1
+Revises: a7c2e4f8b1d3
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f9d2a6c8e1'
+down_revision: Union[str, Sequence[str], None] = 'a7c2e4f8b1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orders', sa.Column('idempotency_key', sa.String(length=255), nullable=True))
+    op.add_column('orders', sa.Column('idempotency_scope', sa.String(length=32), nullable=True))
+    op.add_column('orders', sa.Column('idempotency_fingerprint', sa.String(length=64), nullable=True))
+    op.create_index(
+        'uq_orders_user_id_idempotency_key',
+        'orders',
+        ['user_id', 'idempotency_key'],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_orders_user_id_idempotency_key', table_name='orders')
+    op.drop_column('orders', 'idempotency_fingerprint')
+    op.drop_column('orders', 'idempotency_scope')
+    op.drop_column('orders', 'idempotency_key')
@@ -0,0 +1,86 @@
+"""add full text search to products
+
+Revision ID: d9e3b7c1a4f2
+Revises: c4d8f2a6e9b1
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9e3b7c1a4f2'
+down_revision: Union[str, Sequence[str], None] = 'c4d8f2a6e9b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    op.execute("""
+    CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('russian', coalesce((SELECT name FROM categories WHERE id = NEW.category_id), '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+    CREATE TRIGGER products_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, description, category_id ON products
+        FOR EACH ROW EXECUTE FUNCTION products_search_vector_update()
+    """)
+    op.execute("""
+    CREATE OR REPLACE FUNCTION categories_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE products SET category_id = category_id WHERE category_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+    CREATE TRIGGER categories_search_vector_trigger
+        AFTER UPDATE OF name ON categories
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION categories_search_vector_update()
+    """)
+
+    # Заполняем вектор для существующих товаров через тот же триггер
+    op.execute("UPDATE products SET category_id = category_id")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_products_active_search_vector",
+            "products",
+            ["search_vector"],
+            postgresql_using="gin",
+            postgresql_where=sa.text("is_delete = false"),
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_products_active_search_vector",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+
+    op.execute("DROP TRIGGER IF EXISTS categories_search_vector_trigger ON categories")
+    op.execute("DROP FUNCTION IF EXISTS categories_search_vector_update()")
+    op.execute("DROP TRIGGER IF EXISTS products_search_vector_trigger ON products")
+    op.execute("DROP FUNCTION IF EXISTS products_search_vector_update()")
+    op.drop_column('products', 'search_vector')
@@ -0,0 +1,43 @@
+"""add redis inventory mode
+
+Revision ID: e5f1a9c3b7d4
+Revises: d9e3b7c1a4f2
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f1a9c3b7d4'
+down_revision: Union[str, Sequence[str], None] = 'd9e3b7c1a4f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'products',
+        sa.Column('redis_inventory', sa.Boolean(), server_default=sa.text('false'), nullable=False)
+    )
+    op.add_column(
+        'order_items',
+        sa.Column('stock_deferred', sa.Boolean(), server_default=sa.text('false'), nullable=False)
+    )
+    op.create_index(
+        'ix_order_items_stock_deferred',
+        'order_items',
+        ['product_id'],
+        postgresql_where=sa.text('stock_deferred')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_order_items_stock_deferred', table_name='order_items', postgresql_where=sa.text('stock_deferred'))
+    op.drop_column('order_items', 'stock_deferred')
+    op.drop_column('products', 'redis_inventory')
@@ -12,7 +12,7 @@ os.environ.setdefault("RABBITMQ_EMAIL_QUEUE", "email.order_confirmation")
 
 from backend.services.email_service import email_service
 from backend.core.config import settings
-from backend.core.database import get_db, Base
+from backend.core.database import get_db, get_read_db, Base
 from backend.services.user_service import user_service
 from backend.main import app
 from backend.schemas.user import UserRegister
@@ -21,6 +21,8 @@ from backend.models.product import Product
 from backend.models.category import Category
 
 from backend.models.cart import CartItem
+from backend.models.stock_hold import StockHold
+from backend.models.outbox import OutboxEvent
 
 from backend.models.order import Order
 from backend.models.order_item import OrderItem
@@ -66,6 +68,7 @@ def override_get_db(db_session):
         yield db_session
 
     app.dependency_overrides[get_db] = _get_test_db
+    app.dependency_overrides[get_read_db] = _get_test_db
     yield
     app.dependency_overrides.clear()
 
@@ -0,0 +1,171 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+import fakeredis
+
+from backend.core import cache
+from backend.core.config import settings
+from backend.crud.product import product_crud
+from backend.services import autocomplete_service as autocomplete
+from backend.services.autocomplete_service import AUTOCOMPLETE_CHANNEL, AutocompleteIndex, autocomplete_service
+from backend.services.product_service import PRODUCT_VIEWS_KEY
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://fake:6379/0")
+    monkeypatch.setattr(cache, "_redis", client)
+
+    return client
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = AutocompleteIndex()
+    index.build([(1, "Apple iPhone 15"), (2, "Apple iPad Air"), (3, "Samsung Galaxy S24"), (4, "iPhone Case")])
+    monkeypatch.setattr(autocomplete, "autocomplete_index", index)
+
+    return index
+
+
+class TestAutocompleteIndex:
+
+    def test_matches_prefix_of_any_word(self, index):
+        assert set(index.suggest("ip")) == {1, 2, 4}
+        assert index.suggest("galaxy s") == [3]
+        assert index.suggest("  APPLE   iph ") == [1]
+        assert index.suggest("phone") == []
+        assert index.suggest("") == []
+
+    def test_popular_first_then_alphabetical(self, index):
+        assert index.suggest("iphone") == [1, 4]
+
+        index.set_popularity({4: 10.0, 2: 5.0, 42: 100.0})
+
+        assert index.suggest("iphone") == [4, 1]
+        assert index.suggest("ip") == [4, 2, 1]
+        assert index.suggest("iphone", limit=1) == [4]
+
+    def test_upsert_and_remove_keep_index_consistent(self, index):
+        index.set_popularity({3: 1.0})
+
+        index.upsert(3, "Samsung Galaxy S25")
+        index.upsert(5, "Sony Xperia")
+        index.remove(1)
+        index.remove(42)
+
+        assert index.suggest("galaxy") == [3]
+        assert index._popular_entries == [("galaxy s25", 3), ("s25", 3), ("samsung galaxy s25", 3)]
+        assert index.suggest("xperia") == [5]
+        assert index.suggest("ip") == [2, 4]
+        assert len(index) == 4
+        assert sorted(index._entries) == index._entries
+
+
+@pytest.mark.asyncio
+class TestAutocompleteService:
+
+    async def test_product_changed_applies_locally_and_publishes(self, index, fake_redis):
+        async with fake_redis.pubsub() as pubsub:
+            await pubsub.subscribe(AUTOCOMPLETE_CHANNEL)
+            await pubsub.get_message(timeout=1)
+
+            await autocomplete_service.product_changed(6, "Xiaomi Redmi")
+            await autocomplete_service.product_changed(3, None)
+
+            messages = [await pubsub.get_message(timeout=1) for _ in range(2)]
+
+        assert [json.loads(message["data"]) for message in messages] == [
+            {"id": 6, "name": "Xiaomi Redmi"},
+            {"id": 3, "name": None},
+        ]
+        assert autocomplete_service.suggest("redmi") == [(6, "Xiaomi Redmi")]
+        assert autocomplete_service.suggest("samsung") == []
+
+    async def test_listener_builds_index_and_applies_remote_events(self, monkeypatch, index, fake_redis):
+        @asynccontextmanager
+        async def fake_read_session():
+            yield object()
+
+        async def get_active_product_names(db):
+            return [(7, "Lenovo ThinkPad")]
+
+        monkeypatch.setattr(autocomplete, "read_session", fake_read_session)
+        monkeypatch.setattr(product_crud, "get_active_product_names", get_active_product_names)
+        await fake_redis.zadd(PRODUCT_VIEWS_KEY, {"7": 3})
+
+        listener = asyncio.create_task(autocomplete._listen_events())
+        try:
+            for _ in range(100):
+                if autocomplete_service.suggest("think"):
+                    break
+                await asyncio.sleep(0.01)
+
+            assert autocomplete_service.suggest("think") == [(7, "Lenovo ThinkPad")]
+            assert autocomplete.autocomplete_index._popularity == {7: 3.0}
+
+            await fake_redis.publish(AUTOCOMPLETE_CHANNEL, json.dumps({"id": 8, "name": "Lenovo Legion"}))
+            for _ in range(100):
+                if len(autocomplete_service.suggest("lenovo")) == 2:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert autocomplete_service.suggest("lenovo") == [(7, "Lenovo ThinkPad"), (8, "Lenovo Legion")]
+        finally:
+            listener.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await listener
+
+    async def test_rebuild_swaps_index_and_replays_concurrent_events(self, monkeypatch, index):
+        monkeypatch.setattr(settings, "REDIS_URL", None)
+        index.set_popularity({1: 5.0})
+
+        @asynccontextmanager
+        async def fake_read_session():
+            yield object()
+
+        async def get_active_product_names(db):
+            # Правки, пришедшие во время сборки, не должны потеряться при подмене индекса
+            await autocomplete_service.product_changed(9, "Dell XPS 13")
+            await autocomplete_service.product_changed(1, None)
+            return [(1, "Apple iPhone 15"), (3, "Samsung Galaxy S24")]
+
+        monkeypatch.setattr(autocomplete, "read_session", fake_read_session)
+        monkeypatch.setattr(product_crud, "get_active_product_names", get_active_product_names)
+
+        await autocomplete_service.build_index()
+
+        rebuilt = autocomplete.autocomplete_index
+        assert rebuilt is not index
+        assert autocomplete_service.ready()
+        assert autocomplete_service.suggest("dell") == [(9, "Dell XPS 13")]
+        assert autocomplete_service.suggest("apple") == []
+        assert len(rebuilt) == 2
+        assert autocomplete._pending_events is None
+
+    async def test_failed_build_is_retried(self, monkeypatch):
+        monkeypatch.setattr(settings, "REDIS_URL", None)
+        monkeypatch.setattr(autocomplete, "autocomplete_index", AutocompleteIndex())
+        attempts = []
+
+        @asynccontextmanager
+        async def fake_read_session():
+            yield object()
+
+        async def get_active_product_names(db):
+            attempts.append(True)
+            if len(attempts) == 1:
+                raise ConnectionError("database is starting")
+            return [(7, "Lenovo ThinkPad")]
+
+        monkeypatch.setattr(autocomplete, "read_session", fake_read_session)
+        monkeypatch.setattr(product_crud, "get_active_product_names", get_active_product_names)
+
+        await asyncio.wait_for(autocomplete._listen_events(), timeout=5)
+
+        assert len(attempts) == 2
+        assert autocomplete_service.ready()
+        assert autocomplete_service.suggest("think") == [(7, "Lenovo ThinkPad")]
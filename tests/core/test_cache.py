@@ -0,0 +1,753 @@
+import asyncio
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+import fakeredis
+
+from backend.core import cache
+from backend.core.cache import (
+    CacheStatusMiddleware,
+    LocalCache,
+    _build_cache_key,
+    _compile_template,
+    cacheable,
+    cache_invalidate,
+    get_entities,
+    id_tags,
+    invalidate_tags,
+    start_cache_listener,
+    stop_cache_listener,
+)
+from backend.core.config import settings
+from backend.core.exceptions.product_exceptions import ProductNotFoundError
+from backend.schemas.product import ProductResponse
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://fake:6379/0")
+    monkeypatch.setattr(cache, "_redis", client)
+
+    return client
+
+
+@pytest.fixture
+def local_cache(monkeypatch, fake_redis):
+    monkeypatch.setattr(settings, "CACHE_L1_ENABLED", True)
+    monkeypatch.setattr(cache, "_local_cache", LocalCache(max_entries=100, max_bytes=1024 * 1024))
+
+    return cache._local_cache
+
+
+async def _list_products(
+    db,
+    skip: int = 0,
+    limit: int = 10,
+    min_price=None,
+    max_price=None,
+    category_id=None,
+    show_deleted: bool = False
+):
+    return []
+
+
+def _entry(data, expires_in: float, compute_time: float) -> bytes:
+    payload, _ = cache._encode_entry(data, None, "json", None, 0, time.time() + expires_in, compute_time)
+
+    return payload
+
+
+def _product(product_id: int, stock: int = 10) -> dict:
+    return {
+        "id": product_id,
+        "name": f"Product {product_id}",
+        "description": "Description",
+        "price": "100.00",
+        "stock": stock,
+        "category_id": 1,
+        "is_delete": False,
+    }
+
+
+@pytest.mark.asyncio
+class TestCacheTags:
+
+    async def test_tagged_entry_is_registered_in_tag_sets(self, fake_redis):
+        @cacheable(ttl=30, key="products:by_id:{product_id}", tags=["product:{product_id}"])
+        async def get_product(db, product_id: int):
+            return _product(product_id)
+
+        await get_product(None, 7)
+
+        members = await fake_redis.smembers("api_cache:tag:product:7")
+        assert members == {b"api_cache:products:by_id:7"}
+        assert await fake_redis.ttl("api_cache:tag:product:7") > 0
+
+    async def test_invalidate_tag_drops_only_tagged_entries(self, fake_redis):
+        calls = []
+
+        @cacheable(
+            ttl=30,
+            key="products:list:{skip}",
+            decoder=ProductResponse,
+            tags=["products:list"],
+            result_tags=id_tags("product")
+        )
+        async def get_products(db, skip: int = 0):
+            calls.append(skip)
+            return [_product(skip + 1), _product(skip + 2)]
+
+        await get_products(None, skip=0)
+        await get_products(None, skip=10)
+        await get_products(None, skip=0)
+        await get_products(None, skip=10)
+        assert calls == [0, 10]
+
+        await invalidate_tags("product:2")
+
+        await get_products(None, skip=0)
+        await get_products(None, skip=10)
+        assert calls == [0, 10, 0]
+
+    async def test_cache_invalidate_resolves_tags_from_arguments_and_result(self, fake_redis):
+        await fake_redis.set("api_cache:products:by_id:1", "{}")
+        await fake_redis.set("api_cache:products:by_id:2", "{}")
+        await fake_redis.sadd("api_cache:tag:product:1", "api_cache:products:by_id:1")
+        await fake_redis.sadd("api_cache:tag:product:2", "api_cache:products:by_id:2")
+
+        @cache_invalidate(tags=["product:{product_id}"])
+        async def edit_product(db, product_id: int):
+            return None
+
+        @cache_invalidate(result_tags=id_tags("product"))
+        async def create_product(db):
+            return ProductResponse(**_product(2))
+
+        await edit_product(None, 1)
+        assert await fake_redis.exists("api_cache:products:by_id:1") == 0
+        assert await fake_redis.exists("api_cache:products:by_id:2") == 1
+
+        await create_product(None)
+        assert await fake_redis.exists("api_cache:products:by_id:2") == 0
+        assert await fake_redis.exists("api_cache:tag:product:2") == 0
+
+    async def test_fill_started_before_invalidation_is_not_written(self, fake_redis):
+        loaded = asyncio.Event()
+        proceed = asyncio.Event()
+        stock = {"value": 10}
+
+        @cacheable(ttl=30, key="products:by_id:{product_id}", tags=["product:{product_id}"])
+        async def get_product(db, product_id: int):
+            value = stock["value"]
+            loaded.set()
+            await proceed.wait()
+            return _product(product_id, stock=value)
+
+        # Загрузка прочитала старую строку, затем запись закоммитилась и сбросила тег
+        fill = asyncio.create_task(get_product(None, 1))
+        await loaded.wait()
+        stock["value"] = 3
+        await invalidate_tags("product:1")
+        proceed.set()
+
+        assert (await fill)["stock"] == 10
+        assert await fake_redis.exists("api_cache:products:by_id:1") == 0
+        assert await fake_redis.exists("api_cache:tag:product:1") == 0
+
+        assert (await get_product(None, 1))["stock"] == 3
+        assert await fake_redis.exists("api_cache:products:by_id:1") == 1
+
+    async def test_entity_fill_skips_only_invalidated_entities(self, fake_redis):
+        async def loader(ids):
+            # Пока грузились сущности, товар 2 изменили
+            await invalidate_tags("product:2")
+            return [_product(i) for i in ids]
+
+        products = await get_entities("products:entity", [1, 2], ProductResponse, loader, ttl=60, tag="product")
+
+        assert [p.id for p in products] == [1, 2]
+        assert await fake_redis.exists("api_cache:products:entity:1") == 1
+        assert await fake_redis.exists("api_cache:products:entity:2") == 0
+
+
+class TestLocalCache:
+
+    def test_evicts_least_recently_used_by_entries(self):
+        local = LocalCache(max_entries=2, max_bytes=1000)
+        local.set("a", 1, size=1, ttl=60)
+        local.set("b", 2, size=1, ttl=60)
+        local.get("a")
+        local.set("c", 3, size=1, ttl=60)
+
+        assert local.get("a") == 1
+        assert local.get("b") is None
+        assert local.get("c") == 3
+
+    def test_evicts_by_bytes_and_skips_oversized_values(self):
+        local = LocalCache(max_entries=100, max_bytes=10)
+        local.set("a", 1, size=6, ttl=60)
+        local.set("b", 2, size=6, ttl=60)
+        local.set("huge", 3, size=11, ttl=60)
+
+        assert local.get("a") is None
+        assert local.get("b") == 2
+        assert local.get("huge") is None
+        assert local.size == 6
+
+    def test_expired_entries_are_dropped(self):
+        local = LocalCache(max_entries=10, max_bytes=100)
+        local.set("a", 1, size=1, ttl=0)
+
+        assert local.get("a") is None
+        assert len(local) == 0
+
+
+@pytest.mark.asyncio
+class TestLocalCacheTier:
+
+    async def test_hot_reads_are_served_from_process_memory(self, fake_redis, local_cache):
+        @cacheable(ttl=30, key="products:by_id:{product_id}", decoder=ProductResponse, local_ttl=10)
+        async def get_product(db, product_id: int):
+            return _product(product_id)
+
+        first = await get_product(None, 1)
+        await fake_redis.delete("api_cache:products:by_id:1")
+        second = await get_product(None, 1)
+
+        assert isinstance(second, ProductResponse)
+        assert second is first
+
+    async def test_tag_invalidation_drops_local_entries(self, fake_redis, local_cache):
+        calls = []
+
+        @cacheable(
+            ttl=30,
+            key="products:by_id:{product_id}",
+            tags=["product:{product_id}"],
+            local_ttl=10
+        )
+        async def get_product(db, product_id: int):
+            calls.append(product_id)
+            return _product(product_id)
+
+        await get_product(None, 1)
+        await invalidate_tags("product:1")
+        await get_product(None, 1)
+
+        assert calls == [1, 1]
+
+    async def test_listener_applies_invalidations_from_other_workers(self, fake_redis, local_cache):
+        start_cache_listener()
+        try:
+            for _ in range(50):
+                if await fake_redis.pubsub_numsub(cache._INVALIDATION_CHANNEL) != [(cache._INVALIDATION_CHANNEL, 0)]:
+                    break
+                await asyncio.sleep(0.01)
+
+            local_cache.set("api_cache:products:by_id:1", "value", size=5, ttl=60)
+            await fake_redis.publish(
+                cache._INVALIDATION_CHANNEL,
+                '{"keys": ["api_cache:products:by_id:1"], "patterns": []}'
+            )
+            for _ in range(50):
+                if local_cache.get("api_cache:products:by_id:1") is None:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert local_cache.get("api_cache:products:by_id:1") is None
+        finally:
+            await stop_cache_listener()
+
+
+@pytest.mark.asyncio
+class TestSingleFlight:
+
+    async def test_concurrent_misses_share_one_loader(self, fake_redis):
+        calls = []
+
+        @cacheable(ttl=30, key="products:list:{skip}", lock_ttl=2)
+        async def get_products(db, skip: int = 0):
+            calls.append(skip)
+            await asyncio.sleep(0.05)
+            return [_product(1)]
+
+        results = await asyncio.gather(*(get_products(None, skip=0) for _ in range(20)))
+
+        assert calls == [0]
+        assert all(result == [_product(1)] for result in results)
+        assert await fake_redis.exists("api_cache:lock:api_cache:products:list:0") == 0
+
+    async def test_concurrent_misses_share_loader_errors(self, fake_redis):
+        calls = []
+
+        @cacheable(ttl=30, key="products:by_id:{product_id}")
+        async def get_product(db, product_id: int):
+            calls.append(product_id)
+            await asyncio.sleep(0.05)
+            raise LookupError(product_id)
+
+        results = await asyncio.gather(
+            *(get_product(None, 1) for _ in range(5)),
+            return_exceptions=True
+        )
+
+        assert calls == [1]
+        assert all(isinstance(result, LookupError) for result in results)
+
+    async def test_lock_mode_waits_for_loader_in_another_worker(self, fake_redis, monkeypatch):
+        monkeypatch.setattr(cache, "_LOCK_POLL_INTERVAL", 0.01)
+        calls = []
+
+        @cacheable(ttl=30, key="products:list:{skip}", lock_ttl=2)
+        async def get_products(db, skip: int = 0):
+            calls.append(skip)
+            return [_product(1)]
+
+        await fake_redis.set("api_cache:lock:api_cache:products:list:0", "other-worker")
+
+        async def other_worker_fills_cache():
+            await asyncio.sleep(0.05)
+            await fake_redis.set(
+                "api_cache:products:list:0",
+                _entry([{"id": 2}], expires_in=30, compute_time=0.01)
+            )
+
+        result, _ = await asyncio.gather(get_products(None, skip=0), other_worker_fills_cache())
+
+        assert calls == []
+        assert result == [{"id": 2}]
+
+
+@pytest.mark.asyncio
+class TestStaleWhileRevalidate:
+
+    async def _wait_for_refresh(self):
+        for _ in range(50):
+            if not cache._background_tasks:
+                return
+            await asyncio.sleep(0.01)
+
+    async def test_stale_value_is_served_while_refreshing(self, fake_redis):
+        calls = []
+
+        @cacheable(ttl=30, key="categories:list:{skip}", stale_ttl=60)
+        async def get_categories(db, skip: int = 0):
+            calls.append(skip)
+            return [{"id": len(calls)}]
+
+        await fake_redis.set(
+            "api_cache:categories:list:0",
+            _entry([{"id": 0}], expires_in=-5, compute_time=0.01),
+            ex=60
+        )
+
+        stale = await get_categories(None, skip=0)
+        await self._wait_for_refresh()
+        fresh = await get_categories(None, skip=0)
+
+        assert stale == [{"id": 0}]
+        assert fresh == [{"id": 1}]
+        assert calls == [0]
+        assert await fake_redis.ttl("api_cache:categories:list:0") > 30
+
+    async def test_value_past_stale_window_is_a_miss(self, fake_redis):
+        @cacheable(ttl=30, key="categories:list:{skip}", stale_ttl=10)
+        async def get_categories(db, skip: int = 0):
+            return [{"id": 1}]
+
+        await fake_redis.set(
+            "api_cache:categories:list:0",
+            _entry([{"id": 0}], expires_in=-20, compute_time=0.01)
+        )
+
+        assert await get_categories(None, skip=0) == [{"id": 1}]
+
+    async def test_early_refresh_kicks_in_before_expiry(self, fake_redis, monkeypatch):
+        calls = []
+        monkeypatch.setattr(cache.random, "random", lambda: 0.999999)
+
+        @cacheable(ttl=30, key="products:list:{skip}", early_refresh_beta=1.0)
+        async def get_products(db, skip: int = 0):
+            calls.append(skip)
+            return [{"id": 1}]
+
+        await fake_redis.set(
+            "api_cache:products:list:0",
+            _entry([{"id": 0}], expires_in=1, compute_time=0.5),
+            ex=30
+        )
+
+        assert await get_products(None, skip=0) == [{"id": 0}]
+        await self._wait_for_refresh()
+
+        assert calls == [0]
+        assert await get_products(None, skip=0) == [{"id": 1}]
+
+
+class TestCompiledKeyBuilder:
+
+    @pytest.mark.parametrize(
+        "args, kwargs",
+        [
+            ((None,), {}),
+            ((None, 20, 5), {}),
+            ((None,), {"skip": 10, "category_id": 3, "min_price": Decimal("9.90")}),
+            ((None, 0), {"limit": 50, "show_deleted": True}),
+        ]
+    )
+    def test_matches_signature_binding(self, args, kwargs):
+        template = "products:list:{skip}:{limit}:{min_price}:{max_price}:{category_id}:{show_deleted}"
+        exclude = set(cache._DEFAULT_EXCLUDE)
+
+        build = _compile_template(template, _list_products, exclude)
+
+        assert f"api_cache:{build(args, kwargs)}" == _build_cache_key(template, _list_products, args, kwargs, exclude)
+
+    def test_unknown_and_excluded_fields_render_empty(self):
+        build = _compile_template("x:{db}:{missing}:{{literal}}", _list_products, {"db"})
+
+        assert build((object(),), {}) == "x:::{literal}"
+
+    def test_strings_are_normalized(self):
+        async def search(db, name_query: str):
+            return []
+
+        build = _compile_template("products:search:{name_query}", search, {"db"})
+
+        assert build((None, "  iPhone "), {}) == "products:search:iphone"
+
+
+class TestCacheCodecs:
+
+    @pytest.mark.parametrize("serializer", ["json", "orjson", "msgpack"])
+    @pytest.mark.parametrize("compression", [None, "zstd", "lz4"])
+    def test_model_payload_round_trip(self, serializer, compression):
+        if serializer != "json":
+            pytest.importorskip(serializer)
+        if compression is not None:
+            pytest.importorskip({"zstd": "zstandard", "lz4": "lz4"}[compression])
+
+        adapters = cache._model_adapters(ProductResponse)
+        products = [ProductResponse(**_product(i)) for i in range(50)]
+
+        payload, size = cache._encode_entry(products, adapters, serializer, compression, 1024, 100.0, 0.5)
+        value, expires_at, compute_time, decoded_size = cache._decode_entry(payload, ProductResponse, adapters)
+
+        assert value == products
+        assert (expires_at, compute_time) == (100.0, 0.5)
+        assert decoded_size == size
+        if compression is not None:
+            assert len(payload) < size
+
+    def test_orm_objects_are_validated_without_jsonable_encoder(self, monkeypatch):
+        monkeypatch.setattr(cache, "jsonable_encoder", None)
+        adapters = cache._model_adapters(ProductResponse)
+        rows = [SimpleNamespace(**_product(1), image_url=None)]
+
+        result = cache._coerce_result(ProductResponse, adapters, rows)
+        payload, _ = cache._encode_entry(result, adapters, "json", None, 1024, 100.0, 0.5)
+
+        assert result == [ProductResponse(**_product(1))]
+        assert cache._decode_entry(payload, ProductResponse, adapters)[0] == result
+
+    def test_legacy_json_entries_are_treated_as_misses(self):
+        assert cache._decode_entry(b'[{"id": 1}]', None, None) is None
+        assert cache._decode_entry(b'{"id": 1}', None, None) is None
+
+
+@pytest.mark.asyncio
+class TestEntityCache:
+
+    async def test_missing_entities_are_loaded_in_one_batch(self, fake_redis):
+        batches = []
+
+        async def loader(ids):
+            batches.append(list(ids))
+            return [SimpleNamespace(**_product(i), image_url=None) for i in ids]
+
+        first = await get_entities("products:entity", [3, 1, 2], ProductResponse, loader, ttl=60, tag="product")
+        second = await get_entities("products:entity", [1, 2, 3, 4], ProductResponse, loader, ttl=60, tag="product")
+
+        assert [p.id for p in first] == [3, 1, 2]
+        assert [p.id for p in second] == [1, 2, 3, 4]
+        assert batches == [[3, 1, 2], [4]]
+
+    async def test_entity_invalidation_does_not_touch_id_lists(self, fake_redis):
+        loads = []
+
+        @cacheable(ttl=30, key="products:ids:{skip}", tags=["products:list"])
+        async def get_ids(db, skip: int = 0):
+            loads.append("ids")
+            return [1, 2]
+
+        async def loader(ids):
+            loads.extend(ids)
+            return [_product(i, stock=5) for i in ids]
+
+        await get_entities("products:entity", await get_ids(None), ProductResponse, loader, ttl=60, tag="product")
+        await invalidate_tags("product:2")
+        products = await get_entities("products:entity", await get_ids(None), ProductResponse, loader, ttl=60, tag="product")
+
+        assert loads == ["ids", 1, 2, 2]
+        assert [p.id for p in products] == [1, 2]
+
+    async def test_without_redis_everything_comes_from_loader(self, monkeypatch):
+        monkeypatch.setattr(settings, "REDIS_URL", None)
+
+        async def loader(ids):
+            return [_product(i) for i in reversed(ids)]
+
+        products = await get_entities("products:entity", [1, 2], ProductResponse, loader, ttl=60)
+
+        assert [p.id for p in products] == [1, 2]
+
+
+@pytest.mark.asyncio
+class TestCacheMetrics:
+
+    async def test_lookups_are_counted_per_key_template(self, fake_redis, local_cache):
+        @cacheable(ttl=30, key="metrics:by_id:{product_id}", local_ttl=5)
+        async def get_product(db, product_id: int):
+            return _product(product_id)
+
+        await get_product(None, 1)
+        local_cache.clear()
+        await get_product(None, 1)
+        await get_product(None, 1)
+
+        assert cache._CACHE_REQUESTS.value("metrics:by_id", "miss") == 1
+        assert cache._CACHE_REQUESTS.value("metrics:by_id", "hit") == 1
+        assert cache._CACHE_REQUESTS.value("metrics:by_id", "hit_l1") == 1
+        assert cache._CACHE_LOAD_SECONDS.count("metrics:by_id") == 1
+        assert cache._CACHE_BYTES.value("metrics:by_id", "write") > 0
+        assert cache._CACHE_BYTES.value("metrics:by_id", "read") == cache._CACHE_BYTES.value("metrics:by_id", "write")
+
+    async def test_stale_reads_and_errors_are_counted(self, fake_redis, monkeypatch):
+        @cacheable(ttl=30, key="metrics:stale:{product_id}", stale_ttl=60)
+        async def get_product(db, product_id: int):
+            return _product(product_id)
+
+        await fake_redis.set("api_cache:metrics:stale:1", _entry(_product(1), expires_in=-1, compute_time=0.01))
+        await get_product(None, 1)
+        await asyncio.gather(*cache._background_tasks)
+
+        async def broken_get(*args, **kwargs):
+            raise ConnectionError("redis is down")
+
+        monkeypatch.setattr(fake_redis, "get", broken_get)
+        await get_product(None, 1)
+
+        assert cache._CACHE_REQUESTS.value("metrics:stale", "stale") == 1
+        assert cache._CACHE_ERRORS.value("metrics:stale", "read") == 1
+        assert cache._CACHE_REQUESTS.value("metrics:stale", "miss") == 1
+
+    async def test_invalidation_time_is_observed(self, fake_redis):
+        before = cache._CACHE_INVALIDATION_SECONDS.count("tags")
+
+        await invalidate_tags("products:list")
+
+        assert cache._CACHE_INVALIDATION_SECONDS.count("tags") == before + 1
+
+    async def test_debug_header_reports_worst_status(self, fake_redis):
+        @cacheable(ttl=30, key="metrics:header:{product_id}")
+        async def get_product(db, product_id: int):
+            return _product(product_id)
+
+        product_ids = []
+
+        async def app(scope, receive, send):
+            for product_id in product_ids:
+                await get_product(None, product_id)
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def request(*ids):
+            product_ids[:] = ids
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            await CacheStatusMiddleware(app)({"type": "http"}, None, send)
+            return dict(messages[0]["headers"]).get(b"x-cache")
+
+        assert await request(1) == b"MISS"
+        assert await request(1) == b"HIT"
+        assert await request(1, 2) == b"MISS"
+        assert await request() is None
+
+
+@pytest.mark.asyncio
+class TestNegativeCache:
+
+    async def test_not_found_is_cached_and_raised_again(self, fake_redis):
+        calls = []
+
+        @cacheable(
+            ttl=60,
+            key="products:by_id:{product_id}",
+            decoder=ProductResponse,
+            tags=["product:{product_id}"],
+            cache_exceptions=(ProductNotFoundError,),
+            negative_ttl=5
+        )
+        async def get_product(db, product_id: int):
+            calls.append(product_id)
+            raise ProductNotFoundError(product_id)
+
+        for _ in range(2):
+            with pytest.raises(ProductNotFoundError) as exc_info:
+                await get_product(None, 404)
+
+            assert exc_info.value.product_id == 404
+            assert exc_info.value.status_code == 404
+            assert str(exc_info.value) == "Товар с id(404) не найден"
+
+        assert calls == [404]
+        assert 0 < await fake_redis.ttl("api_cache:products:by_id:404") <= 5
+
+    async def test_created_product_replaces_negative_entry(self, fake_redis):
+        products = {}
+
+        @cacheable(
+            ttl=60,
+            key="products:by_id:{product_id}",
+            decoder=ProductResponse,
+            tags=["product:{product_id}"],
+            cache_exceptions=(ProductNotFoundError,)
+        )
+        async def get_product(db, product_id: int):
+            if product_id not in products:
+                raise ProductNotFoundError(product_id)
+            return products[product_id]
+
+        @cache_invalidate(result_tags=id_tags("product"))
+        async def create_product(db, product_id: int):
+            products[product_id] = ProductResponse(**_product(product_id))
+            return products[product_id]
+
+        with pytest.raises(ProductNotFoundError):
+            await get_product(None, 7)
+
+        await create_product(None, 7)
+
+        assert (await get_product(None, 7)).id == 7
+
+    async def test_other_exceptions_are_not_cached(self, fake_redis):
+        calls = []
+
+        @cacheable(ttl=60, key="products:by_id:{product_id}", cache_exceptions=(ProductNotFoundError,))
+        async def get_product(db, product_id: int):
+            calls.append(product_id)
+            raise ValueError("boom")
+
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await get_product(None, 1)
+
+        assert calls == [1, 1]
+        assert not await fake_redis.exists("api_cache:products:by_id:1")
+
+    async def test_negative_entry_is_a_miss_when_exception_is_no_longer_cached(self, fake_redis):
+        @cacheable(ttl=60, key="products:by_id:{product_id}", cache_exceptions=(ProductNotFoundError,))
+        async def get_missing(db, product_id: int):
+            raise ProductNotFoundError(product_id)
+
+        @cacheable(ttl=60, key="products:by_id:{product_id}")
+        async def get_product(db, product_id: int):
+            return _product(product_id)
+
+        with pytest.raises(ProductNotFoundError):
+            await get_missing(None, 3)
+
+        assert (await get_product(None, 3))["id"] == 3
+
+
+class _ScriptedConnection:
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.commands = []
+        self.disconnected = False
+
+    async def connect(self):
+        pass
+
+    async def send_command(self, *args):
+        self.commands.append(args)
+
+    async def read_response(self, timeout=None):
+        if not self.responses:
+            raise ConnectionError("connection closed")
+        response = self.responses.pop(0)
+        return response() if callable(response) else response
+
+    async def disconnect(self):
+        self.disconnected = True
+
+
+@pytest.mark.asyncio
+class TestClientTracking:
+
+    async def test_server_invalidations_evict_local_entries(self, fake_redis, local_cache, monkeypatch):
+        monkeypatch.setattr(settings, "CACHE_L1_TRACKING", True)
+
+        def fill_local_cache():
+            local_cache.set("api_cache:products:by_id:1", {"id": 1}, 10, 60)
+            local_cache.set("api_cache:products:by_id:2", {"id": 2}, 10, 60)
+
+        subscriber = _ScriptedConnection([
+            42,
+            [b"subscribe", b"__redis__:invalidate", 1],
+            fill_local_cache,
+            [b"message", b"__redis__:invalidate", [b"api_cache:products:by_id:1"]],
+        ])
+        tracker = _ScriptedConnection([b"OK", b"PONG"])
+        connections = iter([subscriber, tracker])
+        monkeypatch.setattr(cache, "_tracking_connection", lambda redis_client: next(connections))
+
+        with pytest.raises(ConnectionError):
+            await cache._listen_tracking(fake_redis, local_cache)
+
+        assert tracker.commands == [
+            ("CLIENT", "TRACKING", "ON", "REDIRECT", 42, "BCAST", "PREFIX", "api_cache:"),
+            ("PING",),
+        ]
+        assert subscriber.commands == [("CLIENT", "ID"), ("SUBSCRIBE", "__redis__:invalidate")]
+        assert local_cache.get("api_cache:products:by_id:1") is None
+        assert local_cache.get("api_cache:products:by_id:2") == {"id": 2}
+        assert subscriber.disconnected and tracker.disconnected
+
+    async def test_flush_notification_clears_local_cache(self, fake_redis, local_cache):
+        local_cache.set("api_cache:products:by_id:1", {"id": 1}, 10, 60)
+
+        cache._apply_tracking_invalidation(None)
+
+        assert len(local_cache) == 0
+
+    async def test_invalidations_are_not_broadcast_in_tracking_mode(self, fake_redis, local_cache, monkeypatch):
+        monkeypatch.setattr(settings, "CACHE_L1_TRACKING", True)
+        published = []
+
+        async def publish(channel, message):
+            published.append(message)
+
+        monkeypatch.setattr(fake_redis, "publish", publish)
+        local_cache.set("api_cache:products:by_id:1", {"id": 1}, 10, 60)
+
+        await cache._publish_invalidation(fake_redis, keys=["api_cache:products:by_id:1"])
+
+        assert published == []
+        assert local_cache.get("api_cache:products:by_id:1") is None
+
+    async def test_local_entries_live_until_redis_expiry(self, fake_redis, local_cache, monkeypatch):
+        monkeypatch.setattr(settings, "CACHE_L1_TRACKING", True)
+
+        assert cache._local_ttl(5, 60) == 60
+
+        monkeypatch.setattr(settings, "CACHE_L1_TRACKING", False)
+
+        assert cache._local_ttl(5, 60) == 5
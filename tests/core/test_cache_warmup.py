@@ -0,0 +1,154 @@
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import pytest
+import fakeredis
+
+from backend.core import cache
+from backend.core.config import settings
+from backend.crud.category import category_crud
+from backend.crud.product import product_crud
+from backend.schemas.category import CategoryResponse
+from backend.schemas.product import ProductResponse
+from backend.services.product_service import PRODUCT_VIEWS_KEY, product_service
+from backend.worker import cache_warmup
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://fake:6379/0")
+    monkeypatch.setattr(cache, "_redis", client)
+    monkeypatch.setattr("backend.services.product_service._pending_views", Counter())
+
+    return client
+
+
+def _product(product_id: int, category_id: int) -> ProductResponse:
+    return ProductResponse(
+        id=product_id,
+        name=f"Product {product_id}",
+        description="Description",
+        price="100.00",
+        stock=10,
+        category_id=category_id,
+        is_delete=False,
+    )
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    categories = [
+        CategoryResponse(id=category_id, name=f"Category {category_id}", is_delete=False)
+        for category_id in range(1, 4)
+    ]
+    products = {product_id: _product(product_id, product_id % 3 + 1) for product_id in range(1, 31)}
+    state = {"active": 0, "peak": 0}
+
+    @asynccontextmanager
+    async def session_factory():
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(0)
+            yield None
+        finally:
+            state["active"] -= 1
+
+    async def get_all_categories(db, skip=0, limit=10, after=None, before=None):
+        return categories[skip:skip + limit]
+
+    async def get_product_ids(db, skip=0, limit=10, min_price=None, max_price=None, category_id=None, show_deleted=False, after=None, before=None):
+        ids = [product.id for product in products.values() if category_id in (None, product.category_id)]
+        return ids[skip:skip + limit]
+
+    async def get_products_by_ids(db, product_ids):
+        return [products[product_id] for product_id in product_ids]
+
+    async def get_product_by_id(db, product_id, show_deleted=False):
+        return products.get(product_id)
+
+    monkeypatch.setattr(cache_warmup, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(category_crud, "get_all_categories", get_all_categories)
+    monkeypatch.setattr(product_crud, "get_product_ids", get_product_ids)
+    monkeypatch.setattr(product_crud, "get_products_by_ids", get_products_by_ids)
+    monkeypatch.setattr(product_crud, "get_product_by_id", get_product_by_id)
+
+    return state
+
+
+@pytest.mark.asyncio
+class TestCacheWarmup:
+
+    async def test_preloads_catalog_hot_paths(self, fake_redis, catalog):
+        product_service.record_product_view(5)
+        product_service.record_product_view(5)
+        product_service.record_product_view(7)
+        product_service.record_product_view(999)
+        await product_service.flush_product_views()
+
+        stats = await cache_warmup.warm_cache(pages=2, page_size=10, top_products=10, concurrency=2)
+
+        assert stats == {"categories": 3, "product_pages": 8, "products": 2}
+        assert catalog["peak"] <= 2
+        assert await fake_redis.exists("api_cache:categories:list:0:10:null:null")
+        assert await fake_redis.exists("api_cache:products:ids:0:10:null:null:null:False:null:null")
+        assert await fake_redis.exists("api_cache:products:ids:10:10:null:null:null:False:null:null")
+        assert not await fake_redis.exists("api_cache:products:ids:20:10:null:null:null:False:null:null")
+        assert await fake_redis.exists("api_cache:products:ids:0:10:null:null:1:False:null:null")
+        assert await fake_redis.exists("api_cache:products:entity:1")
+        assert await fake_redis.exists("api_cache:products:by_id:5:False")
+        assert await fake_redis.zscore(PRODUCT_VIEWS_KEY, 999) is None
+
+    async def test_most_viewed_products_come_first(self, fake_redis):
+        for product_id, views in ((1, 1), (2, 3), (3, 2)):
+            for _ in range(views):
+                product_service.record_product_view(product_id)
+        await product_service.flush_product_views()
+
+        assert await product_service.get_most_viewed_product_ids(2) == [2, 3]
+
+    async def test_views_are_buffered_and_ranking_is_trimmed(self, fake_redis, monkeypatch):
+        monkeypatch.setattr(settings, "PRODUCT_VIEWS_KEEP", 2)
+        for product_id, views in ((1, 1), (2, 3), (3, 2)):
+            for _ in range(views):
+                product_service.record_product_view(product_id)
+
+        assert not await fake_redis.exists(PRODUCT_VIEWS_KEY)
+
+        assert await product_service.flush_product_views() == 3
+        assert await fake_redis.zrevrange(PRODUCT_VIEWS_KEY, 0, -1, withscores=True) == [(b"2", 3.0), (b"3", 2.0)]
+        assert await product_service.flush_product_views() == 0
+
+    async def test_failed_flush_keeps_views_in_buffer(self, fake_redis, monkeypatch):
+        product_service.record_product_view(4)
+        product_service.record_product_view(4)
+
+        class BrokenRedis:
+            def pipeline(self, *args, **kwargs):
+                raise ConnectionError("redis is down")
+
+        monkeypatch.setattr(cache, "_redis", BrokenRedis())
+        assert await product_service.flush_product_views() == 0
+
+        monkeypatch.setattr(cache, "_redis", fake_redis)
+        assert await product_service.flush_product_views() == 1
+        assert await fake_redis.zscore(PRODUCT_VIEWS_KEY, 4) == 2.0
+
+    async def test_startup_warmup_runs_once_across_workers(self, fake_redis, catalog, monkeypatch):
+        calls = []
+
+        async def fake_warm_cache():
+            calls.append(True)
+
+        monkeypatch.setattr(cache_warmup, "warm_cache", fake_warm_cache)
+
+        await asyncio.gather(cache_warmup.warm_cache_on_startup(), cache_warmup.warm_cache_on_startup())
+
+        assert len(calls) == 1
+
+    async def test_without_redis_nothing_is_warmed(self, monkeypatch):
+        monkeypatch.setattr(settings, "REDIS_URL", None)
+
+        assert await cache_warmup.warm_cache() == {"categories": 0, "product_pages": 0, "products": 0}
@@ -0,0 +1,177 @@
+import sqlite3
+import time
+
+import pytest
+import fakeredis
+from sqlalchemy import event, exc
+from sqlalchemy.util import greenlet_spawn
+
+from backend.core import cache, database
+from backend.core.config import settings
+
+
+def _sqlite_connection():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+class TestEngineOptions:
+
+    def test_production_defaults(self):
+        options = database._engine_options()
+
+        assert options["echo"] is False
+        assert options["poolclass"] is database.MeteredQueuePool
+        assert options["pool_size"] == settings.DB_POOL_SIZE
+        assert options["max_overflow"] == settings.DB_MAX_OVERFLOW
+        assert options["pool_pre_ping"] is True
+        assert options["connect_args"] == {
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+
+    def test_nullpool_mode_for_pgbouncer(self, monkeypatch):
+        monkeypatch.setattr(settings, "DB_USE_NULLPOOL", True)
+        monkeypatch.setattr(settings, "DB_STATEMENT_CACHE_SIZE", 100)
+
+        options = database._engine_options()
+
+        assert options["poolclass"] is database.MeteredNullPool
+        assert "pool_size" not in options
+        assert "max_overflow" not in options
+        # Кэш выражений выключается даже при оставленном DB_STATEMENT_CACHE_SIZE
+        assert options["connect_args"] == {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+
+    def test_engine_uses_configured_pool(self):
+        assert isinstance(database.engine.pool, database.MeteredQueuePool)
+        assert database.engine.echo is False
+
+
+@pytest.mark.asyncio
+class TestPoolMetrics:
+
+    async def test_checkout_wait_and_timeouts_are_recorded(self):
+        pool = database.MeteredQueuePool(_sqlite_connection, pool_size=1, max_overflow=0, timeout=0.01)
+        checkouts = database._DB_POOL_CHECKOUT_SECONDS.count("primary")
+        timeouts = database._DB_POOL_CHECKOUT_TIMEOUTS.value("primary")
+
+        def exhaust_pool():
+            connection = pool.connect()
+            try:
+                with pytest.raises(exc.TimeoutError):
+                    pool.connect()
+            finally:
+                connection.close()
+
+        await greenlet_spawn(exhaust_pool)
+
+        assert database._DB_POOL_CHECKOUT_SECONDS.count("primary") == checkouts + 2
+        assert database._DB_POOL_CHECKOUT_TIMEOUTS.value("primary") == timeouts + 1
+
+    async def test_in_use_gauge_follows_checkouts(self):
+        pool = database.MeteredQueuePool(_sqlite_connection, pool_size=2, max_overflow=0)
+        database.instrument_pool(pool, "primary")
+        in_use = database._DB_POOL_IN_USE.value("primary")
+
+        def use_pool():
+            first = pool.connect()
+            second = pool.connect()
+            assert database._DB_POOL_IN_USE.value("primary") == in_use + 2
+            first.close()
+            second.close()
+
+        await greenlet_spawn(use_pool)
+
+        assert database._DB_POOL_IN_USE.value("primary") == in_use
+
+    async def test_replica_pools_are_measured_under_their_own_label(self):
+        replica = database.ReadReplica("postgresql+asyncpg://u:p@replica-9:5432/db")
+        pool = replica.engine.sync_engine.pool
+
+        assert pool.metrics_engine == "replica:replica-9"
+        assert pool.recreate().metrics_engine == "replica:replica-9"
+
+        # Слушатели висят на пуле реплики, а не только на primary
+        assert len(pool.dispatch.checkout) == 1
+        assert len(pool.dispatch.checkin) == 1
+
+        sqlite_pool = database.MeteredQueuePool(_sqlite_connection, pool_size=1, max_overflow=0)
+        database.instrument_pool(sqlite_pool, "replica:replica-9")
+
+        def use_pool():
+            connection = sqlite_pool.connect()
+            assert database._DB_POOL_IN_USE.value("replica:replica-9") == 1
+            connection.close()
+
+        await greenlet_spawn(use_pool)
+
+        assert database._DB_POOL_IN_USE.value("replica:replica-9") == 0
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    replicas = [
+        database.ReadReplica("postgresql+asyncpg://u:p@replica-1:5432/db"),
+        database.ReadReplica("postgresql+asyncpg://u:p@replica-2:5432/db"),
+    ]
+    for replica in replicas:
+        replica.checked_at = time.monotonic()
+    monkeypatch.setattr(database, "read_replicas", replicas)
+
+    return replicas
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://fake:6379/0")
+    monkeypatch.setattr(cache, "_redis", client)
+
+    return client
+
+
+@pytest.mark.asyncio
+class TestReadReplicas:
+
+    async def test_reads_are_balanced_across_healthy_replicas(self, replicas):
+        picked = [await database._pick_replica() for _ in range(4)]
+
+        assert set(picked) == set(replicas)
+
+        replicas[0].mark_down()
+        picked = [await database._pick_replica() for _ in range(4)]
+
+        assert picked == [replicas[1]] * 4
+
+    async def test_falls_back_to_primary_without_healthy_replicas(self, replicas):
+        for replica in replicas:
+            replica.mark_down()
+
+        async with database.read_session() as session:
+            assert session.bind is database.engine
+
+    async def test_health_check_marks_unreachable_replica_down(self, monkeypatch):
+        monkeypatch.setattr(settings, "READ_REPLICA_HEALTH_CHECK_TIMEOUT", 0.5)
+        replica = database.ReadReplica("postgresql+asyncpg://u:p@127.0.0.1:1/db")
+
+        assert await replica.is_available() is False
+
+        replica.healthy = True
+
+        # Следующая проверка — только после интервала
+        assert await replica.is_available() is True
+
+    async def test_recent_writes_pin_user_to_primary(self, replicas, fake_redis, monkeypatch):
+        monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 5)
+
+        assert await database.has_recent_write(1) is False
+
+        await database.mark_recent_write(1)
+
+        assert await database.has_recent_write(1) is True
+        assert await database.has_recent_write(2) is False
+        assert 0 < await fake_redis.ttl("db:recent_write:1") <= 5
+
+    async def test_read_your_writes_is_opt_in(self, replicas, fake_redis):
+        await database.mark_recent_write(1)
+
+        assert await database.has_recent_write(1) is False
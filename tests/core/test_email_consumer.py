@@ -0,0 +1,42 @@
+import pytest
+import fakeredis
+
+from backend.core import cache
+from backend.core.config import settings
+from backend.worker import consumer
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://fake:6379/0")
+    monkeypatch.setattr(cache, "_redis", client)
+
+    return client
+
+
+@pytest.mark.asyncio
+class TestEmailDeduplication:
+
+    async def test_delivered_message_is_skipped_on_redelivery(self, fake_redis):
+        assert await consumer._claim_delivery("outbox-1") == "claimed"
+        # Пока первая доставка не закончена, повтор уходит в очередь ретраев
+        assert await consumer._claim_delivery("outbox-1") == "in_progress"
+
+        await consumer._finish_delivery("outbox-1", delivered=True)
+
+        assert await consumer._claim_delivery("outbox-1") == "delivered"
+        assert await fake_redis.ttl("email:delivered:outbox-1") > settings.EMAIL_DEDUP_PROCESSING_SECONDS
+
+    async def test_failed_send_releases_claim(self, fake_redis):
+        assert await consumer._claim_delivery("outbox-2") == "claimed"
+
+        await consumer._finish_delivery("outbox-2", delivered=False)
+
+        assert await consumer._claim_delivery("outbox-2") == "claimed"
+
+    async def test_without_message_id_or_redis_every_delivery_is_sent(self, monkeypatch):
+        monkeypatch.setattr(settings, "REDIS_URL", None)
+
+        assert await consumer._claim_delivery("outbox-3") == "claimed"
+        assert await consumer._claim_delivery(None) == "claimed"
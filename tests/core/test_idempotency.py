@@ -0,0 +1,138 @@
+import asyncio
+import json
+
+import pytest
+import fakeredis
+
+from backend.core import cache
+from backend.core.config import settings
+from backend.core import idempotency
+from backend.core.idempotency import REPLAYED_HEADER, idempotent
+from backend.core.exceptions.idempotency_exceptions import *
+from backend.core.exceptions.product_exceptions import ProductInsufficientStockError
+from backend.core.exceptions.inventory_exceptions import InventoryUnavailableError
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://fake:6379/0")
+    monkeypatch.setattr(cache, "_redis", client)
+
+    return client
+
+
+class Handler:
+
+    def __init__(self, result=None, error=None, delay=0.0):
+        self.calls = 0
+        self.result = result if result is not None else {"id": 1}
+        self.error = error
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _call(handler, key="key-1", payload=None, user_id=1):
+    return idempotent("order:create", user_id, key, payload or {"items": [1]}, handler, lambda result: result)
+
+
+@pytest.mark.asyncio
+class TestIdempotency:
+
+    async def test_without_key_every_request_runs(self, fake_redis):
+        handler = Handler()
+
+        assert await _call(handler, key=None) == {"id": 1}
+        assert await _call(handler, key=None) == {"id": 1}
+        assert handler.calls == 2
+
+    async def test_repeat_replays_saved_response(self, fake_redis):
+        handler = Handler(result={"id": 7, "total_price": "10.00"})
+
+        first = await _call(handler)
+        replay = await _call(handler)
+
+        assert first == {"id": 7, "total_price": "10.00"}
+        assert handler.calls == 1
+        assert replay.status_code == 200
+        assert replay.headers[REPLAYED_HEADER] == "true"
+        assert json.loads(replay.body) == first
+
+        # Ключи разных пользователей не пересекаются
+        await _call(handler, user_id=2)
+        assert handler.calls == 2
+
+    async def test_same_key_with_other_payload_is_rejected(self, fake_redis):
+        handler = Handler()
+        await _call(handler)
+
+        with pytest.raises(IdempotencyKeyReusedError):
+            await _call(handler, payload={"items": [2]})
+
+        assert handler.calls == 1
+
+    async def test_concurrent_duplicates_wait_for_first_request(self, fake_redis):
+        handler = Handler(delay=0.2)
+
+        results = await asyncio.gather(*(_call(handler) for _ in range(5)))
+
+        assert handler.calls == 1
+        assert results[0] == {"id": 1}
+        assert [json.loads(result.body) for result in results[1:]] == [{"id": 1}] * 4
+
+    async def test_business_errors_are_replayed_server_errors_are_not(self, fake_redis):
+        rejected = Handler(error=ProductInsufficientStockError("Phone"))
+
+        with pytest.raises(ProductInsufficientStockError):
+            await _call(rejected, key="rejected")
+        replay = await _call(rejected, key="rejected")
+
+        assert rejected.calls == 1
+        assert replay.status_code == 400
+        assert json.loads(replay.body)["code"] == "product_insufficient_stock"
+
+        unavailable = Handler(error=InventoryUnavailableError())
+
+        for _ in range(2):
+            with pytest.raises(InventoryUnavailableError):
+                await _call(unavailable, key="unavailable")
+
+        assert unavailable.calls == 2
+
+    async def test_waiting_is_bounded(self, monkeypatch, fake_redis):
+        monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.2)
+        handler = Handler()
+
+        lock = fake_redis.lock("idempotency:order:create:1:stuck:lock", timeout=5)
+        await lock.acquire(blocking=False)
+
+        with pytest.raises(IdempotencyRequestInProgressError):
+            await _call(handler, key="stuck")
+
+        assert handler.calls == 0
+        # Первый запрос в другом процессе: ждущие сами убирают свои события
+        assert idempotency._waiters == {}
+        assert idempotency._waiting == {}
+
+    async def test_invalid_key_is_rejected(self, fake_redis):
+        with pytest.raises(IdempotencyKeyInvalidError):
+            await _call(Handler(), key="x" * 256)
+
+        with pytest.raises(IdempotencyKeyInvalidError):
+            await _call(Handler(), key="")
+
+    async def test_without_redis_request_runs(self, monkeypatch):
+        monkeypatch.setattr(settings, "REDIS_URL", "")
+        monkeypatch.setattr(cache, "_redis", None)
+        handler = Handler()
+
+        await _call(handler)
+        await _call(handler)
+
+        assert handler.calls == 2
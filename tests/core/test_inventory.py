@@ -0,0 +1,129 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+import fakeredis
+
+from backend.core import cache
+from backend.core.config import settings
+from backend.crud.product import product_crud
+from backend.services import inventory_service as inventory
+from backend.services.inventory_service import inventory_service, _shard_keys
+from backend.core.exceptions.inventory_exceptions import InventoryUnavailableError
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://fake:6379/0")
+    monkeypatch.setattr(settings, "INVENTORY_SHARDS", 4)
+    monkeypatch.setattr(cache, "_redis", client)
+
+    return client
+
+
+@pytest.fixture
+def postgres_stock(monkeypatch):
+    # Остаток, который пересев прочитает из Postgres: stock минус брони и несверенные продажи
+    stock = {}
+
+    @asynccontextmanager
+    async def fake_session():
+        class Session:
+            async def commit(self):
+                pass
+        yield Session()
+
+    async def get_available_stock_for_update(db, product_id, managed_only=False):
+        return stock.get(product_id)
+
+    monkeypatch.setattr(inventory, "AsyncSessionLocal", fake_session)
+    monkeypatch.setattr(product_crud, "get_available_stock_for_update", get_available_stock_for_update)
+
+    return stock
+
+
+@pytest.mark.asyncio
+class TestInventoryService:
+
+    async def test_seed_spreads_stock_over_shards(self, fake_redis):
+        await inventory_service._seed(1, 10)
+
+        assert [int(value) for value in await fake_redis.mget(_shard_keys(1))] == [3, 3, 2, 2]
+        assert await inventory_service.available(1) == 10
+
+        # Живые счетчики повторный засев не трогает
+        await inventory_service._seed(1, 100)
+        assert await inventory_service.available(1) == 10
+
+    async def test_take_collects_across_shards_and_refund_restores(self, fake_redis):
+        await inventory_service._seed(1, 10)
+
+        taken = await inventory_service.take(1, 7)
+
+        assert sum(taken.values()) == 7
+        assert await inventory_service.available(1) == 3
+
+        await inventory_service.refund([taken])
+        assert await inventory_service.available(1) == 10
+
+    async def test_insufficient_stock_takes_nothing(self, fake_redis):
+        await inventory_service._seed(1, 5)
+
+        assert await inventory_service.take(1, 6) is None
+        assert await inventory_service.available(1) == 5
+
+    async def test_concurrent_takes_never_oversell(self, fake_redis):
+        await inventory_service._seed(1, 50)
+
+        results = await asyncio.gather(*(inventory_service.take(1, 3) for _ in range(40)))
+
+        sold = sum(sum(taken.values()) for taken in results if taken is not None)
+        assert sold == 48
+        assert await inventory_service.available(1) == 2
+        assert all(int(value) >= 0 for value in await fake_redis.mget(_shard_keys(1)))
+
+    async def test_lost_counters_are_reseeded_from_postgres(self, fake_redis, postgres_stock):
+        await inventory_service._seed(1, 10)
+        await inventory_service.take(1, 4)
+
+        # Перезапуск Redis без персистентности: счетчики пропали
+        await fake_redis.flushall()
+        postgres_stock[1] = 6
+
+        taken = await inventory_service.take(1, 2)
+
+        assert sum(taken.values()) == 2
+        assert await inventory_service.available(1) == 4
+
+    async def test_partially_lost_counters_keep_surviving_shards(self, fake_redis, postgres_stock):
+        await inventory_service._seed(1, 8)
+        # Продано 6 из трех шардов, затем эти шарды пропали; уцелевший держит 2
+        await fake_redis.set(_shard_keys(1)[0], 2)
+        await fake_redis.delete(*_shard_keys(1)[1:])
+        postgres_stock[1] = 2
+
+        assert await inventory_service.take(1, 3) is None
+        assert await inventory_service.available(1) == 2
+
+        taken = await inventory_service.take(1, 2)
+
+        assert sum(taken.values()) == 2
+        assert await inventory_service.available(1) == 0
+
+    async def test_unmanaged_product_without_counters_is_unavailable(self, fake_redis, postgres_stock):
+        with pytest.raises(InventoryUnavailableError):
+            await inventory_service.take(2, 1)
+
+    async def test_release_and_refund_skip_missing_counters(self, fake_redis):
+        await inventory_service.release(3, 5)
+
+        assert await fake_redis.mget(_shard_keys(3)) == [None] * 4
+        assert await inventory_service.available(3) is None
+
+    async def test_redis_down_fails_closed(self, monkeypatch):
+        monkeypatch.setattr(settings, "REDIS_URL", "")
+        monkeypatch.setattr(cache, "_redis", None)
+
+        with pytest.raises(InventoryUnavailableError):
+            await inventory_service.take(1, 1)
@@ -0,0 +1,52 @@
+import pytest
+
+from backend.core.metrics import Counter, Gauge, MetricsRegistry, Summary, REGISTRY
+
+
+class TestMetrics:
+
+    def test_counter_accumulates_per_label_set(self):
+        counter = Counter("test_metrics_counter_total", "Test counter", ("template", "result"))
+
+        counter.inc("products:ids", "hit")
+        counter.inc("products:ids", "hit", amount=2)
+        counter.inc("products:ids", "miss")
+
+        assert counter.value("products:ids", "hit") == 3
+        assert counter.value("products:ids", "miss") == 1
+        assert counter.value("products:search", "hit") == 0
+
+    def test_label_count_is_checked(self):
+        counter = Counter("test_metrics_labels_total", "Test counter", ("template",))
+
+        with pytest.raises(ValueError):
+            counter.inc("products:ids", "hit")
+
+    def test_duplicate_names_are_rejected(self):
+        Counter("test_metrics_duplicate_total", "Test counter")
+
+        with pytest.raises(ValueError):
+            Counter("test_metrics_duplicate_total", "Test counter")
+
+    def test_render_uses_prometheus_text_format(self):
+        counter = Counter("test_metrics_render_total", "Rendered counter", ("template",))
+        summary = Summary("test_metrics_render_seconds", "Rendered summary", ("kind",))
+        gauge = Gauge("test_metrics_render_entries", "Rendered gauge", callback=lambda: 7)
+
+        counter.inc('say "hi"')
+        summary.observe("tags", value=0.25)
+        summary.observe("tags", value=0.5)
+
+        text = REGISTRY.render()
+
+        assert "# HELP test_metrics_render_total Rendered counter" in text
+        assert "# TYPE test_metrics_render_total counter" in text
+        assert 'test_metrics_render_total{template="say \\"hi\\""} 1.0' in text
+        assert 'test_metrics_render_seconds_sum{kind="tags"} 0.75' in text
+        assert 'test_metrics_render_seconds_count{kind="tags"} 2.0' in text
+        assert "test_metrics_render_entries 7.0" in text
+        assert text.endswith("\n")
+        assert gauge.samples() == [("test_metrics_render_entries", (), 7.0)]
+
+    def test_empty_registry_renders_newline(self):
+        assert MetricsRegistry().render() == "\n"
@@ -0,0 +1,138 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from backend.core.config import settings
+from backend.crud.outbox import outbox_crud
+from backend.worker import outbox_relay
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    # Таблица outbox в памяти: ретранслятор видит только то, что еще не удалено и не отложено
+    state = {"events": {}, "commits": 0, "published": []}
+
+    @asynccontextmanager
+    async def session_factory():
+        class Session:
+            async def commit(self):
+                state["commits"] += 1
+        yield Session()
+
+    async def claim_batch(db, batch, lease):
+        ready = [event for event in state["events"].values() if not event.postponed and not event.leased]
+        claimed = sorted(ready, key=lambda event: event.id)[:batch]
+        for event in claimed:
+            event.leased = lease
+        return claimed
+
+    async def delete_events(db, event_ids):
+        for event_id in event_ids:
+            del state["events"][event_id]
+
+    async def postpone_event(db, event_id, delay, error):
+        event = state["events"][event_id]
+        event.attempts += 1
+        event.postponed = delay
+        event.leased = None
+        event.last_error = error
+
+    monkeypatch.setattr(outbox_relay, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(outbox_crud, "claim_batch", claim_batch)
+    monkeypatch.setattr(outbox_crud, "delete_events", delete_events)
+    monkeypatch.setattr(outbox_crud, "postpone_event", postpone_event)
+
+    def add(event_id, attempts=0):
+        state["events"][event_id] = SimpleNamespace(
+            id=event_id, exchange="email.exchange", routing_key="email", payload={"order_id": event_id},
+            attempts=attempts, postponed=None, leased=None, last_error=None
+        )
+
+    state["add"] = add
+
+    return state
+
+
+@pytest.mark.asyncio
+class TestOutboxRelay:
+
+    async def test_confirmed_events_are_deleted_failed_are_postponed(self, monkeypatch, outbox):
+        for event_id in (1, 2, 3):
+            outbox["add"](event_id, attempts=event_id)
+
+        async def publish_batch(messages):
+            # Захват уже закоммичен: во время отправки строки не заблокированы
+            assert outbox["commits"] == 1
+            outbox["published"].extend(messages)
+            return [None, RuntimeError("nack"), None]
+
+        monkeypatch.setattr(outbox_relay, "publish_batch", publish_batch)
+
+        assert await outbox_relay.relay_once() == 3
+
+        assert [message[3] for message in outbox["published"]] == ["outbox-1", "outbox-2", "outbox-3"]
+        assert list(outbox["events"]) == [2]
+        assert outbox["events"][2].attempts == 3
+        assert outbox["events"][2].postponed == 4
+        assert "nack" in outbox["events"][2].last_error
+        assert outbox["commits"] == 2
+
+    async def test_claimed_events_are_leased_until_finished(self, monkeypatch, outbox):
+        monkeypatch.setattr(settings, "OUTBOX_CLAIM_LEASE_SECONDS", 45)
+        outbox["add"](1)
+        outbox["add"](2)
+        claimed_twice = []
+
+        async def publish_batch(messages):
+            # Параллельный проход ретранслятора не забирает события в аренде
+            claimed_twice.append(await outbox_crud.claim_batch(None, 10, 45))
+            return [None, RuntimeError("nack")]
+
+        monkeypatch.setattr(outbox_relay, "publish_batch", publish_batch)
+
+        assert await outbox_relay.relay_once() == 2
+        assert claimed_twice == [[]]
+        assert list(outbox["events"]) == [2]
+        assert outbox["events"][2].leased is None
+
+    async def test_broker_down_postpones_whole_batch_with_capped_backoff(self, monkeypatch, outbox):
+        monkeypatch.setattr(settings, "OUTBOX_MAX_BACKOFF_SECONDS", 60)
+        outbox["add"](1, attempts=0)
+        outbox["add"](2, attempts=10)
+
+        async def publish_batch(messages):
+            raise ConnectionError("broker unreachable")
+
+        monkeypatch.setattr(outbox_relay, "publish_batch", publish_batch)
+
+        assert await outbox_relay.relay_once() == 2
+        assert [event.postponed for event in outbox["events"].values()] == [1, 60]
+
+    async def test_relay_wakes_up_on_notify(self, monkeypatch, outbox):
+        monkeypatch.setattr(settings, "OUTBOX_POLL_INTERVAL", 30)
+
+        async def publish_batch(messages):
+            outbox["published"].extend(messages)
+            return [None] * len(messages)
+
+        monkeypatch.setattr(outbox_relay, "publish_batch", publish_batch)
+
+        task = asyncio.create_task(outbox_relay.run_relay())
+        try:
+            await asyncio.sleep(0.05)
+            outbox["add"](1)
+            outbox_relay.notify_outbox()
+
+            for _ in range(100):
+                if not outbox["events"]:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert outbox["events"] == {}
+            assert len(outbox["published"]) == 1
+        finally:
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
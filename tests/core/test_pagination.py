@@ -0,0 +1,113 @@
+import pytest
+from fastapi import Response
+from sqlalchemy import select
+
+from backend.core.exceptions.pagination_exceptions import InvalidCursorError
+from backend.core.utils.pagination import (
+    CursorParams,
+    apply_keyset,
+    decode_cursor,
+    decode_rank_cursor,
+    encode_cursor,
+    encode_rank_cursor,
+    set_cursor_headers,
+)
+from backend.models.cart import CartItem
+from backend.models.category import Category
+from backend.models.order import Order
+from backend.models.order_item import OrderItem
+from backend.models.product import Product
+from backend.models.user import User
+
+
+def _sql(query) -> str:
+    return str(query.compile(compile_kwargs={"literal_binds": True})).replace("\n", " ")
+
+
+class TestCursorTokens:
+
+    def test_round_trip(self):
+        token = encode_cursor(12345)
+
+        assert "=" not in token
+        assert decode_cursor(token) == 12345
+        assert decode_cursor(None) is None
+
+    @pytest.mark.parametrize("token", ["not-a-cursor", "e30", encode_cursor("12"), "eyJpZCI6dHJ1ZX0"])
+    def test_invalid_tokens_are_rejected(self, token):
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(token)
+
+    def test_rank_round_trip(self):
+        token = encode_rank_cursor(0.1, 42)
+
+        assert decode_rank_cursor(token) == (0.1, 42)
+        assert decode_rank_cursor(None) is None
+
+    @pytest.mark.parametrize("token", ["not-a-cursor", encode_cursor(42), encode_rank_cursor("0.1", 42), encode_rank_cursor(True, 42)])
+    def test_invalid_rank_tokens_are_rejected(self, token):
+        with pytest.raises(InvalidCursorError):
+            decode_rank_cursor(token)
+
+    def test_after_and_before_are_mutually_exclusive(self):
+        with pytest.raises(InvalidCursorError):
+            CursorParams(after=encode_cursor(1), before=encode_cursor(2))
+
+
+class TestKeyset:
+
+    def test_ascending_after(self):
+        sql = _sql(apply_keyset(select(Product.id), Product.id, after=10))
+
+        assert "products.id > 10" in sql
+        assert sql.endswith("ORDER BY products.id ASC")
+
+    def test_ascending_before_walks_backwards(self):
+        sql = _sql(apply_keyset(select(Product.id), Product.id, before=10))
+
+        assert "products.id < 10" in sql
+        assert sql.endswith("ORDER BY products.id DESC")
+
+    def test_descending_after_and_before(self):
+        after_sql = _sql(apply_keyset(select(Order.id), Order.id, after=10, descending=True))
+        before_sql = _sql(apply_keyset(select(Order.id), Order.id, before=10, descending=True))
+
+        assert "orders.id < 10" in after_sql
+        assert after_sql.endswith("ORDER BY orders.id DESC")
+        assert "orders.id > 10" in before_sql
+        assert before_sql.endswith("ORDER BY orders.id ASC")
+
+
+class TestCursorHeaders:
+
+    def test_first_full_page_has_only_next(self):
+        response = Response()
+
+        set_cursor_headers(response, [1, 2], 2, CursorParams())
+
+        assert decode_cursor(response.headers["X-Next-Cursor"]) == 2
+        assert "X-Prev-Cursor" not in response.headers
+
+    def test_last_page_after_cursor_has_only_prev(self):
+        response = Response()
+
+        set_cursor_headers(response, [3], 2, CursorParams(after=encode_cursor(2)))
+
+        assert decode_cursor(response.headers["X-Prev-Cursor"]) == 3
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_page_before_cursor_always_has_next(self):
+        response = Response()
+
+        set_cursor_headers(response, [1], 2, CursorParams(before=encode_cursor(2)))
+
+        assert decode_cursor(response.headers["X-Next-Cursor"]) == 1
+        assert "X-Prev-Cursor" not in response.headers
+
+    def test_empty_page_has_no_cursors(self):
+        response = Response()
+
+        set_cursor_headers(response, [], 2, CursorParams(after=encode_cursor(2)))
+
+        assert "X-Next-Cursor" not in response.headers
+        assert "X-Prev-Cursor" not in response.headers
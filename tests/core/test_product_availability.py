@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+import fakeredis
+
+from backend.core import cache
+from backend.core.cache import invalidate_tags
+from backend.core.config import settings
+from backend.crud.product import product_crud
+from backend.schemas.product import ProductResponse
+from backend.services.product_service import product_service
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://fake:6379/0")
+    monkeypatch.setattr(cache, "_redis", client)
+
+    return client
+
+
+@pytest.fixture
+def stocks(monkeypatch):
+    state = {"available": {1: 4, 2: 0}, "calls": []}
+
+    async def get_available_stocks(db, product_ids):
+        state["calls"].append(list(product_ids))
+        return [SimpleNamespace(id=product_id, available_stock=state["available"][product_id]) for product_id in product_ids]
+
+    monkeypatch.setattr(product_crud, "get_available_stocks", get_available_stocks)
+
+    return state
+
+
+def _product(product_id: int) -> ProductResponse:
+    return ProductResponse(
+        id=product_id,
+        name=f"Product {product_id}",
+        description="Description",
+        price="100.00",
+        stock=10,
+        category_id=1,
+        is_delete=False,
+    )
+
+
+@pytest.mark.asyncio
+class TestProductAvailability:
+
+    async def test_availability_is_cached_apart_from_catalog(self, fake_redis, stocks):
+        products = [_product(1), _product(2)]
+
+        first = await product_service.with_availability(None, products)
+        second = await product_service.with_availability(None, products)
+
+        assert [product.available_stock for product in first] == [4, 0]
+        assert [product.available_stock for product in second] == [4, 0]
+        assert stocks["calls"] == [[1, 2]]
+        # Исходные карточки не меняются: они могут быть общими объектами из L1
+        assert products[0].available_stock is None
+
+    async def test_stock_tag_drops_only_availability(self, fake_redis, stocks):
+        await fake_redis.set("api_cache:products:by_id:1:False", b"card")
+        await fake_redis.sadd("api_cache:tag:product:1", "api_cache:products:by_id:1:False")
+
+        await product_service.with_availability(None, [_product(1)])
+        stocks["available"][1] = 1
+
+        # Так корзина и сборщик броней сообщают об изменении остатка
+        await invalidate_tags("stock:1")
+
+        assert [product.available_stock for product in await product_service.with_availability(None, [_product(1)])] == [1]
+        assert await fake_redis.get("api_cache:products:by_id:1:False") == b"card"
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from backend.core import rabbitmq
+from backend.core.rabbitmq import RabbitPublisher
+
+
+class FakeExchange:
+
+    def __init__(self, channel, name):
+        self.channel = channel
+        self.name = name
+
+    async def publish(self, message, routing_key, timeout=None):
+        broker = self.channel.broker
+        broker.in_flight += 1
+        broker.max_in_flight = max(broker.max_in_flight, broker.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if message.message_id in broker.nack:
+                raise RuntimeError("nack")
+            broker.published.append((self.name, routing_key, message.message_id))
+        finally:
+            broker.in_flight -= 1
+
+
+class FakeChannel:
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_closed = False
+        self.get_exchange_calls = 0
+
+    async def get_exchange(self, name):
+        self.get_exchange_calls += 1
+        return FakeExchange(self, name)
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.is_closed = False
+        self.channels = []
+        self.published = []
+        self.nack = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def channel(self, publisher_confirms=False):
+        assert publisher_confirms
+        channel = FakeChannel(self)
+        self.channels.append(channel)
+        return channel
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    connection = FakeConnection()
+    monkeypatch.setattr(rabbitmq, "_connection", connection)
+    monkeypatch.setattr(rabbitmq, "_topology_ready", True)
+
+    return connection
+
+
+@pytest.mark.asyncio
+class TestRabbitPublisher:
+
+    async def test_channel_and_exchange_are_reused(self, broker):
+        publisher = RabbitPublisher(pool_size=2)
+
+        for order_id in range(5):
+            await publisher.publish("email.exchange", "email", {"order_id": order_id})
+
+        assert len(broker.channels) == 1
+        assert broker.channels[0].get_exchange_calls == 1
+        assert len(broker.published) == 5
+
+    async def test_pool_is_bounded_and_channels_are_shared(self, broker):
+        publisher = RabbitPublisher(pool_size=2)
+
+        await asyncio.gather(*(publisher.publish("email.exchange", "email", {"order_id": i}) for i in range(10)))
+
+        # Подтверждения на общем канале конвейеризуются: все публикации в полете одновременно
+        assert len(broker.channels) == 2
+        assert broker.max_in_flight == 10
+        assert len(broker.published) == 10
+
+    async def test_batch_pipelines_publishes_on_one_channel(self, broker):
+        publisher = RabbitPublisher(pool_size=2)
+        broker.nack.add("m-2")
+
+        errors = await publisher.publish_batch(
+            [("email.exchange", "email", {"order_id": i}, f"m-{i}") for i in range(50)]
+        )
+
+        assert len(broker.channels) == 1
+        assert broker.channels[0].get_exchange_calls == 1
+        assert broker.max_in_flight == 50
+        assert [i for i, error in enumerate(errors) if error is not None] == [2]
+        assert len(broker.published) == 49
+
+        # Отказ брокера по сообщению не ломает канал
+        await publisher.publish("email.exchange", "email", {"order_id": 1})
+        assert len(broker.channels) == 1
+
+    async def test_closed_channels_are_not_reused(self, broker):
+        publisher = RabbitPublisher(pool_size=1)
+
+        await publisher.publish("email.exchange", "email", {"order_id": 1})
+        broker.channels[0].is_closed = True
+        await publisher.publish("email.exchange", "email", {"order_id": 2})
+
+        assert len(broker.channels) == 2
+
+        await publisher.close()
+        assert broker.channels[1].is_closed
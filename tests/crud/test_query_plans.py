@@ -0,0 +1,152 @@
+import json
+
+import pytest
+from sqlalchemy import event, text
+
+from backend.crud.cart import cart_crud
+from backend.crud.order import order_crud
+from backend.crud.product import product_crud
+from backend.core.utils.order_status_enums import OrderStatus
+
+SEED_SQL = [
+    """
+    INSERT INTO categories (name, slug, is_delete)
+    SELECT 'Plan Category ' || g, 'plan-category-' || g, false
+    FROM generate_series(1, 50) AS g
+    """,
+    """
+    INSERT INTO products (name, description, price, stock, category_id, is_delete)
+    SELECT 'Plan Product ' || g, 'Description', (g % 1000) + 0.99, 100,
+           (SELECT min(id) FROM categories WHERE name LIKE 'Plan Category %') + g % 50,
+           g % 20 = 0
+    FROM generate_series(1, 50000) AS g
+    """,
+    """
+    INSERT INTO users (email, hashed_password, username, is_active, is_admin)
+    SELECT 'plan' || g || '@example.com', 'hash', 'plan_' || g, true, false
+    FROM generate_series(1, 500) AS g
+    """,
+    """
+    INSERT INTO orders (user_id, status, total_price)
+    SELECT u.id, (ARRAY['NEW', 'PAID', 'SHIPPED', 'COMPLETED', 'CANCELLED']::orderstatus[])[1 + g % 5], 100
+    FROM generate_series(1, 100) AS g
+    CROSS JOIN (SELECT id FROM users WHERE email LIKE 'plan%@example.com') AS u
+    """,
+    """
+    INSERT INTO order_items (order_id, product_id, quantity, price_at_purchase)
+    SELECT o.id, p.id, 1, 100
+    FROM orders AS o
+    CROSS JOIN LATERAL (SELECT id FROM products ORDER BY id LIMIT 2) AS p
+    """,
+    """
+    INSERT INTO cart_items (user_id, product_id, quantity)
+    SELECT u.id, p.id, 1
+    FROM (SELECT id FROM users WHERE email LIKE 'plan%@example.com') AS u
+    CROSS JOIN LATERAL (SELECT id FROM products ORDER BY id LIMIT 10) AS p
+    """,
+]
+
+
+def _index_names(plan: dict) -> set[str]:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= _index_names(child)
+    return names
+
+
+@pytest.fixture
+async def seeded_db(db_session):
+    for statement in SEED_SQL:
+        await db_session.execute(text(statement))
+
+    for table in ("categories", "products", "users", "orders", "order_items", "cart_items"):
+        await db_session.execute(text(f"ANALYZE {table}"))
+
+    return db_session
+
+
+async def _used_indexes(db_session, call) -> set[str]:
+    connection = await db_session.connection()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(connection.sync_connection, "before_cursor_execute", capture)
+    try:
+        await call()
+    finally:
+        event.remove(connection.sync_connection, "before_cursor_execute", capture)
+
+    used = set()
+    for statement, parameters in statements:
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        used |= _index_names(plan[0]["Plan"])
+    return used
+
+
+async def _first_id(db_session, query: str) -> int:
+    return (await db_session.execute(text(query))).scalar_one()
+
+
+@pytest.mark.asyncio
+class TestQueryPlans:
+
+    async def test_category_listing_uses_partial_index(self, seeded_db):
+        category_id = await _first_id(seeded_db, "SELECT min(id) FROM categories WHERE name LIKE 'Plan Category %'")
+
+        used = await _used_indexes(
+            seeded_db,
+            lambda: product_crud.get_product_ids(seeded_db, limit=10, category_id=category_id)
+        )
+
+        assert "ix_products_active_category_id_id" in used
+
+    async def test_price_range_uses_partial_index(self, seeded_db):
+        used = await _used_indexes(
+            seeded_db,
+            lambda: product_crud.get_product_ids(seeded_db, limit=10, min_price=10, max_price=11)
+        )
+
+        assert "ix_products_active_price" in used
+
+    async def test_order_history_uses_user_index(self, seeded_db):
+        user_id = await _first_id(seeded_db, "SELECT min(id) FROM users WHERE email LIKE 'plan%@example.com'")
+
+        used = await _used_indexes(
+            seeded_db,
+            lambda: order_crud.get_multi_orders(seeded_db, user_id=user_id, limit=10)
+        )
+
+        assert "ix_orders_user_id_id" in used
+        assert "ix_order_items_order_id" in used
+
+    async def test_order_history_by_status_uses_status_index(self, seeded_db):
+        user_id = await _first_id(seeded_db, "SELECT min(id) FROM users WHERE email LIKE 'plan%@example.com'")
+
+        used = await _used_indexes(
+            seeded_db,
+            lambda: order_crud.get_multi_orders(seeded_db, user_id=user_id, status=OrderStatus.PAID, limit=10)
+        )
+
+        assert "ix_orders_user_id_status_id" in used
+
+    async def test_cart_lookup_uses_user_index(self, seeded_db):
+        user_id = await _first_id(seeded_db, "SELECT min(id) FROM users WHERE email LIKE 'plan%@example.com'")
+
+        used = await _used_indexes(seeded_db, lambda: cart_crud.get_user_cart(seeded_db, user_id))
+
+        assert "ix_cart_items_user_id_product_id" in used
+
+    async def test_name_search_uses_trigram_index(self, seeded_db):
+        used = await _used_indexes(seeded_db, lambda: product_crud.seacrh_products_by_name(seeded_db, "4242"))
+
+        assert "ix_products_active_name_trgm" in used
+
+    async def test_full_text_search_uses_search_vector_index(self, seeded_db):
+        used = await _used_indexes(seeded_db, lambda: product_crud.search_products(seeded_db, "4242:*"))
+
+        assert "ix_products_active_search_vector" in used
@@ -0,0 +1,33 @@
+import pytest
+
+@pytest.mark.asyncio
+class TestMetricsRouter:
+
+    async def test_get_metrics(
+            self,
+            admin_client,
+    ):
+
+        response = await admin_client.get("/api/metrics/")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE api_cache_requests_total counter" in response.text
+
+    async def test_get_metrics_requires_admin(
+            self,
+            auth_client,
+    ):
+
+        response = await auth_client.get("/api/metrics/")
+
+        assert response.status_code == 403
+
+    async def test_get_metrics_anonymous(
+            self,
+            async_client,
+    ):
+
+        response = await async_client.get("/api/metrics/")
+
+        assert response.status_code == 401
@@ -153,4 +153,28 @@ class TestOrderRouter:
 
         assert response.status_code == 400
 
-    
\ No newline at end of file
+    
+    async def test_create_order_with_idempotency_key_creates_one_order(
+            self,
+            auth_client,
+            db_session,
+            product_factory
+    ):
+        product = await product_factory(name="Idempotent Product", price=100, stock=5)
+        body = {"items": [{"product_id": product.id, "quantity": 2}]}
+        headers = {"Idempotency-Key": "retry-me"}
+
+        first = await auth_client.post("/api/order/", json=body, headers=headers)
+        retry = await auth_client.post("/api/order/", json=body, headers=headers)
+
+        assert first.status_code == 200
+        assert retry.status_code == 200
+        assert retry.json()["id"] == first.json()["id"]
+
+        await db_session.refresh(product)
+        assert product.stock == 3
+
+        bad_key = await auth_client.post("/api/order/", json=body, headers={"Idempotency-Key": "x" * 256})
+
+        assert bad_key.status_code == 400
+        assert bad_key.json()["code"] == "idempotency_key_invalid"
@@ -20,6 +20,44 @@ class TestProductRouter:
         assert response.status_code == 200
         assert len(response.json()) >= 2
 
+    async def test_get_all_products_with_cursor(
+            self,
+            async_client,
+            product_factory,
+            category_factory
+    ):
+        
+        category = await category_factory(name="Cursor Category")
+        category_id = category.id
+        ids = [
+            (await product_factory(name=f"Cursor Product {index}", category_id=category_id)).id
+            for index in range(3)
+        ]
+
+        first_page = await async_client.get(f"/api/product/?limit=2&category_id={category_id}")
+        assert first_page.status_code == 200
+        assert [item["id"] for item in first_page.json()] == ids[:2]
+        assert "X-Prev-Cursor" not in first_page.headers
+
+        next_cursor = first_page.headers["X-Next-Cursor"]
+        second_page = await async_client.get(f"/api/product/?limit=2&category_id={category_id}&after={next_cursor}")
+        assert [item["id"] for item in second_page.json()] == ids[2:]
+        assert "X-Next-Cursor" not in second_page.headers
+
+        prev_cursor = second_page.headers["X-Prev-Cursor"]
+        back_page = await async_client.get(f"/api/product/?limit=2&category_id={category_id}&before={prev_cursor}")
+        assert [item["id"] for item in back_page.json()] == ids[:2]
+
+    async def test_get_all_products_invalid_cursor(
+            self,
+            async_client
+    ):
+        
+        response = await async_client.get("/api/product/?after=not-a-cursor")
+
+        assert response.status_code == 400
+        assert response.json()["code"] == "invalid_cursor"
+
     async def test_search_products_by_name(
             self,
             async_client,
@@ -32,6 +70,97 @@ class TestProductRouter:
         assert response.status_code == 200
         assert any(item["name"] == "Super Gadget" for item in response.json())
 
+    async def test_autocomplete_falls_back_to_db_until_index_is_ready(
+            self,
+            async_client,
+            product_factory
+    ):
+        
+        await product_factory(name="Autocomplete Gadget")
+
+        response = await async_client.get("/api/product/autocomplete?q=Autocomplete&limit=5")
+
+        assert response.status_code == 200
+        assert any(item["name"] == "Autocomplete Gadget" for item in response.json())
+
+    async def test_full_text_search_with_facets(
+            self,
+            async_client,
+            product_factory,
+            category_factory
+    ):
+        
+        phones = await category_factory(name="Смартфоны")
+        phones_id = phones.id
+        await product_factory(name="Vortex Phone", description="Флагманский смартфон", price=900, category_id=phones_id)
+        await product_factory(name="Vortex Phone Mini", description="Компактный смартфон", price=600, category_id=phones_id)
+        await product_factory(name="Case", description="Чехол для Vortex", price=20)
+
+        response = await async_client.get("/api/product/search?q=vort")
+        assert response.status_code == 200
+
+        body = response.json()
+        assert body["total"] == 3
+        # Совпадение в названии весит больше, чем в описании
+        assert body["items"][-1]["name"] == "Case"
+        assert {"category_id": phones_id, "name": "Смартфоны", "count": 2} in body["facets"]["categories"]
+        assert sum(bucket["count"] for bucket in body["facets"]["prices"]) == 3
+
+        by_category = await async_client.get("/api/product/search?q=смартфон")
+        assert by_category.json()["total"] == 2
+
+        filtered = await async_client.get(f"/api/product/search?q=vortex&max_price=700&category_id={phones_id}")
+        assert [item["name"] for item in filtered.json()["items"]] == ["Vortex Phone Mini"]
+
+    async def test_full_text_search_cursor(
+            self,
+            async_client,
+            product_factory,
+            category_factory
+    ):
+        
+        category = await category_factory(name="Search Cursor Category")
+        for index in range(3):
+            await product_factory(name=f"Quasar {index}", category_id=category.id)
+
+        first_page = await async_client.get("/api/product/search?q=quasar&limit=2")
+        assert len(first_page.json()["items"]) == 2
+
+        next_cursor = first_page.headers["X-Next-Cursor"]
+        second_page = await async_client.get(f"/api/product/search?q=quasar&limit=2&after={next_cursor}")
+        assert len(second_page.json()["items"]) == 1
+        assert "X-Next-Cursor" not in second_page.headers
+
+        seen = {item["id"] for item in first_page.json()["items"] + second_page.json()["items"]}
+        assert len(seen) == 3
+
+    async def test_full_text_search_follows_category_rename(
+            self,
+            async_client,
+            db_session,
+            product_factory,
+            category_factory
+    ):
+        
+        category = await category_factory(name="Gadgets")
+        await product_factory(name="Widget", category_id=category.id)
+
+        category.name = "Nebulizers"
+        await db_session.commit()
+
+        response = await async_client.get("/api/product/search?q=nebuliz")
+        assert [item["name"] for item in response.json()["items"]] == ["Widget"]
+
+    async def test_full_text_search_without_terms(
+            self,
+            async_client
+    ):
+        
+        response = await async_client.get("/api/product/search?q=%20!!")
+
+        assert response.status_code == 200
+        assert response.json() == {"items": [], "total": 0, "facets": {"categories": [], "prices": []}}
+
     async def test_create_product_forbidden_for_user(
             self,
             auth_client
@@ -1,8 +1,14 @@
+from datetime import timedelta
+
 import pytest
 from fastapi import HTTPException, status
+from sqlalchemy import select, update
 
 from backend.services.cart_service import cart_service
 from backend.models.cart import CartItem
+from backend.models.stock_hold import StockHold
+from backend.crud.stock_hold import stock_hold_crud
+from backend.crud.product import product_crud
 from backend.schemas.cart import CartItemAdd, CartSummary
 
 from backend.core.exceptions.base import AppError
@@ -140,4 +146,69 @@ class TestCartService:
         cleared_cart = await cart_service.get_my_cart(db_session, user.id)
 
         assert cleared_cart["items"] == []
-        assert cleared_cart["total_price"] == 0
\ No newline at end of file
+        assert cleared_cart["total_price"] == 0
+
+    async def test_add_item_into_cart_holds_stock(
+            self,
+            db_session,
+            user_factory,
+            product_factory
+    ):
+        
+        first = await user_factory(email="first@example.com")
+        second = await user_factory(email="second@example.com")
+        product = await product_factory(name="Held product", price=100, stock=5)
+
+        await cart_service.add_item_into_cart(db_session, first.id, CartItemAdd(product_id=product.id, quantity=3))
+
+        await db_session.refresh(product)
+        assert product.held == 3
+        assert (await product_crud.get_available_stocks(db_session, [product.id]))[0].available_stock == 2
+
+        # Чужая бронь уменьшает доступный остаток еще до оформления заказа
+        with pytest.raises(AppError) as excinfo:
+            await cart_service.add_item_into_cart(db_session, second.id, CartItemAdd(product_id=product.id, quantity=3))
+
+        assert excinfo.value.error_code == "cart_insufficient_stock"
+        assert excinfo.value.message == "Недостаточно товара 'Held product' на складе. Доступно: 2"
+
+        # Повторное добавление расширяет ту же бронь, а не создает вторую
+        await cart_service.add_item_into_cart(db_session, first.id, CartItemAdd(product_id=product.id, quantity=2))
+
+        holds = (await db_session.execute(select(StockHold).where(StockHold.product_id == product.id))).scalars().all()
+        await db_session.refresh(product)
+
+        assert [(hold.user_id, hold.quantity) for hold in holds] == [(first.id, 5)]
+        assert product.held == 5
+        assert (await product_crud.get_available_stocks(db_session, [product.id]))[0].available_stock == 0
+
+    async def test_clear_cart_and_sweeper_release_holds(
+            self,
+            db_session,
+            user_factory,
+            product_factory
+    ):
+        
+        first = await user_factory(email="first@example.com")
+        second = await user_factory(email="second@example.com")
+        product = await product_factory(name="Released product", price=100, stock=5)
+
+        await cart_service.add_item_into_cart(db_session, first.id, CartItemAdd(product_id=product.id, quantity=2))
+        await cart_service.add_item_into_cart(db_session, second.id, CartItemAdd(product_id=product.id, quantity=3))
+
+        await cart_service.clear_cart(db_session, first.id)
+
+        await db_session.refresh(product)
+        assert product.held == 3
+
+        await db_session.execute(
+            update(StockHold).where(StockHold.user_id == second.id).values(expires_at=StockHold.expires_at - timedelta(days=1))
+        )
+
+        assert await stock_hold_crud.sweep_expired_holds(db_session, batch=100) == [product.id]
+        assert await stock_hold_crud.sweep_expired_holds(db_session, batch=100) == []
+
+        await db_session.refresh(product)
+        assert product.held == 0
+        assert (await product_crud.get_available_stocks(db_session, [product.id]))[0].available_stock == 5
+
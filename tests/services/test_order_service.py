@@ -1,14 +1,39 @@
+import asyncio
+import random
+from datetime import timedelta
+
 import pytest
+import fakeredis
 from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from fastapi import BackgroundTasks
 from unittest.mock import MagicMock
 
 from backend.services.order_service import order_service
+from backend.services import inventory_service as inventory
+from backend.services.inventory_service import inventory_service
+from backend.core import cache
+from backend.crud.product import product_crud
 from backend.core.utils.order_status_enums import OrderStatus
 from backend.models.order import Order
+from backend.models.stock_hold import StockHold
+from backend.models.cart import CartItem
+from backend.models.outbox import OutboxEvent
+from backend.crud.outbox import outbox_crud
+from backend.worker.outbox_relay import notify_outbox
+from backend.services.cart_service import cart_service
+from backend.schemas.cart import CartItemAdd
 from backend.schemas.order import OrderCreate, OrderItemCreate
 
+from backend.core.config import settings
 from backend.core.exceptions.base import AppError
+from backend.core.exceptions.product_exceptions import ProductInsufficientStockError
+from backend.core.exceptions.idempotency_exceptions import IdempotencyKeyReusedError
+from backend.models.category import Category
+from backend.models.order_item import OrderItem
+from backend.models.product import Product
+from backend.models.user import User
 
 @pytest.mark.asyncio
 class TestOrderService:
@@ -44,6 +69,32 @@ class TestOrderService:
         assert product1.stock == 8
         assert product2.stock == 4
 
+    async def test_create_order_merges_duplicate_items(
+            self,
+            db_session,
+            user_factory,
+            product_factory
+    ):
+        
+        user = await user_factory(email="testuser@example.com")
+        product = await product_factory(name="Cable", price=10, stock=5)
+
+        order_in = OrderCreate(
+            items=[
+                OrderItemCreate(product_id=product.id, quantity=2),
+                OrderItemCreate(product_id=product.id, quantity=3)
+            ]
+        )
+
+        order = await order_service.create_order(db_session, order_in, user.id)
+
+        assert [(item.product_id, item.quantity) for item in order.items] == [(product.id, 5)]
+        assert order.total_price == 50
+
+        await db_session.refresh(product)
+
+        assert product.stock == 0
+
     async def test_create_order_insufficient_stock(
             self,
             db_session,
@@ -65,6 +116,66 @@ class TestOrderService:
         assert excinfo.value.message == "Недостаточно товара 'Limited Item' на складе"
         assert excinfo.value.error_code == "product_insufficient_stock"
 
+    async def test_idempotency_key_from_other_request_is_rejected(
+            self,
+            db_session,
+            user_factory,
+            product_factory
+    ):
+
+        user = await user_factory(email="testuser@example.com")
+        product = await product_factory(name="Phone", price=100, stock=10)
+
+        order_in = OrderCreate(items=[OrderItemCreate(product_id=product.id, quantity=1)])
+        order = await order_service.create_order(db_session, order_in, user.id, idempotency_key="retry-me")
+
+        # Повтор без записи в Redis отдает тот же заказ
+        replay = await order_service.create_order(db_session, order_in, user.id, idempotency_key="retry-me")
+        assert replay.id == order.id
+
+        other_body = OrderCreate(items=[OrderItemCreate(product_id=product.id, quantity=2)])
+
+        with pytest.raises(IdempotencyKeyReusedError):
+            await order_service.create_order(db_session, other_body, user.id, idempotency_key="retry-me")
+
+        with pytest.raises(IdempotencyKeyReusedError):
+            await order_service.create_order_from_cart(
+                db_session, user.id, user.email, BackgroundTasks(), idempotency_key="retry-me"
+            )
+
+        await db_session.refresh(product)
+
+        assert product.stock == 9
+
+    async def test_expired_idempotency_key_can_be_reused(
+            self,
+            db_session,
+            user_factory,
+            product_factory
+    ):
+
+        user = await user_factory(email="testuser@example.com")
+        product = await product_factory(name="Phone", price=100, stock=10)
+
+        order_in = OrderCreate(items=[OrderItemCreate(product_id=product.id, quantity=1)])
+        first = await order_service.create_order(db_session, order_in, user.id, idempotency_key="daily")
+
+        await db_session.execute(
+            update(Order)
+            .where(Order.id == first.id)
+            .values(created_at=func.now() - timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS + 1))
+        )
+
+        other_body = OrderCreate(items=[OrderItemCreate(product_id=product.id, quantity=2)])
+        second = await order_service.create_order(db_session, other_body, user.id, idempotency_key="daily")
+
+        assert second.id != first.id
+
+        await db_session.refresh(first)
+
+        assert first.idempotency_key is None
+        assert second.idempotency_key == "daily"
+
     async def test_get_one_order_by_id_success(
             self,
             db_session,
@@ -238,6 +349,85 @@ class TestOrderService:
 
         bg_tasks.add_task.assert_called_once()
 
+    async def test_create_order_from_cart_converts_holds(
+            self,
+            db_session,
+            user_factory,
+            product_factory
+    ):
+        
+        buyer = await user_factory(email="buyer@example.com")
+        other = await user_factory(email="other@example.com")
+        product = await product_factory(name="Held Cart Item", price=100, stock=5)
+
+        await cart_service.add_item_into_cart(db_session, buyer.id, CartItemAdd(product_id=product.id, quantity=3))
+        await cart_service.add_item_into_cart(db_session, other.id, CartItemAdd(product_id=product.id, quantity=2))
+
+        bg_tasks = BackgroundTasks()
+        bg_tasks.add_task = MagicMock()
+
+        # Весь свободный остаток забронирован, но своя бронь переходит в заказ
+        await order_service.create_order_from_cart(
+            db=db_session,
+            user_id=buyer.id,
+            email=buyer.email,
+            background_tasks=bg_tasks
+        )
+
+        await db_session.refresh(product)
+        holds = (await db_session.execute(select(StockHold.user_id).where(StockHold.product_id == product.id))).scalars().all()
+
+        assert product.stock == 2
+        assert product.held == 2
+        assert holds == [other.id]
+
+        with pytest.raises(ProductInsufficientStockError):
+            await order_service.create_order(
+                db_session, OrderCreate(items=[OrderItemCreate(product_id=product.id, quantity=1)]), buyer.id
+            )
+
+    async def test_create_order_from_cart_writes_outbox_event(
+            self,
+            db_session,
+            user_factory,
+            product_factory,
+            cart_item_factory
+    ):
+        
+        user = await user_factory(email="outbox@example.com")
+        product = await product_factory(name="Outbox Item", price=300, stock=5)
+        await cart_item_factory(user_id=user, product_id=product.id, quantity=2)
+
+        bg_tasks = BackgroundTasks()
+        bg_tasks.add_task = MagicMock()
+
+        new_order = await order_service.create_order_from_cart(
+            db=db_session,
+            user_id=user.id,
+            email=user.email,
+            background_tasks=bg_tasks
+        )
+
+        events = (await db_session.execute(select(OutboxEvent))).scalars().all()
+
+        assert len(events) == 1
+        assert events[0].routing_key == settings.RABBITMQ_EMAIL_QUEUE
+        assert events[0].payload == {
+            "email_to": user.email,
+            "template_data": {
+                "order_id": new_order.id,
+                "total_price": 600.0,
+                "items": [{"product_name": "Outbox Item", "quantity": 2, "price": 300.0}]
+            }
+        }
+        bg_tasks.add_task.assert_called_once_with(notify_outbox)
+
+        # Захваченное событие в аренде не забирается повторно, после неудачной отправки уходит в отложенные
+        assert [event.id for event in await outbox_crud.claim_batch(db_session, 10, 60)] == [events[0].id]
+        assert await outbox_crud.claim_batch(db_session, 10, 60) == []
+        await outbox_crud.postpone_event(db_session, events[0].id, 60, "nack")
+        assert await outbox_crud.claim_batch(db_session, 10, 60) == []
+
     async def test_create_order_from_cart_error(
             self,
             db_session,
@@ -286,4 +476,272 @@ class TestOrderService:
 
         assert excinfo.value.status_code == status.HTTP_400_BAD_REQUEST
         assert excinfo.value.message == "Ваша корзина пуста. Нечего заказывать!"
-        assert excinfo.value.error_code == "cart_empty"
\ No newline at end of file
+        assert excinfo.value.error_code == "cart_empty"
+
+@pytest.fixture
+async def committed_catalog():
+    # Конкурентным заказам нужны отдельные соединения, а значит закоммиченные данные, а не транзакция db_session
+    engine = create_async_engine(settings.TEST_DATABASE_URL, pool_size=20, max_overflow=0)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with session_factory() as session:
+        user = User(email="concurrency@example.com", username="concurrency", hashed_password="hash")
+        category = Category(name="Concurrency Category", slug="concurrency-category")
+        session.add_all([user, category])
+        await session.flush()
+
+        products = [
+            Product(name=f"Concurrency SKU {index}", description="SKU", price=10, stock=stock, category_id=category.id)
+            for index, stock in enumerate((100, 100, 100, 5))
+        ]
+        session.add_all(products)
+        await session.commit()
+
+    try:
+        yield session_factory, user.id, [product.id for product in products]
+    finally:
+        async with session_factory() as session:
+            product_ids = [product.id for product in products]
+            await session.execute(delete(CartItem).where(CartItem.user_id == user.id))
+            await session.execute(delete(StockHold).where(StockHold.user_id == user.id))
+            await session.execute(delete(OrderItem).where(OrderItem.product_id.in_(product_ids)))
+            await session.execute(delete(Order).where(Order.user_id == user.id))
+            await session.execute(delete(Product).where(Product.id.in_(product_ids)))
+            await session.execute(delete(Category).where(Category.id == category.id))
+            await session.execute(delete(User).where(User.id == user.id))
+            await session.commit()
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+class TestOrderConcurrency:
+
+    async def test_overlapping_orders_do_not_deadlock(self, committed_catalog):
+        session_factory, user_id, product_ids = committed_catalog
+        shared = product_ids[:3]
+        rng = random.Random(7)
+
+        async def place_order():
+            # Каждый заказ перечисляет одни и те же SKU в своем порядке и с повторами
+            items = [OrderItemCreate(product_id=product_id, quantity=1) for product_id in rng.sample(shared, len(shared))]
+            items.append(OrderItemCreate(product_id=items[0].product_id, quantity=1))
+
+            async with session_factory() as session:
+                return await order_service.create_order(session, OrderCreate(items=items), user_id)
+
+        results = await asyncio.gather(*(place_order() for _ in range(20)), return_exceptions=True)
+
+        assert [result for result in results if isinstance(result, Exception)] == []
+
+        async with session_factory() as session:
+            stocks = (await session.execute(
+                select(Product.stock).where(Product.id.in_(shared)).order_by(Product.id)
+            )).scalars().all()
+
+        ordered = sum(item.quantity for order in results for item in order.items)
+        assert ordered == 20 * 4
+        assert sum(100 - stock for stock in stocks) == ordered
+
+    async def test_scarce_sku_is_not_oversold(self, committed_catalog):
+        session_factory, user_id, product_ids = committed_catalog
+        scarce = product_ids[3]
+
+        async def place_order():
+            async with session_factory() as session:
+                order_in = OrderCreate(items=[OrderItemCreate(product_id=scarce, quantity=1)])
+                return await order_service.create_order(session, order_in, user_id)
+
+        results = await asyncio.gather(*(place_order() for _ in range(20)), return_exceptions=True)
+
+        assert sum(isinstance(result, Order) for result in results) == 5
+        assert all(
+            isinstance(result, (Order, ProductInsufficientStockError)) for result in results
+        )
+
+        async with session_factory() as session:
+            stock = (await session.execute(select(Product.stock).where(Product.id == scarce))).scalar_one()
+
+        assert stock == 0
+
+    async def test_concurrent_retries_with_same_key_create_one_order(self, committed_catalog):
+        session_factory, user_id, product_ids = committed_catalog
+        product_id = product_ids[0]
+
+        async def place_order():
+            async with session_factory() as session:
+                order_in = OrderCreate(items=[OrderItemCreate(product_id=product_id, quantity=2)])
+                order = await order_service.create_order(session, order_in, user_id, idempotency_key="mobile-retry")
+                return order.id
+
+        # Без Redis дубли отсекает уникальный индекс заказов: проигравшие откатываются и получают готовый заказ
+        results = await asyncio.gather(*(place_order() for _ in range(5)))
+
+        assert len(set(results)) == 1
+
+        async with session_factory() as session:
+            stock = (await session.execute(select(Product.stock).where(Product.id == product_id))).scalar_one()
+
+        assert stock == 98
+
+    async def test_failed_line_reports_and_rolls_back_reservation(self, committed_catalog):
+        session_factory, user_id, product_ids = committed_catalog
+        plenty, scarce = product_ids[0], product_ids[3]
+
+        async with session_factory() as session:
+            reserved, failed = await product_crud.reserve_stock(session, {plenty: 1, scarce: 6, -1: 1})
+
+            assert list(reserved) == [plenty]
+            assert failed == [scarce, -1]
+
+            await session.rollback()
+
+        async with session_factory() as session:
+            order_in = OrderCreate(items=[
+                OrderItemCreate(product_id=plenty, quantity=1),
+                OrderItemCreate(product_id=scarce, quantity=6)
+            ])
+
+            with pytest.raises(ProductInsufficientStockError):
+                await order_service.create_order(session, order_in, user_id)
+
+        async with session_factory() as session:
+            stocks = (await session.execute(
+                select(Product.stock).where(Product.id.in_([plenty, scarce])).order_by(Product.id)
+            )).scalars().all()
+
+        assert stocks == [100, 5]
+
+
+@pytest.fixture
+def redis_inventory(monkeypatch, committed_catalog):
+    session_factory, _, _ = committed_catalog
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://fake:6379/0")
+    monkeypatch.setattr(settings, "INVENTORY_REDIS_ENABLED", True)
+    monkeypatch.setattr(cache, "_redis", client)
+    monkeypatch.setattr(inventory, "AsyncSessionLocal", session_factory)
+
+    return client
+
+
+@pytest.mark.asyncio
+class TestRedisInventory:
+
+    async def test_flash_sale_sells_exactly_stock_and_reconciles(self, committed_catalog, redis_inventory):
+        session_factory, user_id, product_ids = committed_catalog
+        scarce = product_ids[3]
+
+        async with session_factory() as session:
+            status_ = await inventory_service.enable(session, scarce)
+        assert status_["available"] == 5
+
+        async def place_order():
+            async with session_factory() as session:
+                order_in = OrderCreate(items=[OrderItemCreate(product_id=scarce, quantity=1)])
+                return await order_service.create_order(session, order_in, user_id)
+
+        results = await asyncio.gather(*(place_order() for _ in range(20)), return_exceptions=True)
+
+        assert sum(isinstance(result, Order) for result in results) == 5
+        assert all(isinstance(result, (Order, ProductInsufficientStockError)) for result in results)
+
+        async with session_factory() as session:
+            # До сверки products.stock не тронут, продажи висят в order_items.stock_deferred
+            assert (await session.execute(select(Product.stock).where(Product.id == scarce))).scalar_one() == 5
+            assert await product_crud.get_available_stock_for_update(session, scarce) == 0
+            await session.rollback()
+
+            assert await inventory_service.reconcile(session, batch=100) == [(scarce, 0)]
+            assert await inventory_service.reconcile(session, batch=100) == []
+
+    async def test_enable_releases_active_holds(self, committed_catalog, redis_inventory):
+        session_factory, user_id, product_ids = committed_catalog
+        scarce = product_ids[3]
+
+        async with session_factory() as session:
+            await cart_service.add_item_into_cart(session, user_id, CartItemAdd(product_id=scarce, quantity=2))
+
+        async with session_factory() as session:
+            status_ = await inventory_service.enable(session, scarce)
+
+        # Бронь снята в той же транзакции: счетчики получают весь остаток, и held не ждет сборщика
+        assert status_["available"] == 5
+
+        async with session_factory() as session:
+            product = (await session.execute(select(Product).where(Product.id == scarce))).scalar_one()
+            holds = (await session.execute(
+                select(func.count()).select_from(StockHold).where(StockHold.product_id == scarce)
+            )).scalar_one()
+
+            assert product.held == 0
+            assert holds == 0
+
+            # Выключение считает остаток по уже верному held
+            status_ = await inventory_service.disable(session, scarce)
+
+        assert status_["available"] == 5
+
+    async def test_available_stock_matches_checkout_before_reconcile(self, committed_catalog, redis_inventory):
+        session_factory, user_id, product_ids = committed_catalog
+        scarce = product_ids[3]
+
+        async with session_factory() as session:
+            await inventory_service.enable(session, scarce)
+
+        async with session_factory() as session:
+            order_in = OrderCreate(items=[OrderItemCreate(product_id=scarce, quantity=3)])
+            await order_service.create_order(session, order_in, user_id)
+
+        async with session_factory() as session:
+            product = (await session.execute(select(Product).where(Product.id == scarce))).scalar_one()
+
+            # Продажа из Redis еще не сверена, но клиент и корзина уже видят остаток 2
+            assert product.stock == 5
+            assert (await product_crud.get_available_stocks(session, [scarce]))[0].available_stock == 2
+
+            with pytest.raises(AppError) as excinfo:
+                await cart_service.add_item_into_cart(session, user_id, CartItemAdd(product_id=scarce, quantity=3))
+
+            assert excinfo.value.error_code == "cart_insufficient_stock"
+            assert excinfo.value.message.endswith("Доступно: 2")
+
+        # Без счетчиков Redis корзина сверяется с тем же остатком из Postgres
+        await redis_inventory.flushall()
+
+        async with session_factory() as session:
+            with pytest.raises(AppError):
+                await cart_service.add_item_into_cart(session, user_id, CartItemAdd(product_id=scarce, quantity=3))
+
+            cart_item = await cart_service.add_item_into_cart(session, user_id, CartItemAdd(product_id=scarce, quantity=2))
+
+        assert cart_item.quantity == 2
+
+    async def test_counters_are_rebuilt_after_redis_restart(self, committed_catalog, redis_inventory):
+        session_factory, user_id, product_ids = committed_catalog
+        scarce = product_ids[3]
+
+        async with session_factory() as session:
+            await inventory_service.enable(session, scarce)
+
+        async with session_factory() as session:
+            order_in = OrderCreate(items=[OrderItemCreate(product_id=scarce, quantity=3)])
+            order = await order_service.create_order(session, order_in, user_id)
+
+        # Redis перезапустился до сверки: остаток пересчитывается как stock минус несверенные продажи
+        await redis_inventory.flushall()
+
+        async with session_factory() as session:
+            order_in = OrderCreate(items=[OrderItemCreate(product_id=scarce, quantity=3)])
+            with pytest.raises(ProductInsufficientStockError):
+                await order_service.create_order(session, order_in, user_id)
+
+        assert await inventory_service.available(scarce) == 2
+
+        async with session_factory() as session:
+            await order_service.edit_one_order_status_by_id(session, order.id, OrderStatus.CANCELLED)
+
+        assert await inventory_service.available(scarce) == 5
+
+        async with session_factory() as session:
+            await inventory_service.reconcile(session, batch=100)
+            assert await product_crud.get_available_stock_for_update(session, scarce) == 5